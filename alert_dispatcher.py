@@ -0,0 +1,286 @@
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ===============================
+# Alert Dispatcher
+# ===============================
+#
+# One background thread owns the HTTP session and ships alerts to the
+# collector in batches (POST /api/alerts/bulk/) over a keep-alive
+# connection. Detection code only puts alerts on a bounded queue, so a
+# flood of detections costs queue appends, not threads and handshakes.
+#
+# When the collector is unreachable, batches go to an append-only NDJSON
+# spool file and the sender backs off exponentially; once a send
+# succeeds again the spool is replayed oldest first, a batch at a time.
+# Every alert carries the time it was detected, so replayed alerts keep
+# their place on the collector's timeline.
+
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 1.0
+QUEUE_SIZE = 10_000
+REQUEST_TIMEOUT = 5
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+SPOOL_MAX_BYTES = 50 * 1024 * 1024
+
+
+class AlertDispatcher:
+
+    def __init__(self, bulk_url, single_url=None, cooldown=30, spool_path="alert_spool.ndjson",
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE,
+                 timeout=REQUEST_TIMEOUT, spool_max_bytes=SPOOL_MAX_BYTES):
+        self.bulk_url = bulk_url
+        self.single_url = single_url
+        self.cooldown = cooldown
+        self.spool_path = Path(spool_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.spool_max_bytes = spool_max_bytes
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last_alert_time = {}
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        # Collector state: no request before retry_at; delay doubles per failure
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.bulk_supported = True
+
+        self.stats = {
+            "queued": 0,         # alerts accepted from detection
+            "suppressed": 0,     # within the per-IP cooldown
+            "dropped": 0,        # queue or spool full
+            "sent": 0,           # acknowledged by the collector
+            "rejected": 0,       # refused by the collector (4xx): not retried
+            "spooled": 0,        # written to the spool while it was down
+            "replayed": 0,       # sent from the spool after recovery
+            "corrupt": 0,        # unreadable spool lines, skipped
+            "failures": 0,       # failed send attempts
+        }
+
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ===============================
+    # Producer Side
+    # ===============================
+
+    def submit(self, ip, attack_type, severity="High"):
+        """Queue an alert unless ``ip`` alerted within the cooldown; never blocks."""
+        now = time.time()
+
+        with self.lock:
+            last = self.last_alert_time.get(ip)
+            if last is not None and now - last < self.cooldown:
+                self.stats["suppressed"] += 1
+                return False
+            self.last_alert_time[ip] = now
+
+        alert = {
+            "ip": ip,
+            "attack_type": attack_type,
+            "severity": severity,
+            "timestamp": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        }
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            with self.lock:
+                self.stats["dropped"] += 1
+                # A dropped alert must not silence the IP for the cooldown
+                if self.last_alert_time.get(ip) == now:
+                    if last is None:
+                        del self.last_alert_time[ip]
+                    else:
+                        self.last_alert_time[ip] = last
+            return False
+
+        self.count("queued")
+        self.start()
+        return True
+
+    def count(self, name, n=1):
+        # Counters are shared by submit() callers and the sender thread
+        with self.lock:
+            self.stats[name] += n
+
+    def start(self):
+        if self._thread is None:
+            with self.lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self.run, daemon=True)
+                    self._thread.start()
+
+    def close(self, timeout=None):
+        """Stop after flushing what is queued (to the collector or the spool)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ===============================
+    # Sender Thread
+    # ===============================
+
+    def next_batch(self):
+        """Up to batch_size alerts, waiting at most flush_interval for the first."""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+
+            if batch:
+                # Collector down: don't hold alerts in memory meanwhile
+                if time.monotonic() < self.retry_at or not self.send(batch):
+                    self.spool(batch)
+
+            if self.spool_path.exists() and time.monotonic() >= self.retry_at:
+                self.replay_spool()
+
+    def send(self, batch):
+        """POST one batch; True once the collector has it (or refused it for good)."""
+        # Alerts the collector already has when sending one by one
+        delivered = 0
+
+        try:
+            if self.bulk_supported:
+                response = self.session.post(self.bulk_url, json=batch, timeout=self.timeout)
+                if response.status_code in (404, 405) and self.single_url:
+                    # Older collector without the bulk endpoint
+                    self.bulk_supported = False
+                    print("[ALERT] bulk endpoint unavailable, sending alerts one by one")
+
+            if not self.bulk_supported:
+                for alert in batch:
+                    response = self.session.post(self.single_url, json=alert, timeout=self.timeout)
+                    if response.status_code >= 500:
+                        break
+                    delivered += 1
+
+        except requests.RequestException as e:
+            # Spool only what the collector hasn't got
+            del batch[:delivered]
+            return self.failed(f"Failed to send alerts: {e}")
+
+        if response.status_code >= 500:
+            del batch[:delivered]
+            return self.failed(f"Failed to send alerts: HTTP {response.status_code}")
+
+        if response.status_code >= 400:
+            self.count("rejected", len(batch))
+            print(f"[ALERT REJECTED] {len(batch)} alert(s): HTTP {response.status_code} {response.text[:200]}")
+        else:
+            self.count("sent", len(batch))
+            print(f"[ALERT SENT] {len(batch)} alert(s) ({response.status_code})")
+
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        return True
+
+    def failed(self, message):
+        self.count("failures")
+        self.backoff = min(BACKOFF_MAX, self.backoff * 2 if self.backoff else BACKOFF_INITIAL)
+        # Jitter keeps several sensors from retrying in lockstep
+        self.retry_at = time.monotonic() + self.backoff * random.uniform(0.5, 1.0)
+        print(f"{message} (retrying in {self.backoff:.0f}s)")
+        return False
+
+    # ===============================
+    # Disk Spool
+    # ===============================
+
+    def spool(self, batch):
+        size = self.spool_path.stat().st_size if self.spool_path.exists() else 0
+        if size >= self.spool_max_bytes:
+            self.count("dropped", len(batch))
+            return
+
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for alert in batch:
+                f.write(json.dumps(alert) + "\n")
+        self.count("spooled", len(batch))
+
+    def replay_spool(self):
+        """
+        Send spooled alerts oldest first, reading batch_size lines at a
+        time; on failure keep the unsent alerts and the unread rest. Lines
+        that are not an alert (a write cut short by a crash) are skipped.
+        """
+        sent = 0
+        corrupt = 0
+        unsent = []
+        done = False
+
+        with open(self.spool_path, encoding="utf-8", errors="replace") as f:
+            while not self._stop.is_set():
+                lines = list(islice(f, self.batch_size))
+                if not lines:
+                    done = True
+                    break
+
+                batch = []
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        alert = json.loads(line)
+                    except ValueError:
+                        alert = None
+                    if isinstance(alert, dict):
+                        batch.append(alert)
+                    else:
+                        corrupt += 1
+
+                n = len(batch)
+                if batch and not self.send(batch):
+                    # send() trims what the collector already has
+                    sent += n - len(batch)
+                    unsent = batch
+                    break
+                sent += n
+
+            self.count("replayed", sent)
+            if corrupt:
+                self.count("corrupt", corrupt)
+                print(f"[ALERT SPOOL] skipped {corrupt} corrupt line(s)")
+
+            if done:
+                self.spool_path.unlink()
+                print(f"[ALERT SPOOL] replayed {sent} alert(s)")
+                return
+
+            # Rewrite the unsent batch and the unread tail atomically
+            tmp = self.spool_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as out:
+                for alert in unsent:
+                    out.write(json.dumps(alert) + "\n")
+                shutil.copyfileobj(f, out)
+
+        os.replace(tmp, self.spool_path)
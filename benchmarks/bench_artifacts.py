@@ -0,0 +1,77 @@
+"""
+Write / read cost of a stage artifact per storage format.
+
+    python benchmarks/bench_artifacts.py --rows 100000 1000000
+
+For each format: full write, full read, a dashboard-style read of three
+columns, and a chunked scan, plus the on-disk size. Feather is also
+read memory-mapped.
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts.artifacts import ArtifactStore  # noqa: E402
+from synthetic import make_predictions  # noqa: E402
+
+DASHBOARD_COLUMNS = ["Final Decision", "Attack Type", "ml_probability"]
+
+CASES = [
+    ("csv", False),
+    ("parquet", False),
+    ("feather", False),
+    ("feather", True),
+]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'rows':>10} {'format':>12} {'write s':>8} {'read s':>8} "
+        f"{'3 cols s':>9} {'chunks s':>9} {'MB':>7}"
+    )
+
+    for n in args.rows:
+        df = make_predictions(n)
+        df["Final Decision"] = df["pred_label"]
+
+        for fmt, mmap in CASES:
+            directory = Path(tempfile.mkdtemp(prefix="bench-artifacts-"))
+            try:
+                store = ArtifactStore(directory, fmt=fmt, mmap=mmap)
+
+                write_s = timed(lambda: store.write("hybrid_output", df))
+                read_s = timed(lambda: store.read("hybrid_output"))
+                cols_s = timed(lambda: store.read("hybrid_output", columns=DASHBOARD_COLUMNS))
+                scan_s = timed(lambda: sum(len(c) for c in store.iter_chunks("hybrid_output", args.chunksize)))
+                size_mb = store.path("hybrid_output").stat().st_size / 1e6
+
+                label = f"{fmt}{'+mmap' if mmap else ''}"
+                print(
+                    f"{n:>10,} {label:>12} {write_s:>8.2f} {read_s:>8.2f} "
+                    f"{cols_s:>9.3f} {scan_s:>9.2f} {size_mb:>7.1f}"
+                )
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
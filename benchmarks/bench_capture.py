@@ -0,0 +1,99 @@
+"""
+Per-packet cost of the capture path: scapy vs. raw frames.
+
+    python benchmarks/bench_capture.py --packets 200000 --flows 20000
+
+On a synthetic pcap, times three stages each way:
+
+    read     scapy RawPcapReader vs. capture.pcap_frames (one reused buffer)
+    parse    Ether() + packet_fields() vs. capture.parse_frame()
+    replay   live_detection.replay() end to end, dissect=True vs. False
+
+Alerts and console output are switched off.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from scapy.all import Ether
+from scapy.utils import RawPcapReader
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+import capture  # noqa: E402
+import live_detection  # noqa: E402
+from bench_live_inference import train_model  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+from synthetic import synthetic_frames, write_pcap  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def read_scapy(path):
+    for _ in RawPcapReader(str(path)):
+        pass
+
+
+def read_raw(path):
+    for _ in capture.pcap_frames(path):
+        pass
+
+
+def parse_scapy(frames):
+    for frame in frames:
+        live_detection.packet_fields(Ether(frame))
+
+
+def parse_raw(frames):
+    for frame in frames:
+        capture.parse_frame(frame)
+
+
+def replay(path, dissect):
+    live_detection.flows = FlowTable(live_detection.FLOW_TABLE_CAPACITY, idle_timeout=live_detection.FLOW_TIMEOUT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        live_detection.replay(path, dissect=dissect)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, default=200_000)
+    parser.add_argument("--flows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    live_detection.model = train_model()
+    live_detection.send_alert = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory(prefix="bench-capture-") as tmp:
+        pcap = Path(tmp) / "capture.pcap"
+        write_pcap(pcap, synthetic_frames(args.packets, args.flows))
+        frames = [bytes(frame) for frame, _ in capture.pcap_frames(pcap)]
+
+        stages = [
+            ("read", lambda: read_scapy(pcap), lambda: read_raw(pcap)),
+            ("parse", lambda: parse_scapy(frames), lambda: parse_raw(frames)),
+            ("replay", lambda: replay(pcap, True), lambda: replay(pcap, False)),
+        ]
+
+        print(f"packets={args.packets:,}  flows={args.flows:,}")
+        print(f"{'stage':>7} {'scapy pps':>11} {'raw pps':>11} {'speedup':>8}")
+
+        for name, slow, fast in stages:
+            slow_s = timed(slow)
+            fast_s = timed(fast)
+            print(f"{name:>7} {args.packets / slow_s:>11,.0f} {args.packets / fast_s:>11,.0f} {slow_s / fast_s:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Per-packet cost of the bidirectional CICFlowMeter feature extractor
+(capture.parse_packet + cic_flow.CICFlowTable.update) against the basic
+flow path (capture.parse_frame + FlowTable.update), and the extractor's
+memory as packets per flow grow: running statistics keep it
+proportional to open flows, not packets.
+
+    python benchmarks/bench_cic_flows.py --packets 200000 --flows 100 1000 10000
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from capture import parse_frame, parse_packet  # noqa: E402
+from cic_flow import CICFlowTable  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+from synthetic import synthetic_frames  # noqa: E402
+
+
+def run_basic(frames, capacity):
+    table = FlowTable(capacity)
+    for frame, ts in frames:
+        flow_key, length, dport = parse_frame(frame)
+        table.update(flow_key, ts, length, dport)
+    return table
+
+
+def run_cic(frames, capacity, collect_every=10_000):
+    """Finished flows are collected every ``collect_every`` packets, as the sensor does each tick."""
+    table = CICFlowTable(capacity, idle_timeout=float("inf"), flow_timeout=float("inf"))
+    for i, (frame, ts) in enumerate(frames):
+        table.update(parse_packet(frame), ts)
+        if i % collect_every == 0:
+            table.collect()
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, default=200_000)
+    parser.add_argument("--flows", type=int, nargs="+", default=[100, 1000, 10_000])
+    args = parser.parse_args()
+
+    print(
+        f"{'flows':>7} {'pkts/flow':>9} {'basic µs/pkt':>13} {'cic µs/pkt':>11} "
+        f"{'cic flows':>10} {'cic MB':>7} {'KB/flow':>8}"
+    )
+
+    for n_flows in args.flows:
+        frames = list(synthetic_frames(args.packets, n_flows))
+        capacity = max(n_flows * 4, 1024)
+
+        start = time.perf_counter()
+        run_basic(frames, capacity)
+        basic_us = (time.perf_counter() - start) / len(frames) * 1e6
+
+        start = time.perf_counter()
+        run_cic(frames, capacity)
+        cic_us = (time.perf_counter() - start) / len(frames) * 1e6
+
+        tracemalloc.start()
+        table = run_cic(frames, capacity)
+        table.collect()
+        held = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+        print(
+            f"{n_flows:>7,} {args.packets / n_flows:>9,.0f} {basic_us:>13.2f} {cic_us:>11.2f} "
+            f"{len(table):>10,} {held:>7.1f} {held * 1000 / max(len(table), 1):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
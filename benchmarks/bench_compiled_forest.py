@@ -0,0 +1,82 @@
+"""
+Scoring latency and throughput of a session model: sklearn's
+RandomForestClassifier.predict_proba vs. the compiled node-array
+evaluator in scripts/compiled_forest.py, per batch size.
+
+    python benchmarks/bench_compiled_forest.py --trees 120 --depth 15 --batch 1 64 4096 1000000
+
+The forest is configured like train_model.py's (class_weight="balanced",
+n_jobs=-1) and trained on synthetic flows; each batch is scored by
+both and the largest probability difference is reported.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts.compiled_forest import compile_forest  # noqa: E402
+from synthetic import make_flows  # noqa: E402
+
+
+def timed(fn, budget=2.0):
+    """Best time of repeated calls within ``budget`` seconds (at least one)."""
+    best = float("inf")
+    spent = 0.0
+    while spent < budget:
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000, help="training rows")
+    parser.add_argument("--trees", type=int, default=120)
+    parser.add_argument("--depth", type=int, default=15)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 64, 4096, 1_000_000])
+    args = parser.parse_args()
+
+    train = make_flows(args.rows).fillna(0)
+    X = train.drop(columns=["Label"]).to_numpy()
+    y = (train["Label"] != "BENIGN").astype(int)
+
+    clf = RandomForestClassifier(
+        n_estimators=args.trees, max_depth=args.depth, class_weight="balanced", random_state=42, n_jobs=-1,
+    )
+    clf.fit(X, y)
+
+    start = time.perf_counter()
+    compiled = compile_forest(clf)
+    print(
+        f"{args.trees} trees, depth {compiled.max_depth}, {len(compiled.feature):,} nodes, "
+        f"compiled in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+
+    pool = make_flows(max(args.batch), seed=7).fillna(0).drop(columns=["Label"]).to_numpy()
+
+    print(f"{'batch':>9} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8} {'rows/s compiled':>16} {'max |dp|':>9}")
+
+    for n in args.batch:
+        batch = pool[:n]
+        sk_s, sk_p = timed(lambda: clf.predict_proba(batch))
+        c_s, c_p = timed(lambda: compiled.predict_proba(batch))
+
+        print(
+            f"{n:>9,} {sk_s * 1000:>11.3f} {c_s * 1000:>12.3f} {sk_s / c_s:>7.1f}x "
+            f"{n / c_s:>16,.0f} {np.abs(sk_p - c_p).max():>9.1e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Response time of /api/dashboard-live/ as the Alert table grows:
+counting in a Python loop over every row (old view) vs. GROUP BY in
+the database plus a 50-row .only() fetch (current view), with and
+without a ``since=`` window.
+
+    python benchmarks/bench_dashboard_live.py --rows 10000 100000 1000000
+
+Uses a throwaway SQLite file unless DATABASE_URL is set; with it, the
+benchmark's rows are tagged and deleted again afterwards.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+tmp_db = None
+if not os.environ.get("DATABASE_URL"):
+    tmp_db = tempfile.NamedTemporaryFile(prefix="bench-dashboard-", suffix=".sqlite3", delete=False)
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_db.name}"
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nids_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from nids_app.models import Alert  # noqa: E402
+
+ATTACKS = ["DoS Attack", "Port Scan", "Data Exfiltration", "ML-Attack"]
+
+
+def legacy_live(queryset):
+    """The old view body: every row into Python, then a second query for the list."""
+    alerts = queryset.order_by("-timestamp")
+    attack_counts = {}
+    for alert in alerts:
+        attack_counts[alert.attack_type] = attack_counts.get(alert.attack_type, 0) + 1
+    return attack_counts, list(alerts[:50])
+
+
+def add_alerts(n, tag, now):
+    """n alerts spread over the past 30 days, tagged via the severity column."""
+    first = (Alert.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+    batch = []
+    for i in range(n):
+        batch.append(Alert(ip=f"10.0.{i // 256 % 256}.{i % 256}", attack_type=ATTACKS[i % 4], severity=tag))
+        if len(batch) == 10_000:
+            Alert.objects.bulk_create(batch)
+            batch = []
+    Alert.objects.bulk_create(batch)
+
+    # auto_now_add stamps every row "now": spread them out in SQL instead
+    for offset in range(0, n, 1000):
+        Alert.objects.filter(severity=tag, id__gte=first + offset, id__lt=first + offset + 1000).update(
+            timestamp=now - timedelta(minutes=43_200 * offset / max(n, 1))
+        )
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--legacy-max", type=int, default=500_000, help="largest table to time the old view on")
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    client = Client(HTTP_HOST="localhost")
+    tag = f"b{uuid.uuid4().hex[:8]}"
+    now = timezone.now()
+    since = (now - timedelta(hours=1)).isoformat()
+
+    print(f"database={connection.vendor}")
+    print(f"{'rows':>10} {'python loop ms':>15} {'aggregate ms':>13} {'since=1h ms':>12}")
+
+    loaded = 0
+    try:
+        for n in sorted(args.rows):
+            add_alerts(n - loaded, tag, now)
+            loaded = n
+            # Planner statistics, as autovacuum keeps them on Postgres; without
+            # them SQLite scans the whole index for since= windows
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            old_ms = float("nan")
+            if n <= args.legacy_max:
+                old_ms = timed(lambda: legacy_live(Alert.objects.all()))
+            new_ms = timed(lambda: client.get("/api/dashboard-live/"))
+            since_ms = timed(lambda: client.get("/api/dashboard-live/", {"since": since}))
+
+            print(f"{n:>10,} {old_ms:>15.1f} {new_ms:>13.1f} {since_ms:>12.1f}")
+    finally:
+        Alert.objects.filter(severity=tag).delete()
+        if tmp_db is not None:
+            connection.close()
+            os.unlink(tmp_db.name)
+
+
+if __name__ == "__main__":
+    main()
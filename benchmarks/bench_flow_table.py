@@ -0,0 +1,103 @@
+"""
+Flow table under a spoofed-source SYN flood: the old defaultdict of
+dicts with a port set per flow vs. flow_table.FlowTable.
+
+    python benchmarks/bench_flow_table.py --packets 200000 1000000 --capacity 65536
+
+Every packet comes from a new source and hits a random port, the worst
+case for the old table (one dict and one set per packet, never freed
+until the flow times out). Reports per-packet update cost, Python heap
+peak (tracemalloc, in a separate untimed run) and the FlowTable's occupancy/eviction stats.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from flow_table import FlowTable  # noqa: E402
+
+
+def flood(n_packets, seed=3):
+    rng = np.random.default_rng(seed)
+    srcs = rng.integers(0, 2**32, n_packets, dtype=np.uint64)
+    ports = rng.integers(1, 65536, n_packets)
+    return [
+        ((f"{s >> 24}.{(s >> 16) & 255}.{(s >> 8) & 255}.{s & 255}", "10.0.0.1", 6), int(p))
+        for s, p in zip(srcs.tolist(), ports.tolist())
+    ]
+
+
+def legacy_table(packets, now):
+    flows = defaultdict(lambda: {
+        "start_time": None,
+        "last_seen": None,
+        "packet_count": 0,
+        "total_bytes": 0,
+        "ports": set(),
+    })
+    for key, dport in packets:
+        flow = flows[key]
+        if flow["start_time"] is None:
+            flow["start_time"] = now
+        flow["last_seen"] = now
+        flow["packet_count"] += 1
+        flow["total_bytes"] += 60
+        if dport:
+            flow["ports"].add(dport)
+    return flows
+
+
+def array_table(packets, now, capacity):
+    flows = FlowTable(capacity, idle_timeout=5)
+    for key, dport in packets:
+        flows.update(key, now, 60, dport)
+    return flows
+
+
+def measure(fn):
+    # Timed and memory-traced in separate runs: tracemalloc slows allocation
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, nargs="+", default=[200_000, 1_000_000])
+    parser.add_argument("--capacity", type=int, default=65536)
+    args = parser.parse_args()
+
+    print(f"{'packets':>10} {'table':>7} {'ns/pkt':>8} {'peak MB':>8} {'flows':>9} {'evicted':>9}")
+
+    for n in args.packets:
+        packets = flood(n)
+        now = time.time()
+
+        flows, old_s, old_peak = measure(lambda: legacy_table(packets, now))
+        print(f"{n:>10,} {'dict':>7} {1e9 * old_s / n:>8.0f} {old_peak / 1e6:>8.1f} {len(flows):>9,} {0:>9,}")
+        del flows
+
+        flows, new_s, new_peak = measure(lambda: array_table(packets, now, args.capacity))
+        stats = flows.stats()
+        print(
+            f"{n:>10,} {'array':>7} {1e9 * new_s / n:>8.0f} {new_peak / 1e6:>8.1f} "
+            f"{stats['flows']:>9,} {stats['evicted']:>9,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
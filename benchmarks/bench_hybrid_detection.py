@@ -0,0 +1,185 @@
+"""
+Rows/sec of the hybrid detection engine, row-wise (legacy) vs vectorized.
+
+    python benchmarks/bench_hybrid_detection.py --rows 10000 100000 1000000
+    python benchmarks/bench_hybrid_detection.py --rules 10 100 1000 5000
+
+The legacy engine only runs up to --legacy-max rows (it is slow); for those
+sizes both outputs are compared byte for byte as CSV. --rules pads the
+signature list with synthetic rules to show how matching scales with the
+size of signatures.txt.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR / "scripts"))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+import signature_detect as sd  # noqa: E402
+from synthetic import SIGNATURES, make_predictions  # noqa: E402
+
+
+# --------------------------------------------------
+# Legacy row-wise engine (reference implementation)
+# --------------------------------------------------
+def legacy_builtin_rules(row: pd.Series) -> List[str]:
+    hits = []
+
+    suspicious_ports = {23, 2323, 4444, 5555, 3389, 8080}
+    try:
+        if int(row.get("Destination Port", -1)) in suspicious_ports:
+            hits.append("suspicious_port")
+    except Exception:
+        pass
+
+    try:
+        if float(row.get("Total Fwd Packets", 0)) > 10000:
+            hits.append("high_fwd_packets")
+    except Exception:
+        pass
+
+    return hits
+
+
+def legacy_match_signatures(text: str, sigs: List[str]) -> List[str]:
+    hits = []
+    if not text:
+        return hits
+
+    for s in sigs:
+        try:
+            if re.search(s, text, flags=re.I):
+                hits.append(s)
+        except re.error:
+            if s.lower() in text.lower():
+                hits.append(s)
+
+    return list(dict.fromkeys(hits))
+
+
+def legacy_hybrid_detection(df: pd.DataFrame, sigs: List[str]) -> pd.DataFrame:
+    df = df.copy()
+
+    prob_col = sd.find_probability_column(df)
+    if prob_col:
+        df["ml_probability"] = pd.to_numeric(df[prob_col], errors="coerce")
+    else:
+        df["ml_probability"] = pd.NA
+
+    label_col = next(
+        (c for c in ["pred_label", "Predicted Attack Type", "ml_label", "Attack Type"] if c in df.columns),
+        None,
+    )
+
+    columns = {k: [] for k in ["hits", "flag", "sev", "risk", "final", "reason"]}
+
+    for _, row in df.iterrows():
+        hits = legacy_builtin_rules(row)
+        text_blob = " ".join(str(v) for v in row.values if pd.notna(v))
+        hits.extend(legacy_match_signatures(text_blob, sigs))
+        hits = list(dict.fromkeys(hits))
+        sig_flag = len(hits) > 0
+
+        ml_prob = row.get("ml_probability")
+        ml_label = str(row.get(label_col)).strip()
+        sev = sd.severity_score(ml_label)
+        risk = (sd.ML_WEIGHT * ml_prob if pd.notna(ml_prob) else 0) + (sd.SIG_WEIGHT * sev)
+
+        if sig_flag:
+            final, reason = "Malicious", "signature_match"
+        elif pd.notna(ml_prob) and ml_prob >= sd.PROB_THRESHOLD:
+            final, reason = "Malicious", "ml_high_confidence"
+        else:
+            final = "Benign" if ml_label.lower() in ("benign", "normal", "0") else ml_label
+            reason = "ml_decision"
+
+        columns["hits"].append(",".join(hits))
+        columns["flag"].append(sig_flag)
+        columns["sev"].append(sev)
+        columns["risk"].append(round(risk, 3))
+        columns["final"].append(final)
+        columns["reason"].append(reason)
+
+    df["signature_hits"] = columns["hits"]
+    df["signature_flag"] = columns["flag"]
+    df["signature_severity"] = columns["sev"]
+    df["final_risk_score"] = columns["risk"]
+    df["hybrid_reason"] = columns["reason"]
+    df["Final Decision"] = columns["final"]
+    df["pred_label"] = df["Final Decision"]
+    return df
+
+
+# --------------------------------------------------
+# Runner
+# --------------------------------------------------
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def synthetic_rules(n: int) -> List[str]:
+    """``n`` signatures: mostly literal-bearing, one in fifty without a literal."""
+    rules = list(SIGNATURES)
+    for i in range(len(rules), n):
+        if i % 50:
+            rules.append(rf"implant-{i:05d}\.(?:exe|dll)")
+        else:
+            rules.append(rf"(?:beacon|stager)\d{{{i % 7 + 3}}}")
+    return rules
+
+
+def bench_rules(rule_counts: List[int], n_rows: int):
+    df = make_predictions(n_rows)
+
+    print(f"{'rules':>10} {'build s':>9} {'rows/s':>12} {'legacy rows/s':>15}")
+    for n in rule_counts:
+        rules = synthetic_rules(n)
+        matcher, build_s = timed(sd.SignatureMatcher, rules)
+        _, match_s = timed(sd.hybrid_detection, df, matcher)
+
+        sample = df.head(2_000)
+        _, legacy_s = timed(legacy_hybrid_detection, sample, rules)
+
+        print(f"{n:>10,} {build_s:>9.2f} {n_rows / match_s:>12,.0f} {len(sample) / legacy_s:>15,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    parser.add_argument("--rules", type=int, nargs="+", help="benchmark signature counts instead of row counts")
+    args = parser.parse_args()
+
+    if args.rules:
+        bench_rules(args.rules, args.rows[0])
+        return
+
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'vectorized rows/s':>19} {'speedup':>9} {'identical':>10}")
+
+    for n in args.rows:
+        df = make_predictions(n)
+
+        new_df, new_s = timed(sd.hybrid_detection, df, SIGNATURES)
+
+        legacy_rate = speedup = identical = "-"
+        if n <= args.legacy_max:
+            old_df, old_s = timed(legacy_hybrid_detection, df, SIGNATURES)
+            legacy_rate = f"{n / old_s:,.0f}"
+            speedup = f"{old_s / new_s:.1f}x"
+            identical = str(old_df.to_csv(index=False) == new_df.to_csv(index=False))
+
+        print(f"{n:>10,} {legacy_rate:>15} {n / new_s:>19,.0f} {speedup:>9} {identical:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Retrain time as rows are appended to a session's dataset: a full refit
+(TRAIN_MODE=full) vs. train_model's incremental mode, which grows the
+saved forest with trees fitted on the appended rows only. Also prints
+the out-of-bag / holdout macro F1 recorded in the model ledger, and,
+with --drift, flips the labelling rule for the last appends to show the
+quality check calling for a full retrain.
+
+    python benchmarks/bench_incremental_train.py --base 50000 --append 5000 --steps 4 --drift 2
+
+Flows come from synthetic.make_learnable_flows: make_flows with a label
+a model can learn in place of its random one.
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts import train_model  # noqa: E402
+from scripts.incremental import ledger_paths  # noqa: E402
+from synthetic import make_learnable_flows  # noqa: E402
+
+
+def train(session_id, mode):
+    start = time.perf_counter()
+    clf, _ = train_model.run(session_id, mode=mode)
+    elapsed = time.perf_counter() - start
+
+    _, model_path, _ = train_model.session_paths(session_id)
+    ledger = json.loads(ledger_paths(model_path)[0].read_text())
+    quality = ledger["quality"][-1]
+    return elapsed, len(clf.estimators_), quality, ledger["stale"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base", type=int, default=50_000)
+    parser.add_argument("--append", type=int, default=5_000)
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--drift", type=int, default=0, help="last N appends use the flipped label rule")
+    args = parser.parse_args()
+
+    sessions = {mode: f"bench-{uuid.uuid4().hex[:8]}" for mode in ("full", "auto")}
+    frames = [make_learnable_flows(args.base, seed=0)]
+
+    print(f"{'rows':>8} {'full s':>7} {'incremental s':>14} {'trees':>6} {'F1':>6} {'source':>8}  stale")
+
+    try:
+        for step in range(args.steps + 1):
+            if step:
+                drift = step > args.steps - args.drift
+                frames.append(make_learnable_flows(args.append, seed=step, drift=drift))
+            df = pd.concat(frames, ignore_index=True)
+
+            row = {}
+            for mode, session_id in sessions.items():
+                store = train_model.session_paths(session_id)[0]
+                store.directory.mkdir(parents=True, exist_ok=True)
+                store.write("preprocessed", df)
+                row[mode] = train(session_id, mode)
+
+            full_s = row["full"][0]
+            inc_s, trees, quality, stale = row["auto"]
+            print(
+                f"{len(df):>8,} {full_s:>7.1f} {inc_s:>14.1f} {trees:>6} "
+                f"{quality['f1']:>6.3f} {quality['source']:>8}  {stale or ''}"
+            )
+    finally:
+        for session_id in sessions.values():
+            shutil.rmtree(train_model.session_paths(session_id)[0].directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
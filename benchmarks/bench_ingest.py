@@ -0,0 +1,171 @@
+"""
+Capture-callback latency while flow analysis runs.
+
+    python benchmarks/bench_ingest.py --flows 5000 --seconds 6
+
+"locked" is the old design: the capture callback and the cleanup thread
+share one lock, and the cleanup thread holds it for the whole analysis
+pass. "buffered" is live_detection's current path: the callback appends
+to a bounded buffer, an aggregator owns the flow table, and the
+analyzer works on snapshots. A producer thread replays synthetic
+packets over ``--flows`` flows at ``--rate`` packets/s (0 = as fast as
+it can); the table reports callback latency percentiles, packets
+ingested, and packets dropped by backpressure.
+Alerts and console output are switched off.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+import live_detection  # noqa: E402
+from bench_live_inference import train_model  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+
+
+def synthetic_packets(n_flows, n_packets=200_000, seed=11):
+    rng = np.random.default_rng(seed)
+    flow_ids = rng.integers(0, n_flows, n_packets).tolist()
+    ports = rng.integers(1, 1024, n_packets).tolist()
+    keys = [(f"10.0.{i // 250}.{i % 250}", "10.1.0.1", 6) for i in range(n_flows)]
+    return [(keys[f], 60 + (p % 1400), p) for f, p in zip(flow_ids, ports)]
+
+
+def produce(callback, packets, stop, latencies, rate):
+    i = 0
+    n = len(packets)
+    began = time.perf_counter()
+    while not stop.is_set():
+        key, length, dport = packets[i % n]
+        start = time.perf_counter_ns()
+        callback(key, time.time(), length, dport)
+        latencies.append(time.perf_counter_ns() - start)
+        i += 1
+
+        # Pace in bursts of 1000 packets
+        if rate and i % 1000 == 0:
+            ahead = i / rate - (time.perf_counter() - began)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def run_locked(packets, seconds, rate):
+    table = FlowTable(live_detection.FLOW_TABLE_CAPACITY, idle_timeout=live_detection.FLOW_TIMEOUT)
+    lock = threading.Lock()
+    stop = threading.Event()
+    latencies = []
+
+    def callback(key, ts, length, dport):
+        with lock:
+            table.update(key, ts, length, dport)
+
+    def cleanup():
+        while not stop.wait(live_detection.FLOW_CLEANUP_INTERVAL / 4):
+            with lock:
+                live_detection.flows = table
+                live_detection.analyze_flows(*live_detection.collect_due_flows(time.time()))
+
+    threads = [
+        threading.Thread(target=produce, args=(callback, packets, stop, latencies, rate)),
+        threading.Thread(target=cleanup),
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return latencies, int(table.packet_count.sum()), 0
+
+
+def run_buffered(packets, seconds, rate):
+    live_detection.flows = FlowTable(live_detection.FLOW_TABLE_CAPACITY, idle_timeout=live_detection.FLOW_TIMEOUT)
+    live_detection.packet_buffer.clear()
+    for name in live_detection.ingest_stats:
+        live_detection.ingest_stats[name] = 0
+
+    stop = threading.Event()
+    latencies = []
+
+    def analyzer():
+        while not stop.is_set():
+            try:
+                item = live_detection.analysis_queue.get(timeout=0.1)
+            except Exception:
+                continue
+            live_detection.analyze_snapshot(item)
+
+    def ticker():
+        # Same analysis cadence as the locked run, fired through the aggregator path
+        while not stop.wait(live_detection.FLOW_CLEANUP_INTERVAL / 4):
+            tick_at[0] = True
+
+    tick_at = [False]
+
+    def aggregator():
+        while not stop.is_set():
+            drained = live_detection.drain_packets()
+            if tick_at[0]:
+                tick_at[0] = False
+                live_detection.dispatch_snapshot(time.time())
+            if not drained:
+                time.sleep(live_detection.AGGREGATE_IDLE_SLEEP)
+
+    threads = [
+        threading.Thread(target=produce, args=(live_detection.enqueue_packet, packets, stop, latencies, rate)),
+        threading.Thread(target=aggregator),
+        threading.Thread(target=analyzer),
+        threading.Thread(target=ticker),
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    live_detection.drain_packets(limit=len(live_detection.packet_buffer))
+    stats = live_detection.ingest_stats
+    return latencies, stats["aggregated"], stats["dropped"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flows", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--rate", type=int, nargs="+", default=[50_000, 0], help="packets/s, 0 = unpaced")
+    args = parser.parse_args()
+
+    live_detection.model = train_model()
+    live_detection.send_alert = lambda *a, **k: None
+    # Every flow is due on every tick: maximum analysis load
+    live_detection.FLOW_ANALYZE_AFTER = 0
+    packets = synthetic_packets(args.flows)
+
+    print(f"{'rate':>8} {'mode':>9} {'p50 µs':>8} {'p99 µs':>8} {'max ms':>8} {'ingested':>10} {'dropped':>9}")
+
+    for rate in args.rate:
+        for name, run in [("locked", run_locked), ("buffered", run_buffered)]:
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies, ingested, dropped = run(packets, args.seconds, rate)
+
+            lat = np.array(latencies) / 1000
+            print(
+                f"{rate or 'max':>8} {name:>9} {np.percentile(lat, 50):>8.1f} {np.percentile(lat, 99):>8.1f} "
+                f"{lat.max() / 1000:>8.1f} {ingested:>10,} {dropped:>9,}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Per-tick inference cost of the live sensor: one-row DataFrame with
+predict + predict_proba per flow (old analyze_flow) vs. one
+predict_proba over the tick's feature matrix (analyze_flows), with
+the sklearn forest and with its compiled form (scripts/compiled_forest).
+
+    python benchmarks/bench_live_inference.py --flows 100 1000 10000
+
+A quick_train.py-style forest (50 trees) is fitted on synthetic flow
+features. Alert sending and console output are switched off so only
+feature collection and inference are timed.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import live_detection  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+from scripts.compiled_forest import compile_forest  # noqa: E402
+
+
+def train_model(seed=42):
+    rng = np.random.default_rng(seed)
+    n = 5000
+    df = pd.DataFrame({
+        "duration": rng.exponential(4.0, n),
+        "packet_count": rng.integers(1, 200, n),
+        "byte_count": rng.integers(60, 20000, n),
+    })
+    df["bytes_per_sec"] = df["byte_count"] / (df["duration"] + 1)
+    y = np.where(df["packet_count"] > 120, "Attack", "BENIGN")
+
+    model = RandomForestClassifier(n_estimators=50, random_state=seed)
+    model.fit(df[live_detection.FEATURES], y)
+    return model
+
+
+def fill_flows(n_flows, now, seed=7):
+    rng = np.random.default_rng(seed)
+    live_detection.flows = FlowTable(max(n_flows, 1))
+
+    for i in range(n_flows):
+        key = (f"10.0.{i // 250}.{i % 250}", "10.1.0.1", 6)
+        start = now - 4 - rng.random()
+        packets = int(rng.integers(1, 200))
+        ports = rng.integers(1, 1024, packets)
+        sizes = rng.integers(60, 200, packets)
+        for t, port, size in zip(np.linspace(start, now - rng.random(), packets), ports, sizes):
+            live_detection.flows.update(key, t, int(size), int(port))
+
+
+def legacy_tick(now):
+    """The old cleanup pass: per-flow DataFrame, predict, then predict_proba."""
+    model = live_detection.model
+    table = live_detection.flows
+    for slot in table.due(now, 3):
+        duration = table.last_seen[slot] - table.start_time[slot]
+        byte_count = table.total_bytes[slot]
+        df = pd.DataFrame([{
+            "duration": duration,
+            "packet_count": table.packet_count[slot],
+            "byte_count": byte_count,
+            "bytes_per_sec": byte_count / duration if duration > 0 else 0,
+        }])
+        model.predict(df)[0]
+        model.predict_proba(df)[0][1]
+
+
+def batched_tick(now):
+    live_detection.analyze_flows(*live_detection.collect_due_flows(now))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flows", type=int, nargs="+", default=[100, 1000, 10_000])
+    parser.add_argument("--legacy-max", type=int, default=2000, help="largest flow count to time the old path on")
+    args = parser.parse_args()
+
+    live_detection.model = train_model()
+    compiled = compile_forest(live_detection.model)
+    live_detection.send_alert = lambda *a, **k: None
+
+    print(f"{'flows':>8} {'per-flow ms':>12} {'batched ms':>11} {'compiled ms':>12} {'speedup':>9} {'µs/flow':>8}")
+
+    for n in args.flows:
+        now = time.time()
+
+        old_ms = float("nan")
+        if n <= args.legacy_max:
+            fill_flows(n, now)
+            start = time.perf_counter()
+            legacy_tick(now)
+            old_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        for compiled_model in (None, compiled):
+            live_detection.compiled_model = compiled_model
+            live_detection.COMPILED_MAX_ROWS = n
+            fill_flows(n, now)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                batched_tick(now)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        new_ms, compiled_ms = timings
+        best_ms = min(timings)
+        print(
+            f"{n:>8,} {old_ms:>12.1f} {new_ms:>11.1f} {compiled_ms:>12.1f} "
+            f"{old_ms / best_ms:>8.1f}x {1000 * best_ms / n:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
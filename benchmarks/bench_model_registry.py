@@ -0,0 +1,96 @@
+"""
+Cost of getting a trained session model ready to score: a fresh
+interpreter loading it (what every subprocess predict stage paid),
+joblib.load in a running process, a warm lookup in
+scripts/model_registry, and loading model_compiled.pkl (the live
+sensor's compiled forest) with and without mmap_mode="r".
+
+    python benchmarks/bench_model_registry.py --rows 100000 --trees 120 --depth 15
+
+The model is a forest trained on synthetic flows and written to a
+temporary model.pkl / model_features.pkl pair.
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts.compiled_forest import CompiledForest, compile_forest, read_compiled, save_compiled  # noqa: E402
+from scripts.model_registry import ModelRegistry  # noqa: E402
+from synthetic import make_flows  # noqa: E402
+
+FRESH_PROCESS = """
+import time
+start = time.perf_counter()
+import joblib
+joblib.load({model!r})
+joblib.load({features!r})
+print(time.perf_counter() - start)
+"""
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--trees", type=int, default=120)
+    parser.add_argument("--depth", type=int, default=15)
+    args = parser.parse_args()
+
+    df = make_flows(args.rows).fillna(0)
+    X = df.drop(columns=["Label"])
+    y = (df["Label"] != "BENIGN").astype(int)
+
+    clf = RandomForestClassifier(n_estimators=args.trees, max_depth=args.depth, random_state=42, n_jobs=-1)
+    clf.fit(X, y)
+
+    with tempfile.TemporaryDirectory(prefix="bench-registry-") as tmp:
+        model, features = Path(tmp) / "model.pkl", Path(tmp) / "model_features.pkl"
+        joblib.dump(clf, model)
+        joblib.dump(list(X.columns), features)
+        compiled = Path(tmp) / "model_compiled.pkl"
+        save_compiled(compile_forest(clf), compiled)
+        del clf
+
+        print(f"model.pkl {model.stat().st_size / 1e6:.1f} MB, {args.trees} trees, depth {args.depth}")
+
+        script = FRESH_PROCESS.format(model=str(model), features=str(features))
+        start = time.perf_counter()
+        inner = float(subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout)
+        fresh_ms = (time.perf_counter() - start) * 1000
+
+        load_ms = timed(lambda: (joblib.load(model), joblib.load(features)))
+        compiled_ms = timed(lambda: read_compiled(compiled))
+        mmap_ms = timed(lambda: CompiledForest(**joblib.load(compiled, mmap_mode="r")))
+
+        registry = ModelRegistry(capacity=2)
+        registry.get(model, features)
+        warm_ms = timed(lambda: registry.get(model, features), repeat=1000)
+
+        print(f"{'fresh process (start + import + load)':<40} {fresh_ms:>10.1f} ms  (load {inner * 1000:.1f} ms)")
+        print(f"{'joblib.load':<40} {load_ms:>10.1f} ms")
+        print(f"{'registry warm get':<40} {warm_ms:>10.3f} ms")
+        print(f"{'model_compiled.pkl load':<40} {compiled_ms:>10.1f} ms")
+        print(f"{'model_compiled.pkl mmap_mode=r':<40} {mmap_ms:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Peak memory and wall time of train_model.py on one dataset: in memory,
+out of core on a stratified reservoir sample, and out of core as merged
+per-chunk forests on worker processes, each under a TRAIN_MEMORY_MB
+budget. Memory is the anonymous resident memory of the training
+process and its workers, polled from /proc (pages of memory-mapped
+artifacts are page cache the kernel can drop, so they are left out),
+next to the same interpreters' footprint once the libraries are
+imported, which the budget does not cover.
+
+    python benchmarks/bench_out_of_core.py --rows 1000000 --budget 64 --workers 2
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts import preprocess, train_model  # noqa: E402
+from scripts.artifacts import ArtifactStore  # noqa: E402
+from synthetic import make_flows  # noqa: E402
+
+IMPORTS = "import scripts.train_model, time; time.sleep(1)"
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def descendants(pid):
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+    found, stack = [], [pid]
+    while stack:
+        found.append(stack.pop())
+        stack.extend(children.get(found[-1], []))
+    return found
+
+
+def run_peak(argv, env):
+    """(seconds, peak MB of the main process, peak MB of the process tree)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, env=env, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    main_peak = tree_peak = 0.0
+
+    while process.poll() is None:
+        pids = descendants(process.pid)
+        main_peak = max(main_peak, rss_mb(process.pid))
+        tree_peak = max(tree_peak, sum(rss_mb(pid) for pid in pids))
+        time.sleep(0.05)
+
+    if process.returncode:
+        raise RuntimeError(f"{argv} exited with {process.returncode}")
+    return time.perf_counter() - start, main_peak, tree_peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--budget", type=int, default=64, help="TRAIN_MEMORY_MB for the out-of-core runs")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--format", default="feather")
+    parser.add_argument("--strategies", nargs="+", default=["memory", "sample", "ensemble"])
+    args = parser.parse_args()
+
+    session_id = f"bench-{uuid.uuid4().hex[:8]}"
+    store = ArtifactStore(train_model.session_paths(session_id)[0].directory, fmt=args.format)
+    base_env = {**os.environ, "ARTIFACT_FORMAT": args.format}
+
+    try:
+        store.write("preprocessed", preprocess.normalize_labels(make_flows(args.rows)))
+        size = store.find("preprocessed")[1].stat().st_size / 2**20
+        print(f"{args.rows:,} rows, {args.format} artifact {size:.0f} MB")
+
+        _, idle, _ = run_peak([sys.executable, "-c", IMPORTS], base_env)
+        print(f"interpreter with training imports: {idle:.0f} MB per process\n")
+
+        configs = {
+            "memory": ("in memory", {"TRAIN_MEMORY_MB": "1000000"}),
+            "sample": ("sample", {"TRAIN_MEMORY_MB": str(args.budget), "TRAIN_WORKERS": "0"}),
+            "ensemble": (
+                f"ensemble x{args.workers}",
+                {"TRAIN_MEMORY_MB": str(args.budget), "TRAIN_WORKERS": str(args.workers)},
+            ),
+        }
+
+        print(f"{'strategy':>13} {'budget MB':>10} {'seconds':>8} {'main MB':>8} {'tree MB':>8} {'model MB':>9}")
+        for name, env in (configs[strategy] for strategy in args.strategies):
+            seconds, main_peak, tree_peak = run_peak(
+                [sys.executable, str(BASE_DIR / "scripts" / "train_model.py"), session_id, "--full"],
+                {**base_env, **env},
+            )
+            budget = env["TRAIN_MEMORY_MB"] if name != "in memory" else "-"
+            model = (store.directory / "model.pkl").stat().st_size / 2**20
+            print(f"{name:>13} {budget:>10} {seconds:>8.1f} {main_peak:>8.0f} {tree_peak:>8.0f} {model:>9.0f}")
+    finally:
+        shutil.rmtree(store.directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+End-to-end time of the automated pipeline: one subprocess per stage vs
+all stages in-process with DataFrames handed over in memory.
+
+    python benchmarks/bench_pipeline.py --rows 10000 100000
+
+Each size runs both paths on the same synthetic upload under a throwaway
+session id, checks both hybrid_output artifacts hold the same data, then
+removes the session folders. The outputs are compared with a tolerance:
+with ARTIFACT_FORMAT=csv the subprocess path re-parses predictions.csv,
+which can move ml_probability by one ulp.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "nids_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import pandas as pd  # noqa: E402
+
+from nids_app.pipeline.automated import run_full_pipeline  # noqa: E402
+from scripts.artifacts import ArtifactStore  # noqa: E402
+from synthetic import make_flows  # noqa: E402
+
+
+def time_pipeline(session_id: str, in_process: bool) -> float:
+    start = time.perf_counter()
+    run_full_pipeline(session_id, in_process=in_process)
+    return time.perf_counter() - start
+
+
+def same_output(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-12)
+    except AssertionError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'subprocess s':>13} {'in-process s':>13} {'speedup':>9} {'same data':>10}")
+
+    for n in args.rows:
+        session_id = f"bench-{uuid.uuid4()}"
+        raw_dir = BASE_DIR / "data" / "raw" / session_id
+        processed_dir = BASE_DIR / "data" / "processed" / session_id
+        raw_dir.mkdir(parents=True)
+
+        try:
+            make_flows(n).to_csv(raw_dir / "input.csv", index=False)
+
+            old_s = time_pipeline(session_id, in_process=False)
+            old_output = ArtifactStore(processed_dir).read("hybrid_output")
+            shutil.rmtree(processed_dir)
+
+            new_s = time_pipeline(session_id, in_process=True)
+            same = same_output(old_output, ArtifactStore(processed_dir).read("hybrid_output"))
+
+            print(f"{n:>10,} {old_s:>13.2f} {new_s:>13.2f} {old_s / new_s:>8.1f}x {str(same):>10}")
+        finally:
+            shutil.rmtree(raw_dir, ignore_errors=True)
+            shutil.rmtree(processed_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
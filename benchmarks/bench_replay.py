@@ -0,0 +1,77 @@
+"""
+Offline replay throughput of the live sensor on synthetic pcaps.
+
+    python benchmarks/bench_replay.py --packets 10000 100000 500000 --flows-per-packet 0.1
+
+For each size a synthetic pcap is written and replayed through
+live_detection.replay() (process_packet → flow table → analyze_flows,
+packet-timestamp clock, no drops) as fast as possible. Every replay runs
+in a fresh process so the reported peak RSS belongs to that run alone.
+Alerts and console output are switched off.
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing as mp
+import sys
+import tempfile
+from pathlib import Path
+
+import joblib
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+import live_detection  # noqa: E402
+from bench_live_inference import train_model  # noqa: E402
+from synthetic import synthetic_frames, write_pcap  # noqa: E402
+
+
+def replay_child(pcap, model_path, speed, results):
+    live_detection.send_alert = lambda *a, **k: None
+    live_detection.load_model(model_path)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.put(live_detection.replay(pcap, speed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--flows-per-packet", type=float, default=0.1, help="distinct flows as a fraction of packets")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 = as fast as possible, 1 = recorded timing")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+
+    print(
+        f"{'packets':>9} {'flows':>8} {'seconds':>8} {'pps':>9} {'flows/s':>9} "
+        f"{'p50 ms':>7} {'p99 ms':>7} {'passes':>7} {'RSS MB':>7}"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="bench-replay-") as tmp:
+        model_path = Path(tmp) / "model.pkl"
+        joblib.dump(train_model(), model_path)
+
+        for n in args.packets:
+            pcap = Path(tmp) / f"replay-{n}.pcap"
+            write_pcap(pcap, synthetic_frames(n, max(1, int(n * args.flows_per_packet))))
+
+            results = ctx.Queue()
+            child = ctx.Process(target=replay_child, args=(str(pcap), str(model_path), args.speed, results))
+            child.start()
+            stats = results.get()
+            child.join()
+            pcap.unlink()
+
+            print(
+                f"{stats['packets']:>9,} {stats['flows']:>8,} {stats['seconds']:>8.2f} {stats['pps']:>9,.0f} "
+                f"{stats['flows_per_sec']:>9,.0f} {stats['analysis_p50_ms']:>7.1f} {stats['analysis_p99_ms']:>7.1f} "
+                f"{stats['analysis_passes']:>7} {stats['peak_rss_mb']:>7.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Throughput of live_detection's sharded mode on a replayed pcap.
+
+    python benchmarks/bench_sharded.py --packets 200000 --flows 20000 --shards 1 2 4
+
+Writes a synthetic pcap, then pushes its frames through run_sharded()
+at full speed (no drops, packet-timestamp clock) with 1..N shard
+processes. "inline" is the single-process path for reference: parse,
+update one flow table and analyze in the capture process. Scaling is
+bounded by the cores available (``os.cpu_count()`` is printed).
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+import live_detection  # noqa: E402
+from bench_live_inference import train_model  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+from synthetic import synthetic_frames, write_pcap  # noqa: E402
+
+
+def run_inline(path):
+    live_detection.flows = FlowTable(live_detection.FLOW_TABLE_CAPACITY, idle_timeout=live_detection.FLOW_TIMEOUT)
+    next_tick = None
+
+    for frame, ts in live_detection.pcap_frames(path):
+        fields = live_detection.parse_frame(frame)
+        if fields is None:
+            continue
+        flow_key, length, dport = fields
+        live_detection.flows.update(flow_key, ts, length, dport)
+
+        if next_tick is None:
+            next_tick = ts + live_detection.FLOW_CLEANUP_INTERVAL
+        if ts >= next_tick:
+            live_detection.analyze_flows(*live_detection.collect_due_flows(ts))
+            next_tick = ts + live_detection.FLOW_CLEANUP_INTERVAL
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, default=200_000)
+    parser.add_argument("--flows", type=int, default=20_000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    live_detection.send_alert = lambda *a, **k: None
+
+    with tempfile.TemporaryDirectory(prefix="bench-sharded-") as tmp:
+        pcap = Path(tmp) / "replay.pcap"
+        model_path = Path(tmp) / "model.pkl"
+
+        write_pcap(pcap, synthetic_frames(args.packets, args.flows))
+        live_detection.model = train_model()
+        joblib.dump(live_detection.model, model_path)
+
+        print(f"cpu_count={os.cpu_count()}  packets={args.packets:,}  flows={args.flows:,}")
+        print(f"{'mode':>10} {'seconds':>8} {'pps':>10} {'vs inline':>10}")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_inline(pcap)
+        inline_s = time.perf_counter() - start
+        print(f"{'inline':>10} {inline_s:>8.2f} {args.packets / inline_s:>10,.0f} {1.0:>9.2f}x")
+
+        for n in args.shards:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = live_detection.run_sharded(
+                    live_detection.pcap_frames(pcap), n, model_path=model_path, packet_clock=True, drop_when_full=False,
+                )
+            elapsed = time.perf_counter() - start
+
+            handled = sum(s["packets"] for s in result["shards"])
+            assert handled == result["frames"] - result["non_ip"], result
+            print(f"{f'{n} shards':>10} {elapsed:>8.2f} {args.packets / elapsed:>10,.0f} {inline_s / elapsed:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Training-matrix load time and memory: the old path (default-dtype read
+plus a per-row label lambda) vs. scripts/training_data.py's downcast
+read (cold, which also writes the .npy cache) and its memory-mapped
+cache hit (warm, a retrain on the same upload).
+
+    python benchmarks/bench_train_cache.py --rows 200000 --format csv feather
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts.artifacts import ArtifactStore  # noqa: E402
+from scripts.training_data import CACHE_DIR, load_training_matrix  # noqa: E402
+from synthetic import make_flows  # noqa: E402
+
+
+def old_load(store):
+    df = store.read("preprocessed")
+    X = df.drop(columns=["Label"])
+    y = df["Label"].apply(lambda x: 0 if str(x).upper() == "BENIGN" else 1)
+    return X, y
+
+
+def new_load(store):
+    X, y, _ = load_training_matrix(store)
+    return np.asarray(X).sum(), y
+
+
+def measure(fn, store):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(store)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return elapsed * 1000, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--format", nargs="+", default=["csv", "feather"])
+    args = parser.parse_args()
+
+    df = make_flows(args.rows)
+
+    print(f"{'format':>8} {'path':>6} {'ms':>9} {'peak MB':>8}")
+
+    for fmt in args.format:
+        directory = Path(tempfile.mkdtemp())
+        try:
+            store = ArtifactStore(directory, fmt=fmt)
+            store.write("preprocessed", df)
+
+            for name, fn in (("old", old_load), ("cold", new_load), ("warm", new_load)):
+                if name == "cold":
+                    shutil.rmtree(directory / CACHE_DIR, ignore_errors=True)
+                ms, peak = measure(fn, store)
+                print(f"{fmt:>8} {name:>6} {ms:>9.1f} {peak:>8.1f}")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Hyperparameter search cost: successive halving (scripts/tuning.py) vs.
+cross-validating every candidate on every row, on the same candidates
+and folds. Prints wall time, trials and tree-fit time of each search,
+the chosen model, and the setup a search skips once the training
+matrix and fold splits are cached.
+
+    python benchmarks/bench_tuning.py --rows 50000 --candidates 24 --workers 2
+
+Flows come from synthetic.make_learnable_flows, so accuracy means something.
+"""
+
+import argparse
+import shutil
+import sys
+import time
+import uuid
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(BASE_DIR / "benchmarks"))
+
+from scripts import train_model, tuning  # noqa: E402
+from scripts.training_data import CACHE_DIR  # noqa: E402
+from synthetic import make_learnable_flows  # noqa: E402
+
+
+def setup_seconds(store, folds):
+    start = time.perf_counter()
+    name, _, _, y, _ = tuning.search_matrix(store)
+    tuning.fold_files(store.directory / CACHE_DIR, name, y, folds)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--candidates", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--folds", type=int, default=3)
+    args = parser.parse_args()
+
+    session_id = f"bench-{uuid.uuid4().hex[:8]}"
+    store = train_model.session_paths(session_id)[0]
+    base_params = train_model.build_classifier().get_params()
+
+    try:
+        store.directory.mkdir(parents=True, exist_ok=True)
+        store.write("preprocessed", make_learnable_flows(args.rows))
+
+        cold = setup_seconds(store, args.folds)
+        warm = setup_seconds(store, args.folds)
+        print(f"{args.rows:,} rows: matrix + fold setup {cold * 1000:.0f} ms cold, {warm * 1000:.1f} ms cached\n")
+
+        print(f"{'search':>10} {'seconds':>8} {'trials':>7} {'fit s':>7} {'front':>6}  {'F1':>6} {'µs/row':>7} {'MB':>5}  chosen")
+        for label, eta in (("halving", tuning.TUNE_ETA), ("every row", args.candidates + 1)):
+            start = time.perf_counter()
+            report = tuning.search(
+                store, base_params, workers=args.workers, n_candidates=args.candidates, folds=args.folds, eta=eta,
+            )
+            seconds = time.perf_counter() - start
+
+            results = [result for rung in report["rungs"] for result in rung["results"]]
+            fit = sum(result["fit_seconds"] for result in results) * args.folds
+            chosen = report["chosen"]
+            print(
+                f"{label:>10} {seconds:>8.1f} {len(results) * args.folds:>7} {fit:>7.1f} {len(report['front']):>6}  "
+                f"{chosen['f1']:>6.4f} {chosen['latency_us']:>7.1f} {chosen['size_bytes'] / 2**20:>5.1f}  "
+                f"{chosen['params']}"
+            )
+    finally:
+        shutil.rmtree(store.directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/synthetic.py
+# --------------------------------------------------
+# Synthetic CICIDS-style flow exports for benchmarks
+# --------------------------------------------------
+
+import struct
+
+import numpy as np
+import pandas as pd
+
+ATTACK_TYPES = ["BENIGN", "DoS", "DDoS", "PortScan", "SSH-BruteForce", "FTP-BruteForce"]
+
+PORTS = [80, 443, 22, 21, 23, 53, 3389, 8080, 4444, 5555]
+
+NUMERIC_FEATURES = [
+    "Flow Duration",
+    "Total Fwd Packets",
+    "Total Backward Packets",
+    "Total Length of Fwd Packets",
+    "Total Length of Bwd Packets",
+    "Fwd Packet Length Max",
+    "Fwd Packet Length Min",
+    "Fwd Packet Length Mean",
+    "Bwd Packet Length Max",
+    "Bwd Packet Length Min",
+    "Bwd Packet Length Mean",
+    "Flow Bytes/s",
+    "Flow Packets/s",
+    "Flow IAT Mean",
+    "Flow IAT Std",
+    "Fwd IAT Mean",
+    "Bwd IAT Mean",
+    "Packet Length Mean",
+    "Packet Length Std",
+    "Average Packet Size",
+]
+
+
+def make_flows(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Labelled flow export shaped like a (trimmed) CICIDS2017 CSV."""
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame({"Destination Port": rng.choice(PORTS, n_rows)})
+    for name in NUMERIC_FEATURES:
+        df[name] = rng.exponential(1000.0, n_rows).round(rng.integers(0, 6))
+
+    df["Total Fwd Packets"] = rng.integers(1, 12000, n_rows)
+    df.loc[rng.random(n_rows) < 0.01, "Flow Bytes/s"] = np.nan
+
+    df["Label"] = rng.choice(ATTACK_TYPES, n_rows, p=[0.7, 0.1, 0.08, 0.06, 0.03, 0.03])
+    return df
+
+
+def make_learnable_flows(n_rows: int, seed: int = 42, drift: bool = False) -> pd.DataFrame:
+    """
+    make_flows() with a label a model can learn: an attack when the flow
+    is short, with 5% of labels flipped. ``drift`` inverts the rule.
+    """
+    df = make_flows(n_rows, seed=seed).drop(columns=["Label"])
+    # Offset: the same seed would flip exactly the rows train_model holds back
+    rng = np.random.default_rng(seed + 1_000)
+    attack = (df["Flow Duration"] < df["Flow Duration"].quantile(0.3)) ^ (rng.random(n_rows) < 0.05)
+    if drift:
+        attack = ~attack
+    df["Attack Type"] = np.where(attack, "DoS Hulk", "BENIGN")
+    return df
+
+
+def make_predictions(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Frame shaped like predict.py output (predictions.csv)."""
+    rng = np.random.default_rng(seed + 1)
+
+    df = make_flows(n_rows, seed).rename(columns={"Label": "Attack Type"})
+    df["ml_probability"] = rng.random(n_rows)
+    df["pred_label"] = np.where(df["ml_probability"] >= 0.6, "Malicious", "Benign")
+    return df
+
+
+SIGNATURES = [
+    r"union\s+select",
+    r"<script>",
+    r"SSH-Brute",
+    r"DDoS",
+    r"(?:cmd|powershell)\.exe",
+    r"[",
+]
+
+
+def synthetic_frames(n_packets: int, n_flows: int, seed: int = 42, pps: float = 10_000.0):
+    """
+    (frame, timestamp) pairs: Ethernet/IPv4/TCP|UDP frames spread over
+    ``n_flows`` (src, dst, proto) flows, ``pps`` packets per second apart.
+    A few flows are port scans so the detector has something to find.
+    """
+    rng = np.random.default_rng(seed)
+
+    flow_ids = rng.integers(0, n_flows, n_packets)
+    payload = rng.integers(0, 1200, n_packets)
+    ports = rng.choice(PORTS, n_packets)
+    scans = flow_ids % 50 == 0
+    ports[scans] = rng.integers(1, 65535, int(scans.sum()))
+
+    ether = b"\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\x08\x00"
+    start = 1_700_000_000.0
+
+    for i, (flow, size, dport) in enumerate(zip(flow_ids.tolist(), payload.tolist(), ports.tolist())):
+        proto = 17 if flow % 7 == 0 else 6
+        src = 0x0A000000 | flow
+        dst = 0xC0A80001 + flow % 16
+
+        l4 = struct.pack("!HH", 40000 + flow % 20000, dport)
+        if proto == 6:
+            l4 += struct.pack("!IIBBHHH", i, 0, 0x50, 0x02, 65535, 0, 0)
+        else:
+            l4 += struct.pack("!HH", 8 + size, 0)
+        body = l4 + bytes(size)
+
+        ip = struct.pack("!BBHHHBBHII", 0x45, 0, 20 + len(body), i & 0xFFFF, 0, 64, proto, 0, src, dst)
+        yield ether + ip + body, start + i / pps
+
+
+def write_pcap(path, frames) -> int:
+    """Write (frame, timestamp) pairs as a classic libpcap file; returns the count."""
+    n = 0
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for frame, ts in frames:
+            sec = int(ts)
+            usec = int(round((ts - sec) * 1e6))
+            f.write(struct.pack("<IIII", sec, usec, len(frame), len(frame)))
+            f.write(frame)
+            n += 1
+    return n
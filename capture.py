@@ -0,0 +1,286 @@
+import socket
+import struct
+import sys
+import time
+
+# ===============================
+# Raw Frame Capture
+# ===============================
+#
+# Capture backends yield (frame, timestamp) pairs of raw Ethernet frames
+# without building scapy packet objects; parse_frame() then reads only the
+# IPv4/IPv6 and TCP/UDP header fields the flow table needs.
+#
+# The AF_PACKET and pcap-file backends receive into one preallocated
+# buffer and yield a memoryview of it: a frame is only valid until the
+# next one is read, so callers copy (bytes(frame)) anything they keep.
+# Scapy's L2 socket is the portable fallback (macOS/BSD/Windows, or when
+# AF_PACKET needs privileges we don't have).
+
+SNAPLEN = 65535
+ETH_P_ALL = 0x0003
+
+_ETHERTYPE = struct.Struct("!H")
+# version/IHL, flags/fragment offset, protocol, src, dst
+_IPV4 = struct.Struct("!B5xHxB2x4s4s")
+# next header, src, dst (extension headers are not walked)
+_IPV6 = struct.Struct("!6xBx16s16s")
+_DPORT = struct.Struct("!2xH")
+
+# parse_packet(): the same headers read in full for CICFlowMeter features
+# version/IHL, total length, flags/fragment offset, protocol, src, dst
+_IPV4_FULL = struct.Struct("!BxH2xHxB2x4s4s")
+# payload length, next header, src, dst
+_IPV6_FULL = struct.Struct("!4xHBx16s16s")
+# src port, dst port, data offset, flags, window
+_TCP = struct.Struct("!HH8xBBH")
+_UDP = struct.Struct("!HH")
+
+_ntop = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+# ===============================
+# Header Parsing
+# ===============================
+
+def parse_frame(frame):
+    """
+    (flow_key, length, dport) of an Ethernet frame, the same tuple
+    live_detection.packet_fields() builds from a scapy packet, or None
+    when the frame is not IPv4/IPv6. ``dport`` is None for non-TCP/UDP
+    traffic and for non-first fragments.
+    """
+    length = len(frame)
+    if length < 34:
+        return None
+
+    ethertype, = _ETHERTYPE.unpack_from(frame, 12)
+    offset = 14
+
+    if ethertype == 0x8100:  # 802.1Q VLAN tag
+        ethertype, = _ETHERTYPE.unpack_from(frame, 16)
+        offset = 18
+
+    if ethertype == 0x0800:
+        if length < offset + 20:
+            return None
+        ver_ihl, frag, proto, src, dst = _IPV4.unpack_from(frame, offset)
+        key = (socket.inet_ntoa(src), socket.inet_ntoa(dst), proto)
+        l4 = offset + (ver_ihl & 0x0F) * 4
+        first_fragment = not frag & 0x1FFF
+
+    elif ethertype == 0x86DD:
+        if length < offset + 40:
+            return None
+        proto, src, dst = _IPV6.unpack_from(frame, offset)
+        key = (_ntop(_AF_INET6, src), _ntop(_AF_INET6, dst), proto)
+        l4 = offset + 40
+        first_fragment = True
+
+    else:
+        return None
+
+    dport = None
+    if (proto == 6 or proto == 17) and first_fragment and length >= l4 + 4:
+        dport, = _DPORT.unpack_from(frame, l4)
+
+    return key, length, dport
+
+
+def parse_packet(frame):
+    """
+    (src, dst, sport, dport, proto, payload, header, flags, window) of an
+    Ethernet frame for the bidirectional flow extractor, or None when it
+    is not IPv4/IPv6. ``payload`` and ``header`` are transport payload and
+    header bytes (CICFlowMeter's packet and header lengths, taken from
+    the IP length fields so Ethernet padding is not counted); ``flags``
+    and ``window`` are the TCP flags byte and window, 0 for other
+    protocols. Ports are 0 for non-TCP/UDP traffic and non-first fragments.
+    """
+    length = len(frame)
+    if length < 34:
+        return None
+
+    ethertype, = _ETHERTYPE.unpack_from(frame, 12)
+    offset = 14
+
+    if ethertype == 0x8100:  # 802.1Q VLAN tag
+        ethertype, = _ETHERTYPE.unpack_from(frame, 16)
+        offset = 18
+
+    if ethertype == 0x0800:
+        if length < offset + 20:
+            return None
+        ver_ihl, total, frag, proto, src, dst = _IPV4_FULL.unpack_from(frame, offset)
+        src, dst = socket.inet_ntoa(src), socket.inet_ntoa(dst)
+        ip_header = (ver_ihl & 0x0F) * 4
+        l4_bytes = total - ip_header
+        first_fragment = not frag & 0x1FFF
+
+    elif ethertype == 0x86DD:
+        if length < offset + 40:
+            return None
+        l4_bytes, proto, src, dst = _IPV6_FULL.unpack_from(frame, offset)
+        src, dst = _ntop(_AF_INET6, src), _ntop(_AF_INET6, dst)
+        ip_header = 40
+        first_fragment = True
+
+    else:
+        return None
+
+    l4 = offset + ip_header
+
+    if proto == 6 and first_fragment and length >= l4 + 20:
+        sport, dport, data_offset, flags, window = _TCP.unpack_from(frame, l4)
+        header = (data_offset >> 4) * 4
+        return src, dst, sport, dport, proto, max(l4_bytes - header, 0), header, flags, window
+
+    if proto == 17 and first_fragment and length >= l4 + 8:
+        sport, dport = _UDP.unpack_from(frame, l4)
+        return src, dst, sport, dport, proto, max(l4_bytes - 8, 0), 8, 0, 0
+
+    return src, dst, 0, 0, proto, max(l4_bytes, 0), 0, 0, 0
+
+# ===============================
+# Backends
+# ===============================
+
+def afpacket_frames(iface=None, bpf=None, snaplen=SNAPLEN):
+    """
+    Frames from a Linux AF_PACKET socket (needs CAP_NET_RAW). ``bpf`` is
+    compiled with libpcap and attached in the kernel, so filtered-out
+    traffic never reaches Python.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    try:
+        if iface:
+            sock.bind((iface, 0))
+        if bpf:
+            from scapy.arch.linux import attach_filter
+            attach_filter(sock, bpf, iface)
+
+        buffer = bytearray(snaplen)
+        view = memoryview(buffer)
+        recv_into = sock.recv_into
+        now = time.time
+
+        while True:
+            n = recv_into(buffer)
+            yield view[:n], now()
+    finally:
+        sock.close()
+
+
+def scapy_frames(iface=None, bpf=None, snaplen=SNAPLEN):
+    """Frames from scapy's L2 socket: the portable fallback, no dissection."""
+    from scapy.all import conf
+
+    sock = conf.L2listen(iface=iface, filter=bpf)
+    try:
+        while True:
+            _, frame, ts = sock.recv_raw(snaplen)
+            if frame:
+                yield frame, ts if ts is not None else time.time()
+    finally:
+        sock.close()
+
+
+BACKENDS = {
+    "afpacket": afpacket_frames,
+    "scapy": scapy_frames,
+}
+
+
+def default_backend():
+    """afpacket where it can be opened, scapy otherwise."""
+    if not sys.platform.startswith("linux"):
+        return "scapy"
+
+    try:
+        socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL)).close()
+    except OSError:
+        return "scapy"
+    return "afpacket"
+
+
+def live_frames(iface=None, bpf=None, backend="auto"):
+    """Raw (frame, timestamp) pairs from a live interface."""
+    if backend == "auto":
+        backend = default_backend()
+
+    try:
+        frames = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"unknown capture backend {backend!r} (choose from {', '.join(BACKENDS)})")
+
+    return frames(iface=iface, bpf=bpf)
+
+# ===============================
+# Capture Files
+# ===============================
+
+PCAP_MAGIC = {
+    # magic: (byte order, timestamp fraction divisor)
+    0xA1B2C3D4: ("<", 1e6),
+    0xD4C3B2A1: (">", 1e6),
+    0xA1B23C4D: ("<", 1e9),
+    0x4D3CB2A1: (">", 1e9),
+}
+PCAPNG_MAGIC = 0x0A0D0D0A
+LINKTYPE_ETHERNET = 1
+
+
+def pcap_frames(path, snaplen=SNAPLEN):
+    """
+    Raw (frame, timestamp) pairs from a pcap or pcapng file. Classic pcap
+    is read record by record into one reusable buffer; pcapng goes
+    through scapy's reader.
+    """
+    with open(path, "rb") as f:
+        header = f.read(24)
+        if len(header) < 24:
+            return
+
+        magic, = struct.unpack("<I", header[:4])
+
+        if magic == PCAPNG_MAGIC:
+            yield from _pcapng_frames(path)
+            return
+
+        if magic not in PCAP_MAGIC:
+            raise ValueError(f"{path}: not a pcap/pcapng file")
+
+        order, divisor = PCAP_MAGIC[magic]
+        linktype, = struct.unpack(order + "I", header[20:24])
+        if linktype & 0x0FFFFFFF != LINKTYPE_ETHERNET:
+            raise ValueError(f"{path}: link type {linktype} is not Ethernet")
+
+        record = struct.Struct(order + "IIII")
+        buffer = bytearray(max(snaplen, SNAPLEN))
+        view = memoryview(buffer)
+        read = f.read
+        readinto = f.readinto
+
+        while True:
+            rec = read(16)
+            if len(rec) < 16:
+                return
+
+            sec, frac, caplen, _ = record.unpack(rec)
+            if caplen > len(buffer):
+                buffer = bytearray(caplen)
+                view = memoryview(buffer)
+
+            frame = view[:caplen]
+            if readinto(frame) < caplen:
+                return
+
+            yield frame, sec + frac / divisor
+
+
+def _pcapng_frames(path):
+    from scapy.utils import RawPcapNgReader
+
+    with RawPcapNgReader(str(path)) as reader:
+        for frame, meta in reader:
+            yield frame, ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
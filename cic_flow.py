@@ -0,0 +1,479 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+# ===============================
+# Bidirectional CICFlowMeter Flows
+# ===============================
+#
+# Streaming counterpart of the CICFlowMeter exports the batch models are
+# trained on (CICIDS2017 column names, see CIC_FEATURES). Packets are
+# grouped into bidirectional flows by 5-tuple: the first packet's sender
+# is the forward direction and the reversed tuple maps to the same flow.
+# Every statistic is a running one (count / mean / Welford M2 / min / max
+# / total), so a packet costs O(1) whatever the flow's length and no
+# packet is kept.
+#
+# As in CICFlowMeter, a flow ends at a FIN or RST, once it has been
+# active for CIC_FLOW_TIMEOUT, or (live-sensor addition) after
+# CIC_IDLE_TIMEOUT without packets; gaps over CIC_ACTIVITY_TIMEOUT split
+# it into active/idle periods, gaps over 1s into subflows, and 4+ payload
+# packets in one direction less than 1s apart form a bulk. Times are in
+# microseconds, lengths are transport payload bytes.
+
+CIC_FLOW_TIMEOUT = 120.0
+CIC_IDLE_TIMEOUT = 30.0
+CIC_ACTIVITY_TIMEOUT = 5.0
+SUBFLOW_GAP = 1.0
+BULK_GAP = 1.0
+BULK_MIN_PACKETS = 4
+
+FIN, SYN, RST, PSH, ACK, URG, ECE, CWR = (1 << i for i in range(8))
+
+CIC_FEATURES = [
+    "Destination Port",
+    "Flow Duration",
+    "Total Fwd Packets",
+    "Total Backward Packets",
+    "Total Length of Fwd Packets",
+    "Total Length of Bwd Packets",
+    "Fwd Packet Length Max",
+    "Fwd Packet Length Min",
+    "Fwd Packet Length Mean",
+    "Fwd Packet Length Std",
+    "Bwd Packet Length Max",
+    "Bwd Packet Length Min",
+    "Bwd Packet Length Mean",
+    "Bwd Packet Length Std",
+    "Flow Bytes/s",
+    "Flow Packets/s",
+    "Flow IAT Mean",
+    "Flow IAT Std",
+    "Flow IAT Max",
+    "Flow IAT Min",
+    "Fwd IAT Total",
+    "Fwd IAT Mean",
+    "Fwd IAT Std",
+    "Fwd IAT Max",
+    "Fwd IAT Min",
+    "Bwd IAT Total",
+    "Bwd IAT Mean",
+    "Bwd IAT Std",
+    "Bwd IAT Max",
+    "Bwd IAT Min",
+    "Fwd PSH Flags",
+    "Bwd PSH Flags",
+    "Fwd URG Flags",
+    "Bwd URG Flags",
+    "Fwd Header Length",
+    "Bwd Header Length",
+    "Fwd Packets/s",
+    "Bwd Packets/s",
+    "Min Packet Length",
+    "Max Packet Length",
+    "Packet Length Mean",
+    "Packet Length Std",
+    "Packet Length Variance",
+    "FIN Flag Count",
+    "SYN Flag Count",
+    "RST Flag Count",
+    "PSH Flag Count",
+    "ACK Flag Count",
+    "URG Flag Count",
+    "CWE Flag Count",
+    "ECE Flag Count",
+    "Down/Up Ratio",
+    "Average Packet Size",
+    "Avg Fwd Segment Size",
+    "Avg Bwd Segment Size",
+    "Fwd Header Length.1",
+    "Fwd Avg Bytes/Bulk",
+    "Fwd Avg Packets/Bulk",
+    "Fwd Avg Bulk Rate",
+    "Bwd Avg Bytes/Bulk",
+    "Bwd Avg Packets/Bulk",
+    "Bwd Avg Bulk Rate",
+    "Subflow Fwd Packets",
+    "Subflow Fwd Bytes",
+    "Subflow Bwd Packets",
+    "Subflow Bwd Bytes",
+    "Init_Win_bytes_forward",
+    "Init_Win_bytes_backward",
+    "act_data_pkt_fwd",
+    "min_seg_size_forward",
+    "Active Mean",
+    "Active Std",
+    "Active Max",
+    "Active Min",
+    "Idle Mean",
+    "Idle Std",
+    "Idle Max",
+    "Idle Min",
+]
+
+
+class RunningStats:
+    """Count, total, mean, variance (Welford), min and max of a stream."""
+
+    __slots__ = ("n", "total", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        self.n += 1
+        self.total += x
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    @property
+    def variance(self):
+        # Sample variance, as CICFlowMeter's SummaryStatistics reports it
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def summary(self):
+        """(mean, std, max, min), zeros when empty."""
+        if not self.n:
+            return 0.0, 0.0, 0.0, 0.0
+        return self.mean, self.std, self.max, self.min
+
+
+class Bulk:
+    """CICFlowMeter bulk detection for one direction."""
+
+    __slots__ = ("start", "last", "packets_helper", "bytes_helper", "count", "packets", "bytes", "duration")
+
+    def __init__(self):
+        self.start = 0.0
+        self.last = 0.0
+        self.packets_helper = 0
+        self.bytes_helper = 0
+        self.count = 0
+        self.packets = 0
+        self.bytes = 0
+        self.duration = 0.0
+
+    def add(self, ts, size, other_last):
+        # A bulk in the other direction since this one began interrupts it
+        if other_last > self.start:
+            self.start = 0.0
+        if size <= 0:
+            return
+
+        if not self.start or ts - self.last > BULK_GAP:
+            self.start = self.last = ts
+            self.packets_helper = 1
+            self.bytes_helper = size
+            return
+
+        self.packets_helper += 1
+        self.bytes_helper += size
+        if self.packets_helper == BULK_MIN_PACKETS:
+            self.count += 1
+            self.packets += self.packets_helper
+            self.bytes += self.bytes_helper
+            self.duration += ts - self.start
+        elif self.packets_helper > BULK_MIN_PACKETS:
+            self.packets += 1
+            self.bytes += size
+            self.duration += ts - self.last
+        self.last = ts
+
+    def summary(self):
+        """(avg bytes/bulk, avg packets/bulk, bytes/s within bulks)"""
+        if not self.count:
+            return 0.0, 0.0, 0.0
+        rate = self.bytes / self.duration if self.duration > 0 else 0.0
+        return self.bytes / self.count, self.packets / self.count, rate
+
+
+class BiFlow:
+
+    __slots__ = (
+        "key", "start", "last", "fwd_last", "bwd_last",
+        "fwd_len", "bwd_len", "all_len", "flow_iat", "fwd_iat", "bwd_iat",
+        "fwd_header", "bwd_header", "fwd_psh", "bwd_psh", "fwd_urg", "bwd_urg",
+        "flag_counts", "fwd_bulk", "bwd_bulk", "subflows",
+        "init_win_fwd", "init_win_bwd", "act_data_fwd", "min_seg_fwd",
+        "active_start", "active_end", "active", "idle",
+    )
+
+    def __init__(self, key, ts):
+        self.key = key
+        self.start = self.last = ts
+        self.fwd_last = self.bwd_last = None
+        self.fwd_len, self.bwd_len, self.all_len = RunningStats(), RunningStats(), RunningStats()
+        self.flow_iat, self.fwd_iat, self.bwd_iat = RunningStats(), RunningStats(), RunningStats()
+        self.fwd_header = self.bwd_header = 0
+        self.fwd_psh = self.bwd_psh = self.fwd_urg = self.bwd_urg = 0
+        self.flag_counts = [0] * 8
+        self.fwd_bulk, self.bwd_bulk = Bulk(), Bulk()
+        self.subflows = 1
+        self.init_win_fwd = self.init_win_bwd = -1
+        self.act_data_fwd = 0
+        self.min_seg_fwd = math.inf
+        self.active_start = self.active_end = ts
+        self.active, self.idle = RunningStats(), RunningStats()
+
+    def add(self, ts, forward, payload, header, flags, window):
+        if self.all_len.n:
+            gap = ts - self.last
+            self.flow_iat.add(gap * 1e6)
+            if gap > SUBFLOW_GAP:
+                self.subflows += 1
+            if ts - self.active_end > CIC_ACTIVITY_TIMEOUT:
+                if self.active_end > self.active_start:
+                    self.active.add((self.active_end - self.active_start) * 1e6)
+                self.idle.add((ts - self.active_end) * 1e6)
+                self.active_start = ts
+        self.active_end = ts
+        self.last = ts
+        self.all_len.add(payload)
+
+        for bit in range(8):
+            if flags >> bit & 1:
+                self.flag_counts[bit] += 1
+
+        if forward:
+            if self.fwd_last is not None:
+                self.fwd_iat.add((ts - self.fwd_last) * 1e6)
+            self.fwd_last = ts
+            self.fwd_len.add(payload)
+            self.fwd_header += header
+            self.fwd_psh += bool(flags & PSH)
+            self.fwd_urg += bool(flags & URG)
+            if self.init_win_fwd < 0 and header:
+                self.init_win_fwd = window
+            if payload >= 1:
+                self.act_data_fwd += 1
+            if header < self.min_seg_fwd:
+                self.min_seg_fwd = header
+            self.fwd_bulk.add(ts, payload, self.bwd_bulk.last)
+        else:
+            if self.bwd_last is not None:
+                self.bwd_iat.add((ts - self.bwd_last) * 1e6)
+            self.bwd_last = ts
+            self.bwd_len.add(payload)
+            self.bwd_header += header
+            self.bwd_psh += bool(flags & PSH)
+            self.bwd_urg += bool(flags & URG)
+            if self.init_win_bwd < 0 and header:
+                self.init_win_bwd = window
+            self.bwd_bulk.add(ts, payload, self.fwd_bulk.last)
+
+    def features(self):
+        """One row of CIC_FEATURES."""
+        duration = (self.last - self.start) * 1e6
+        seconds = duration / 1e6
+        fwd, bwd, both = self.fwd_len, self.bwd_len, self.all_len
+
+        def per_second(x):
+            return x / seconds if seconds > 0 else 0.0
+
+        # The period still open when the flow ended counts as active
+        active = self.final_active() if self.active_end > self.active_start else self.active.summary()
+
+        fwd_mean, fwd_std, fwd_max, fwd_min = fwd.summary()
+        bwd_mean, bwd_std, bwd_max, bwd_min = bwd.summary()
+        flow_iat = self.flow_iat.summary()
+        fwd_iat = self.fwd_iat.summary()
+        bwd_iat = self.bwd_iat.summary()
+        flags = self.flag_counts
+        packets = both.n
+
+        return [
+            self.key[3],
+            duration,
+            fwd.n,
+            bwd.n,
+            fwd.total,
+            bwd.total,
+            fwd_max,
+            fwd_min,
+            fwd_mean,
+            fwd_std,
+            bwd_max,
+            bwd_min,
+            bwd_mean,
+            bwd_std,
+            per_second(both.total),
+            per_second(packets),
+            *flow_iat,
+            self.fwd_iat.total,
+            *fwd_iat,
+            self.bwd_iat.total,
+            *bwd_iat,
+            self.fwd_psh,
+            self.bwd_psh,
+            self.fwd_urg,
+            self.bwd_urg,
+            self.fwd_header,
+            self.bwd_header,
+            per_second(fwd.n),
+            per_second(bwd.n),
+            both.min if packets else 0.0,
+            both.max if packets else 0.0,
+            both.mean,
+            both.std,
+            both.variance,
+            flags[0],  # FIN
+            flags[1],  # SYN
+            flags[2],  # RST
+            flags[3],  # PSH
+            flags[4],  # ACK
+            flags[5],  # URG
+            flags[7],  # CWR (CICFlowMeter's "CWE")
+            flags[6],  # ECE
+            bwd.n // fwd.n if fwd.n else 0,
+            both.total / packets if packets else 0.0,
+            fwd_mean,
+            bwd_mean,
+            self.fwd_header,
+            *self.fwd_bulk.summary(),
+            *self.bwd_bulk.summary(),
+            fwd.n / self.subflows,
+            fwd.total / self.subflows,
+            bwd.n / self.subflows,
+            bwd.total / self.subflows,
+            self.init_win_fwd,
+            self.init_win_bwd,
+            self.act_data_fwd,
+            self.min_seg_fwd if fwd.n else 0,
+            *active,
+            *self.idle.summary(),
+        ]
+
+    def final_active(self):
+        """Active-period summary including the period open at the end."""
+        stats = RunningStats()
+        for name in RunningStats.__slots__:
+            setattr(stats, name, getattr(self.active, name))
+        stats.add((self.active_end - self.active_start) * 1e6)
+        return stats.summary()
+
+
+class CICFlowTable:
+    """
+    Bidirectional flows by 5-tuple, at most ``capacity`` open at once
+    (least recently seen are closed first). Finished flows queue up as
+    feature rows until collect(); rows handed back with requeue() are
+    kept up to ``capacity`` as well, oldest dropped (counted as lost).
+    """
+
+    def __init__(self, capacity, idle_timeout=CIC_IDLE_TIMEOUT, flow_timeout=CIC_FLOW_TIMEOUT):
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.flow_timeout = flow_timeout
+        # Ordered by last packet: idle flows and eviction victims are at the front
+        self.flows = OrderedDict()
+        self.finished_keys = []
+        self.finished_rows = []
+
+        self.inserted = 0
+        self.closed = 0
+        self.expired = 0
+        self.evicted = 0
+        self.lost = 0
+
+    def __len__(self):
+        return len(self.flows)
+
+    def update(self, packet, ts):
+        """Account one parse_packet() tuple seen at ``ts``."""
+        src, dst, sport, dport, proto, payload, header, flags, window = packet
+        key = (src, dst, sport, dport, proto)
+
+        flow = self.flows.get(key)
+        forward = True
+        if flow is None:
+            reverse = (dst, src, dport, sport, proto)
+            flow = self.flows.get(reverse)
+            if flow is not None:
+                key, forward = reverse, False
+
+        if flow is not None and ts - flow.start > self.flow_timeout:
+            self.finish(key)
+            flow = None
+            forward = True
+            key = (src, dst, sport, dport, proto)
+
+        if flow is None:
+            if len(self.flows) >= self.capacity:
+                self.finish(next(iter(self.flows)))
+                self.evicted += 1
+            flow = self.flows[key] = BiFlow(key, ts)
+            self.inserted += 1
+        else:
+            self.flows.move_to_end(key)
+
+        flow.add(ts, forward, payload, header, flags, window)
+
+        if flags & (FIN | RST):
+            self.finish(key)
+            self.closed += 1
+
+    def finish(self, key):
+        flow = self.flows.pop(key)
+        self.finished_keys.append(key)
+        self.finished_rows.append(flow.features())
+
+    def expire(self, now):
+        """Finish flows idle for idle_timeout; returns how many."""
+        n = 0
+        while self.flows:
+            key, flow = next(iter(self.flows.items()))
+            if now - flow.last < self.idle_timeout:
+                break
+            self.finish(key)
+            n += 1
+        self.expired += n
+        return n
+
+    def finish_all(self):
+        for key in list(self.flows):
+            self.finish(key)
+
+    def collect(self):
+        """(keys, X) of the flows finished since the last call; X columns are CIC_FEATURES."""
+        keys, rows = self.finished_keys, self.finished_rows
+        self.finished_keys, self.finished_rows = [], []
+        X = np.array(rows, dtype=np.float64).reshape(len(rows), len(CIC_FEATURES))
+        return keys, X
+
+    def requeue(self, keys, X):
+        """Put collect()'s flows back in front of any finished since, for the next collect()."""
+        self.finished_keys[:0] = keys
+        self.finished_rows[:0] = X.tolist()
+
+        excess = len(self.finished_rows) - self.capacity
+        if excess > 0:
+            del self.finished_keys[:excess]
+            del self.finished_rows[:excess]
+            self.lost += excess
+
+    def stats(self):
+        return {
+            "flows": len(self.flows),
+            "capacity": self.capacity,
+            "inserted": self.inserted,
+            "closed": self.closed,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "lost": self.lost,
+            "pending": len(self.finished_rows),
+        }
@@ -0,0 +1,201 @@
+from functools import lru_cache
+
+import numpy as np
+
+# ===============================
+# Fixed-Budget Flow Table
+# ===============================
+#
+# Per-flow counters live in preallocated NumPy arrays; a dict maps each
+# (src, dst, proto) key to its slot. Distinct destination ports are kept
+# in a small per-flow bitmap (linear counting) instead of a set, so a
+# scan touching thousands of ports costs the same as one touching two.
+# When every slot is taken, idle flows are expired and, failing that,
+# the least recently seen flows are evicted in a batch.
+
+PORT_SKETCH_BITS = 256
+EVICT_FRACTION = 1 / 16
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def port_bit_table(port_bits):
+    """
+    Sketch bit for every port number. Ports go through a murmur3-style
+    mixer first: linear counting assumes random placement, and sequential
+    scan ports would otherwise spread too evenly and be overcounted.
+    """
+    x = np.arange(65536, dtype=np.uint64)
+    x ^= x >> np.uint64(16)
+    x = (x * np.uint64(0x85EBCA6B)) & np.uint64(0xFFFFFFFF)
+    x ^= x >> np.uint64(13)
+    x = (x * np.uint64(0xC2B2AE35)) & np.uint64(0xFFFFFFFF)
+    x ^= x >> np.uint64(16)
+    return (x % np.uint64(port_bits)).astype(np.int64).tolist()
+
+
+class FlowTable:
+
+    def __init__(self, capacity, idle_timeout=None, port_bits=PORT_SKETCH_BITS):
+        if port_bits % 64:
+            raise ValueError("port_bits must be a multiple of 64")
+
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.port_bits = port_bits
+        self.port_bit = port_bit_table(port_bits)
+
+        self.start_time = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.packet_count = np.zeros(capacity, dtype=np.int64)
+        self.total_bytes = np.zeros(capacity, dtype=np.int64)
+        self.port_sketch = np.zeros((capacity, port_bits // 64), dtype=np.uint64)
+        self.used = np.zeros(capacity, dtype=bool)
+
+        self.slots = {}
+        self.keys = np.empty(capacity, dtype=object)
+        self.free = list(range(capacity - 1, -1, -1))
+
+        self.inserted = 0
+        self.expired = 0
+        self.evicted = 0
+        self.peak = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    # ===============================
+    # Packet Path
+    # ===============================
+
+    def update(self, key, now, length, dport=None):
+        """Account one packet to ``key``'s flow, creating it if needed."""
+        slot = self.slots.get(key)
+
+        if slot is None:
+            slot = self._insert(key, now)
+
+        self.last_seen[slot] = now
+        self.packet_count[slot] += 1
+        self.total_bytes[slot] += length
+
+        if dport:
+            bit = self.port_bit[dport]
+            self.port_sketch[slot, bit >> 6] |= np.uint64(1 << (bit & 63))
+
+        return slot
+
+    def _insert(self, key, now):
+        if not self.free:
+            self._make_room(now)
+
+        slot = self.free.pop()
+        self.slots[key] = slot
+        self.keys[slot] = key
+        self.used[slot] = True
+        self.start_time[slot] = now
+
+        self.inserted += 1
+        if len(self.slots) > self.peak:
+            self.peak = len(self.slots)
+        return slot
+
+    def _make_room(self, now):
+        if self.idle_timeout is not None:
+            self.expire(now, self.idle_timeout)
+            if self.free:
+                return
+
+        # Evict a batch at once so a flood of new keys pays for the scan
+        # once per batch rather than once per packet
+        n = max(1, int(self.capacity * EVICT_FRACTION))
+        oldest = np.argpartition(self.last_seen, n - 1)[:n]
+        self.evicted += self._release(oldest)
+
+    # ===============================
+    # Analysis Path
+    # ===============================
+
+    def active_slots(self):
+        return np.flatnonzero(self.used)
+
+    def due(self, now, min_age):
+        """Slots of flows open for at least ``min_age`` seconds."""
+        return np.flatnonzero(self.used & (now - self.start_time >= min_age))
+
+    def flow_keys(self, slots):
+        return self.keys[slots].tolist()
+
+    def features(self, slots):
+        """(duration, packet_count, byte_count, bytes_per_sec) rows for ``slots``."""
+        duration = self.last_seen[slots] - self.start_time[slots]
+        byte_count = self.total_bytes[slots].astype(np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(duration > 0, byte_count / duration, 0.0)
+
+        return np.column_stack([
+            duration,
+            self.packet_count[slots].astype(np.float64),
+            byte_count,
+            rate,
+        ])
+
+    def distinct_ports(self, slots):
+        """Estimated distinct destination ports per slot (linear counting)."""
+        sketch = self.port_sketch[slots]
+        ones = _POPCOUNT[sketch.view(np.uint8)].reshape(len(slots), self.port_bits // 8).sum(axis=1)
+
+        m = self.port_bits
+        zeros = np.maximum(m - ones, 1)
+        return np.rint(m * np.log(m / zeros)).astype(np.int64)
+
+    def expire(self, now, timeout):
+        """Drop flows idle for ``timeout`` seconds; returns how many."""
+        idle = np.flatnonzero(self.used & (now - self.last_seen >= timeout))
+        n = self._release(idle)
+        self.expired += n
+        return n
+
+    def _release(self, slots):
+        slots = slots[self.used[slots]]
+
+        for key in self.keys[slots]:
+            del self.slots[key]
+
+        self.keys[slots] = None
+        self.used[slots] = False
+        self.start_time[slots] = 0
+        self.last_seen[slots] = 0
+        self.packet_count[slots] = 0
+        self.total_bytes[slots] = 0
+        self.port_sketch[slots] = 0
+        self.free.extend(slots.tolist())
+
+        return len(slots)
+
+    # ===============================
+    # Stats
+    # ===============================
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (
+            self.start_time, self.last_seen, self.packet_count,
+            self.total_bytes, self.port_sketch, self.used, self.keys,
+        ))
+
+    def stats(self):
+        return {
+            "flows": len(self.slots),
+            "capacity": self.capacity,
+            "occupancy": len(self.slots) / self.capacity,
+            "peak": self.peak,
+            "inserted": self.inserted,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "array_bytes": self.nbytes(),
+        }
@@ -1,10 +1,25 @@
-from scapy.all import sniff
-from collections import defaultdict
+from scapy.all import Ether, sniff
+import argparse
+import atexit
+import multiprocessing as mp
+import resource
+import zlib
+import numpy as np
 import pandas as pd
 import joblib
+import re
 import time
-import requests
+import queue
 import threading
+from collections import deque
+from pathlib import Path
+
+from alert_dispatcher import AlertDispatcher
+from capture import live_frames, parse_frame, parse_packet, pcap_frames
+from cic_flow import CIC_FEATURES, CICFlowTable
+from flow_table import FlowTable
+from scripts.compiled_forest import load_compiled
+from scripts.predict import COLUMN_MAPPING, THRESHOLD
 
 # ===============================
 # Configuration
@@ -13,6 +28,9 @@ import threading
 MODEL_PATH = "random_forest_model.pkl"
 # CLOUD_API = "https://hybrid-intrusion-detection-system.onrender.com/api/alert/"
 CLOUD_API = "http://127.0.0.1:8000/api/alert/"
+CLOUD_BULK_API = "http://127.0.0.1:8000/api/alerts/bulk/"
+# Alerts that could not be delivered wait here until the collector is back
+ALERT_SPOOL = "alert_spool.ndjson"
 
 FLOW_TIMEOUT = 5
 DOS_PACKET_THRESHOLD = 100
@@ -20,170 +38,422 @@ PORT_SCAN_THRESHOLD = 20
 CONFIDENCE_THRESHOLD = 0.80
 ALERT_COOLDOWN = 30
 FLOW_CLEANUP_INTERVAL = 2
+FLOW_ANALYZE_AFTER = 3
+
+# Flow table memory budget: at most this many concurrent flows are tracked;
+# beyond it idle, then least recently seen, flows are evicted
+FLOW_TABLE_CAPACITY = 65536
+FLOW_STATS_INTERVAL = 60
+
+# Capture → aggregator hand-off. Packets arriving while the buffer is full
+# are dropped (and counted) rather than blocking the capture callback.
+PACKET_BUFFER_SIZE = 200_000
+AGGREGATE_BATCH = 5000
+AGGREGATE_IDLE_SLEEP = 0.002
+# Snapshots waiting for the analyzer; older ticks are dropped when it lags
+ANALYSIS_BACKLOG = 2
+
+# Model input columns, in training order (see quick_train.py)
+FEATURES = ["duration", "packet_count", "byte_count", "bytes_per_sec"]
 
 # ===============================
 # Load Model
 # ===============================
 
-model = joblib.load(MODEL_PATH)
+model = None
+compiled_model = None
+
+# Ticks up to this many flows are scored by the compiled forest; past
+# that sklearn's own tree walk is faster
+COMPILED_MAX_ROWS = 256
+
+
+def load_model(path=MODEL_PATH):
+    global model, compiled_model
+    model = joblib.load(path)
+    compiled_model = load_compiled(path, model) if hasattr(model, "estimators_") else None
+    return model
 
 # ===============================
-# Flow Storage (Thread-Safe)
+# Session (Batch-Trained) Model
 # ===============================
+#
+# With --session-model the sensor also builds bidirectional CICFlowMeter
+# flows (cic_flow.py) and scores each finished flow with a model trained
+# by the batch pipeline on CICIDS-style exports; the signature checks
+# keep running on the basic flow table.
+
+session_model = None
+session_compiled = None
+session_features = []
+# Column of CIC_FEATURES feeding each model feature, -1 when it has none
+session_columns = None
+cic_flows = None
+
+
+def feature_key(name):
+    """Column name without case, spaces or punctuation ("Flow Bytes/s" == "FlowBytsPerSec" after mapping)."""
+    name = COLUMN_MAPPING.get(name.strip(), name.strip())
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def load_session_model(path, features_path=None):
+    """
+    Load a trained session's model.pkl (and model_features.pkl beside it)
+    and start the bidirectional flow extractor. Model features the
+    extractor does not produce are fed 0, as predict.py does.
+    """
+    global session_model, session_compiled, session_features, session_columns, cic_flows
+
+    path = Path(path)
+    session_model = joblib.load(path)
+    session_features = list(joblib.load(features_path or path.with_name("model_features.pkl")))
+
+    if len(session_model.classes_) != 2:
+        raise ValueError("Session model is not binary classification.")
+    # model_compiled.pkl, written by train_model.py beside model.pkl
+    session_compiled = load_compiled(path, session_model) if hasattr(session_model, "estimators_") else None
 
-flows = defaultdict(lambda: {
-    "start_time": None,
-    "last_seen": None,
-    "packet_count": 0,
-    "total_bytes": 0,
-    "ports": set(),
-})
+    index = {feature_key(name): i for i, name in enumerate(CIC_FEATURES)}
+    session_columns = np.array([index.get(feature_key(name), -1) for name in session_features])
 
-flows_lock = threading.Lock()
-last_alert_time = {}
+    missing = [name for name, col in zip(session_features, session_columns) if col < 0]
+    if missing:
+        print(f"[SESSION MODEL] {len(missing)} features not extracted live, fed 0: {missing}")
+
+    cic_flows = CICFlowTable(FLOW_TABLE_CAPACITY)
+    return session_model
+
+
+def session_matrix(X):
+    """CIC_FEATURES rows → the session model's columns, in training order."""
+    out = X[:, np.maximum(session_columns, 0)]
+    out[:, session_columns < 0] = 0
+    return out
+
+# ===============================
+# Flow Storage
+# ===============================
+#
+# Only the aggregator thread touches the flow table, so it needs no lock.
+# The capture callback appends to packet_buffer (deque.append is atomic)
+# and the analyzer works on snapshots handed over through analysis_queue.
+
+flows = FlowTable(FLOW_TABLE_CAPACITY, idle_timeout=FLOW_TIMEOUT)
+
+packet_buffer = deque()
+analysis_queue = queue.Queue(maxsize=ANALYSIS_BACKLOG)
+
+ingest_stats = {
+    "captured": 0,           # packets handed to the buffer
+    "dropped": 0,            # packets dropped: buffer full (backpressure)
+    "aggregated": 0,         # packets applied to the flow table
+    "snapshots_dropped": 0,  # analysis ticks skipped: analyzer still busy
+}
+
+# Timestamp of the newest packet applied to the flow table (replay clock)
+last_packet_ts = 0.0
+# Seconds from snapshot to verdicts, for the most recent analysis passes
+analysis_latency = deque(maxlen=10_000)
 
 # ===============================
 # Alert Sender (Non-Blocking)
 # ===============================
+#
+# Alerts are batched to the collector by one dispatcher thread (see
+# alert_dispatcher.py); the per-IP cooldown is enforced there under a lock.
 
-def send_alert(ip, attack_type, severity="High"):
-    now = time.time()
+alerts = AlertDispatcher(CLOUD_BULK_API, single_url=CLOUD_API, cooldown=ALERT_COOLDOWN, spool_path=ALERT_SPOOL)
 
-    if ip in last_alert_time:
-        if now - last_alert_time[ip] < ALERT_COOLDOWN:
-            return
 
-    def async_alert():
-        try:
-            response = requests.post(
-                CLOUD_API,
-                json={
-                    "ip": ip,
-                    "attack_type": attack_type,
-                    "severity": severity
-                },
-                timeout=5
-            )
-            print(f"[ALERT SENT] {ip} → {attack_type} ({response.status_code})")
-        except Exception as e:
-            print("Failed to send alert:", e)
-
-    threading.Thread(target=async_alert, daemon=True).start()
-    last_alert_time[ip] = now
+def send_alert(ip, attack_type, severity="High"):
+    alerts.submit(ip, attack_type, severity)
 
 # ===============================
 # Flow Analyzer
 # ===============================
-def analyze_flow(flow_key, flow):
 
-    src, dst, proto = flow_key
+def classify(X):
+    """
+    Labels and attack probabilities for a (n_flows, len(FEATURES)) matrix
+    from one predict_proba call; predict() would walk the forest again.
+    """
+    if compiled_model is not None and len(X) <= COMPILED_MAX_ROWS:
+        clf = compiled_model
+    else:
+        clf = model
+        # Fitted on a DataFrame: one frame per batch keeps sklearn's name check quiet
+        if getattr(model, "feature_names_in_", None) is not None:
+            X = pd.DataFrame(X, columns=FEATURES)
+
+    proba = clf.predict_proba(X)
+    labels = clf.classes_[proba.argmax(axis=1)]
+
+    return labels, proba[:, 1]
+
+
+def analyze_flows(keys, X, port_counts, alert=None):
+    """
+    Run the hybrid checks on a batch of flows (one row of X per key).
+    Alerts go to ``alert(ip, attack_type, severity)``, send_alert by default.
+    """
+    if not keys:
+        return
+
+    alert = alert or send_alert
 
-    duration = (flow["last_seen"] - flow["start_time"]) if flow["start_time"] else 0
-    packet_count = flow["packet_count"]
-    byte_count = flow["total_bytes"]
+    # With only a session model loaded, these flows get the signature checks alone
+    if model is None:
+        predictions = probs = [None] * len(keys)
+    else:
+        predictions, probs = classify(X)
 
-    features = {
-        "duration": duration,
-        "packet_count": packet_count,
-        "byte_count": byte_count,
-        "bytes_per_sec": byte_count / duration if duration > 0 else 0
-    }
+    for (src, dst, proto), row, n_ports, prediction, prob in zip(keys, X, port_counts, predictions, probs):
+        packet_count = row[1]
+        byte_count = row[2]
 
-    df = pd.DataFrame([features])
-
-    prediction = model.predict(df)[0]
-    prob = model.predict_proba(df)[0][1]
-
-    attack_type = None
-    severity = "Medium"
-
-    # ======================
-    # ML Detection
-    # ======================
-
-    if prediction != "BENIGN":
-        attack_type = "ML-Attack"
-        severity = "High"
-
-    # ======================
-    # Signature Detection
-    # ======================
-
-    # ======================
-    # Signature Detection
-    # ======================
-
-    # Data Exfiltration (Large data transfer)
-    if byte_count > 5000:
-        attack_type = "Data Exfiltration"
-        severity = "High"
-    
-    # elif packet_count > 20000:
-    #     attack_type = "Data Flood"
-    #     severity = "High"
-# Port Scan (many ports accessed)
-    elif len(flow["ports"]) > 5:
-        attack_type = "Port Scan"
+        attack_type = None
         severity = "Medium"
 
-# DoS (many packets in short time)
-    elif packet_count > 20:
-        attack_type = "DoS Attack"
-        severity = "High"
+        # ======================
+        # ML Detection
+        # ======================
+
+        if prediction is not None and prediction != "BENIGN":
+            attack_type = "ML-Attack"
+            severity = "High"
+
+        # ======================
+        # Signature Detection
+        # ======================
+
+        # Data Exfiltration (Large data transfer)
+        if byte_count > 5000:
+            attack_type = "Data Exfiltration"
+            severity = "High"
+
+        # elif packet_count > 20000:
+        #     attack_type = "Data Flood"
+        #     severity = "High"
+        # Port Scan (many ports accessed)
+        elif n_ports > 5:
+            attack_type = "Port Scan"
+            severity = "Medium"
+
+        # DoS (many packets in short time)
+        elif packet_count > 20:
+            attack_type = "DoS Attack"
+            severity = "High"
+
+        # ======================
+        # Hybrid Decision
+        # ======================
+
+        if attack_type:
+            print(f"[HYBRID ALERT] {src} → {attack_type}")
+            alert(src, attack_type, severity)
+
+        if prediction is not None:
+            print(f"{src} → prediction={prediction}, prob={prob:.2f}")
+
+
+def score_finished_flows(keys, X, alert=None):
+    """
+    Score bidirectional flows (one CIC_FEATURES row of X per 5-tuple key)
+    with the session model; the flow's initiator is alerted on.
+    """
+    if not keys:
+        return
+
+    alert = alert or send_alert
+    X = session_matrix(X)
+
+    if session_compiled is not None and len(X) <= COMPILED_MAX_ROWS:
+        proba = session_compiled.predict_proba(X)
+    else:
+        proba = session_model.predict_proba(pd.DataFrame(X, columns=session_features))
 
-    # ======================
-    # Hybrid Decision
-    # ======================
+    # Trained on binarized labels: class 1 is an attack (see train_model.py)
+    for (src, dst, sport, dport, proto), prob in zip(keys, proba[:, 1]):
+        if prob >= THRESHOLD:
+            print(f"[ML ALERT] {src}:{sport} → {dst}:{dport} prob={prob:.2f}")
+            alert(src, "ML-Attack", "High")
 
-    if attack_type:
-        print(f"[HYBRID ALERT] {src} → {attack_type}")
-        send_alert(src, attack_type, severity)
 
-    print(f"{src} → prediction={prediction}, prob={prob:.2f}")
-    
 # ===============================
-# Flow Cleanup Thread
+# Aggregator / Analyzer Threads
 # ===============================
 
-def cleanup_flows():
-    while True:
+def collect_due_flows(now, expire=True):
+    """
+    Snapshot the flows due for analysis (open for FLOW_ANALYZE_AFTER
+    seconds) as one feature matrix, and drop flows idle past FLOW_TIMEOUT
+    (unless ``expire`` is False). Aggregator thread only.
+    """
+    slots = flows.due(now, FLOW_ANALYZE_AFTER)
+
+    keys = flows.flow_keys(slots)
+    X = flows.features(slots)
+    port_counts = flows.distinct_ports(slots)
+
+    # remove old flows
+    if expire:
+        flows.expire(now, FLOW_TIMEOUT)
+
+    return keys, X, port_counts
+
+
+def collect_finished_flows(now):
+    """Bidirectional flows finished since the last tick, None without a session model."""
+    if cic_flows is None:
+        return None
+
+    cic_flows.expire(now)
+    return cic_flows.collect()
+
+
+def dispatch_snapshot(now, block=False):
+    """
+    Hand the due flows to the analyzer. Live capture skips the tick when
+    the analyzer is still busy; replay (``block``) waits for it instead.
+    A skipped tick loses nothing: idle flows are only expired once their
+    last snapshot is queued, and finished bidirectional flows go back to
+    cic_flows for the next tick.
+    """
+    finished = collect_finished_flows(now)
+    snapshot = (collect_due_flows(now, expire=False), time.perf_counter(), finished)
+
+    try:
+        analysis_queue.put(snapshot, block=block)
+    except queue.Full:
+        ingest_stats["snapshots_dropped"] += 1
+        if finished is not None:
+            cic_flows.requeue(*finished)
+        return
+
+    flows.expire(now, FLOW_TIMEOUT)
+
+
+def print_flow_stats():
+    stats = flows.stats()
+
+    print(
+        f"[FLOWS] {stats['flows']}/{stats['capacity']} slots "
+        f"({stats['occupancy']:.0%}, peak {stats['peak']}), "
+        f"expired={stats['expired']} evicted={stats['evicted']} | "
+        f"captured={ingest_stats['captured']} dropped={ingest_stats['dropped']} "
+        f"buffered={len(packet_buffer)} skipped_ticks={ingest_stats['snapshots_dropped']}"
+    )
 
-        time.sleep(FLOW_CLEANUP_INTERVAL)
-        now = time.time()
+    if cic_flows is not None:
+        cic = cic_flows.stats()
+        print(
+            f"[CIC FLOWS] {cic['flows']}/{cic['capacity']} open, closed={cic['closed']} "
+            f"expired={cic['expired']} evicted={cic['evicted']} "
+            f"pending={cic['pending']} lost={cic['lost']}"
+        )
 
-        with flows_lock:
 
-            for key, flow in list(flows.items()):
+def drain_packets(limit=AGGREGATE_BATCH):
+    """Apply up to ``limit`` buffered packets to the flow table."""
+    global last_packet_ts
+    drained = 0
+    ts = None
 
-                if not flow["start_time"]:
-                    continue
+    while drained < limit:
+        try:
+            flow_key, ts, length, dport, packet = packet_buffer.popleft()
+        except IndexError:
+            break
+
+        flows.update(flow_key, ts, length, dport)
+        if packet is not None:
+            cic_flows.update(packet, ts)
+        drained += 1
+
+    if drained:
+        last_packet_ts = ts
+    ingest_stats["aggregated"] += drained
+    return drained
+
+
+def aggregate_packets(stop=None, packet_clock=False):
+    """
+    Own the flow table: apply buffered packets, snapshot due flows each tick.
+    With ``packet_clock`` ticks follow packet timestamps (pcap replay) and
+    no tick is skipped; otherwise they follow the wall clock.
+    """
+    next_tick = None if packet_clock else time.time() + FLOW_CLEANUP_INTERVAL
+    next_stats = time.time() + FLOW_STATS_INTERVAL
+
+    while stop is None or not stop.is_set():
+
+        drained = drain_packets()
 
-                duration = now - flow["start_time"]
+        if packet_clock:
+            now = last_packet_ts
+            if next_tick is None and drained:
+                next_tick = now + FLOW_CLEANUP_INTERVAL
+        else:
+            now = time.time()
 
-                # analyze flow periodically
-                if duration >= 3:
-                    analyze_flow(key, flow)
+        if next_tick is not None and now >= next_tick:
+            dispatch_snapshot(now, block=packet_clock)
+            next_tick = now + FLOW_CLEANUP_INTERVAL
 
-                # remove old flows
-                if flow["last_seen"] and (now - flow["last_seen"] >= FLOW_TIMEOUT):
-                    del flows[key]
-            expired = [
-                key for key, flow in flows.items()
-                if flow["last_seen"] and (now - flow["last_seen"] >= FLOW_TIMEOUT)
-            ]
+        if time.time() >= next_stats:
+            print_flow_stats()
+            next_stats = time.time() + FLOW_STATS_INTERVAL
 
-            for key in expired:
-                analyze_flow(key, flows[key])
-                del flows[key]
+        if not drained:
+            time.sleep(AGGREGATE_IDLE_SLEEP)
+
+
+def analyze_snapshot(item):
+    snapshot, taken_at, finished = item
+    analyze_flows(*snapshot)
+    if finished is not None:
+        score_finished_flows(*finished)
+    analysis_latency.append(time.perf_counter() - taken_at)
+
+
+def analyze_snapshots():
+    while True:
+        item = analysis_queue.get()
+        try:
+            analyze_snapshot(item)
+        finally:
+            analysis_queue.task_done()
 
 # ===============================
 # Packet Processor
 # ===============================
 
-def process_packet(packet):
-
+def enqueue_packet(flow_key, ts, length, dport, wait=False, packet=None):
+    """
+    Capture-side hand-off: never blocks, drops when the buffer is full.
+    Replay passes ``wait`` to pause until the aggregator catches up instead.
+    ``packet`` is the parse_packet() tuple for the bidirectional flows.
+    """
+    while len(packet_buffer) >= PACKET_BUFFER_SIZE:
+        if not wait:
+            ingest_stats["dropped"] += 1
+            return False
+        time.sleep(AGGREGATE_IDLE_SLEEP)
+
+    packet_buffer.append((flow_key, ts, length, dport, packet))
+    ingest_stats["captured"] += 1
+    return True
+
+
+def packet_fields(packet):
+    """
+    (flow_key, length, dport) of a dissected scapy packet, None for
+    anything but IPv4. Used by the scapy fallback; raw frames go through
+    capture.parse_frame instead.
+    """
     if not packet.haslayer("IP"):
-        return
+        return None
 
     src = packet["IP"].src
     dst = packet["IP"].dst
@@ -195,32 +465,398 @@ def process_packet(packet):
     elif packet.haslayer("UDP"):
         dport = packet["UDP"].dport
 
-    flow_key = (src, dst, proto)
+    return (src, dst, proto), len(packet), dport
+
+
+def process_packet(packet, ts=None, wait=False):
+    """Capture callback; ``ts`` is the packet's timestamp, now when omitted."""
+    if cic_flows is not None:
+        # The flow extractor needs the full header fields: read them raw
+        return process_frame(bytes(packet), ts, wait)
+
+    fields = packet_fields(packet)
+
+    if fields is None:
+        return
+
+    flow_key, length, dport = fields
+    enqueue_packet(flow_key, time.time() if ts is None else ts, length, dport, wait=wait)
+
 
-    with flows_lock:
-        flow = flows[flow_key]
+def process_frame(frame, ts=None, wait=False):
+    """process_packet for a raw Ethernet frame: header fields only, no dissection."""
+    ts = time.time() if ts is None else ts
 
-        now = time.time()
+    if cic_flows is not None:
+        packet = parse_packet(frame)
+        if packet is None:
+            return
+        src, dst, sport, dport, proto = packet[:5]
+        enqueue_packet((src, dst, proto), ts, len(frame), dport or None, wait=wait, packet=packet)
+        return
+
+    fields = parse_frame(frame)
+
+    if fields is None:
+        return
 
-        if flow["start_time"] is None:
-            flow["start_time"] = now
+    flow_key, length, dport = fields
+    enqueue_packet(flow_key, ts, length, dport, wait=wait)
 
-        flow["last_seen"] = now
-        flow["packet_count"] += 1
-        flow["total_bytes"] += len(packet)
 
-        if dport:
-            flow["ports"].add(dport)
+def capture_loop(frames):
+    """Single-process capture from a raw frame source."""
+    for frame, ts in frames:
+        process_frame(frame, ts)
+
+# ===============================
+# Sharded Mode (multi-process)
+# ===============================
+#
+# The capture process only reads raw frames and routes each one by a
+# hash of its (src, dst, proto) header bytes; N shard processes parse,
+# aggregate and analyze their share with their own flow table and model
+# copy. Alerts come back over one queue to a single dispatcher, which
+# keeps the per-IP cooldown global.
+
+SHARD_BATCH = 512          # frames per hand-off to a shard
+SHARD_QUEUE_BATCHES = 64   # batches buffered per shard before backpressure
+
+
+def shard_of(frame, n_shards):
+    """Shard for an Ethernet frame, or None when it is not IPv4/IPv6."""
+    offset = 14
+    ethertype = frame[12:14]
+
+    if ethertype == b"\x81\x00":  # 802.1Q VLAN tag
+        ethertype = frame[16:18]
+        offset = 18
+
+    if ethertype == b"\x08\x00":
+        key = frame[offset + 12:offset + 20] + frame[offset + 9:offset + 10]
+    elif ethertype == b"\x86\xdd":
+        key = frame[offset + 8:offset + 40] + frame[offset + 6:offset + 7]
+    else:
+        return None
+
+    return zlib.crc32(key) % n_shards
+
+
+def shard_worker(shard_id, inbox, events, model_path, packet_clock):
+    """
+    One shard: owns a flow table and model copy, analyzes its flows every
+    FLOW_CLEANUP_INTERVAL. With ``packet_clock`` time follows packet
+    timestamps (replay), otherwise the wall clock (live capture).
+    """
+    global flows
+
+    load_model(model_path)
+    flows = FlowTable(FLOW_TABLE_CAPACITY, idle_timeout=FLOW_TIMEOUT)
+
+    def alert(ip, attack_type, severity):
+        events.put(("alert", ip, attack_type, severity))
+
+    stats = {"packets": 0, "non_ip": 0, "ticks": 0}
+    clock = 0.0
+    next_tick = None
+
+    while True:
+        try:
+            batch = inbox.get(timeout=FLOW_CLEANUP_INTERVAL)
+        except queue.Empty:
+            batch = []
+
+        if batch is None:
+            break
+
+        for frame, ts in batch:
+            fields = parse_frame(frame)
+            if fields is None:
+                stats["non_ip"] += 1
+                continue
+
+            flow_key, length, dport = fields
+            clock = ts if packet_clock else time.time()
+            flows.update(flow_key, clock, length, dport)
+
+        stats["packets"] += len(batch)
+        now = clock if packet_clock else time.time()
+
+        if next_tick is None:
+            next_tick = now + FLOW_CLEANUP_INTERVAL
+
+        if now >= next_tick:
+            analyze_flows(*collect_due_flows(now), alert=alert)
+            stats["ticks"] += 1
+            next_tick = now + FLOW_CLEANUP_INTERVAL
+
+    if packet_clock:
+        # End of a replay: flows never reach their next tick, analyze them now
+        slots = flows.active_slots()
+        analyze_flows(flows.flow_keys(slots), flows.features(slots), flows.distinct_ports(slots), alert=alert)
+
+    stats.update(flows.stats())
+    events.put(("stats", shard_id, stats))
+
+
+def dispatch_events(events, n_shards, results):
+    """Single alert dispatcher: forwards shard alerts until every shard reports."""
+    finished = 0
+
+    while finished < n_shards:
+        event = events.get()
+
+        if event[0] == "alert":
+            send_alert(*event[1:])
+        elif event[0] == "stats":
+            results[event[1]] = event[2]
+            finished += 1
+
+
+def run_sharded(frames, n_shards, model_path=MODEL_PATH, packet_clock=False, drop_when_full=True):
+    """
+    Fan (frame, timestamp) pairs out to ``n_shards`` worker processes.
+    Returns capture-side counters plus each shard's stats.
+    """
+    events = mp.Queue()
+    inboxes = [mp.Queue(maxsize=SHARD_QUEUE_BATCHES) for _ in range(n_shards)]
+    workers = [
+        mp.Process(target=shard_worker, args=(i, inbox, events, model_path, packet_clock), daemon=True)
+        for i, inbox in enumerate(inboxes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    shard_results = {}
+    dispatcher = threading.Thread(target=dispatch_events, args=(events, n_shards, shard_results), daemon=True)
+    dispatcher.start()
+
+    capture = {"frames": 0, "non_ip": 0, "dropped": 0}
+    batches = [[] for _ in range(n_shards)]
+
+    def hand_off(shard):
+        batch, batches[shard] = batches[shard], []
+
+        if drop_when_full:
+            try:
+                inboxes[shard].put_nowait(batch)
+            except queue.Full:
+                capture["dropped"] += len(batch)
+            return
+
+        # Blocking hand-off (replay): don't wait forever on a shard that died
+        while True:
+            try:
+                inboxes[shard].put(batch, timeout=1)
+                return
+            except queue.Full:
+                if not workers[shard].is_alive():
+                    raise RuntimeError(f"shard {shard} exited (code {workers[shard].exitcode})")
+
+    try:
+        for frame, ts in frames:
+            capture["frames"] += 1
+
+            shard = shard_of(frame, n_shards)
+            if shard is None:
+                capture["non_ip"] += 1
+                continue
+
+            # Backends may reuse their receive buffer: keep a copy
+            batches[shard].append((bytes(frame), ts))
+            if len(batches[shard]) >= SHARD_BATCH:
+                hand_off(shard)
+    finally:
+        for shard, inbox in enumerate(inboxes):
+            if not workers[shard].is_alive():
+                # Nobody will read what is still queued for it; don't block exit on it
+                print(f"[SHARD {shard}] exited early (code {workers[shard].exitcode})")
+                inbox.cancel_join_thread()
+                continue
+            if batches[shard]:
+                hand_off(shard)
+            inbox.put(None)
+
+        for worker in workers:
+            worker.join()
+        dispatcher.join(timeout=5)
+
+    capture["shards"] = [shard_results.get(i) for i in range(n_shards)]
+    return capture
+
+
+# ===============================
+# Offline Replay (pcap / pcapng)
+# ===============================
+#
+# Replays a capture file through the same process_frame → flow table →
+# analyze_flows path as live capture, with packet timestamps as the clock,
+# so throughput can be measured and changes tested without root or real
+# traffic.
+
+def paced(frames, speed):
+    """
+    Release frames at their recorded spacing divided by ``speed``
+    (1 = recorded timing); ``speed`` 0 passes them through unthrottled.
+    """
+    if speed <= 0:
+        yield from frames
+        return
+
+    first_ts = None
+    started = time.perf_counter()
+
+    for frame, ts in frames:
+        if first_ts is None:
+            first_ts = ts
+
+        ahead = (ts - first_ts) / speed - (time.perf_counter() - started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+        yield frame, ts
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def replay(path, speed=0.0, dissect=False):
+    """
+    Feed a capture file through the single-process sensor path and return
+    throughput, analysis latency and memory figures. Flows still open at
+    the end of the file are analyzed in one final pass. ``dissect`` uses
+    the scapy path (process_packet) instead of raw header parsing.
+    """
+    stop = threading.Event()
+    analysis_latency.clear()
+    inserted_before = flows.inserted
+
+    aggregator = threading.Thread(target=aggregate_packets, kwargs={"stop": stop, "packet_clock": True})
+    aggregator.start()
+    threading.Thread(target=analyze_snapshots, daemon=True).start()
+
+    packets = 0
+    started = time.perf_counter()
+
+    try:
+        for frame, ts in paced(pcap_frames(path), speed):
+            if dissect:
+                process_packet(Ether(bytes(frame)), ts=ts, wait=True)
+            else:
+                process_frame(frame, ts=ts, wait=True)
+            packets += 1
+
+        while packet_buffer:
+            time.sleep(AGGREGATE_IDLE_SLEEP)
+    finally:
+        stop.set()
+        aggregator.join()
+
+    # End of the file: open flows never reach their next tick
+    slots = flows.active_slots()
+    if cic_flows is not None:
+        cic_flows.finish_all()
+    analysis_queue.put((
+        (flows.flow_keys(slots), flows.features(slots), flows.distinct_ports(slots)),
+        time.perf_counter(),
+        collect_finished_flows(last_packet_ts),
+    ))
+    analysis_queue.join()
+
+    elapsed = time.perf_counter() - started
+    latency_ms = np.array(analysis_latency) * 1000 if analysis_latency else np.zeros(1)
+    n_flows = flows.inserted - inserted_before
+
+    return {
+        "packets": packets,
+        "flows": n_flows,
+        "seconds": elapsed,
+        "pps": packets / elapsed,
+        "flows_per_sec": n_flows / elapsed,
+        "analysis_p50_ms": float(np.percentile(latency_ms, 50)),
+        "analysis_p99_ms": float(np.percentile(latency_ms, 99)),
+        "analysis_passes": len(analysis_latency),
+        "dropped": ingest_stats["dropped"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_replay_stats(stats):
+    print(
+        f"[REPLAY] {stats['packets']} packets, {stats['flows']} flows in {stats['seconds']:.2f}s "
+        f"({stats['pps']:,.0f} pps, {stats['flows_per_sec']:,.0f} flows/s) | "
+        f"analysis p50={stats['analysis_p50_ms']:.1f}ms p99={stats['analysis_p99_ms']:.1f}ms "
+        f"over {stats['analysis_passes']} passes | peak RSS {stats['peak_rss_mb']:.0f} MB"
+    )
 
 # ===============================
 # Start System
 # ===============================
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Live hybrid intrusion detection sensor")
+    parser.add_argument("--iface", default=None, help="capture interface (default: scapy's)")
+    parser.add_argument("--shards", type=int, default=1, help="flow aggregation processes (1 = single process)")
+    parser.add_argument("--backend", choices=["auto", "afpacket", "scapy"], default="auto",
+                        help="capture backend: afpacket raw socket (Linux), scapy sniff() fallback")
+    parser.add_argument("--filter", default=None, help="BPF filter expression, e.g. 'ip and not port 22'")
+    parser.add_argument("--replay", metavar="PCAP", help="read a pcap/pcapng file instead of capturing")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="replay pace: 1 = recorded timing, 2 = twice as fast, 0 = as fast as possible")
+    parser.add_argument("--session-model", metavar="MODEL_PKL",
+                        help="score bidirectional CICFlowMeter flows with a batch-trained model "
+                             "(data/processed/<session>/model.pkl) instead of the live model")
+    args = parser.parse_args()
+
+    if args.session_model and args.shards > 1:
+        parser.error("--session-model runs single-process: shards split the two directions of a flow")
+
+    # Deliver (or spool) queued alerts before exiting
+    atexit.register(alerts.close, timeout=10)
+
+    if args.replay and args.shards > 1:
+        print(f"Replaying {args.replay} ({args.shards} shards)...")
+        started = time.perf_counter()
+        result = run_sharded(
+            paced(pcap_frames(args.replay), args.speed), args.shards, packet_clock=True, drop_when_full=False,
+        )
+        elapsed = time.perf_counter() - started
+        print(f"[REPLAY] {result['frames']} frames in {elapsed:.2f}s ({result['frames'] / elapsed:,.0f} pps)")
+        return
+
+    if args.replay:
+        if args.session_model:
+            load_session_model(args.session_model)
+        else:
+            load_model()
+        print(f"Replaying {args.replay}...")
+        print_replay_stats(replay(args.replay, args.speed, dissect=args.backend == "scapy"))
+        return
+
+    if args.shards > 1:
+        print(f"Starting Real Packet Capture ({args.shards} shards)...")
+        run_sharded(live_frames(args.iface, args.filter, args.backend), args.shards)
+        return
+
+    if args.session_model:
+        load_session_model(args.session_model)
+    else:
+        load_model()
+
     print("Starting Real Packet Capture...")
 
-    # Start background cleanup thread
-    threading.Thread(target=cleanup_flows, daemon=True).start()
+    # Start flow aggregation and analysis threads
+    threading.Thread(target=aggregate_packets, daemon=True).start()
+    threading.Thread(target=analyze_snapshots, daemon=True).start()
 
     # Start packet capture
-    sniff(prn=process_packet, store=False)
\ No newline at end of file
+    if args.backend == "scapy":
+        sniff(iface=args.iface, filter=args.filter, prn=process_packet, store=False)
+    else:
+        capture_loop(live_frames(args.iface, args.filter, args.backend))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Prediction
+from .models import AlertRollup, Job, Prediction
 
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
@@ -8,5 +8,18 @@ class PredictionAdmin(admin.ModelAdmin):
     search_fields = ('input_file', 'result_file')
     readonly_fields = ('created_at',)
 
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'session_id', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('session_id',)
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at')
+
+@admin.register(AlertRollup)
+class AlertRollupAdmin(admin.ModelAdmin):
+    list_display = ('bucket', 'granularity', 'attack_type', 'severity', 'ip', 'count')
+    list_filter = ('granularity', 'attack_type', 'severity')
+    search_fields = ('ip',)
+
 # If you prefer the simpler registration:
 # admin.site.register(Prediction)
@@ -0,0 +1,266 @@
+"""
+Alert rollups: per-minute and per-hour counts by (attack_type, severity, ip).
+
+Raw alerts are folded into AlertRollup by compact_alerts(), which walks
+the Alert table in id order from a stored cursor. Each pass groups the
+new alerts in the database (one GROUP BY per granularity) and merges the
+counts into the touched buckets, so ingestion stays a plain INSERT and
+readers touch O(buckets) rows. Alerts received less than
+ROLLUP_SETTLE_SECONDS ago are left for the next pass, which gives
+in-flight INSERT transactions time to commit before the cursor moves
+past their ids. Settling goes by received_at, not timestamp: alerts
+replayed from a sensor's spool carry their (older) detection time.
+
+Readers combine the rollups with the few alerts past the cursor, so
+their counts are exact even between passes. They never compact
+themselves: a pass writes up to ROLLUP_COMPACT_BATCH rows under a lock,
+which polling requests must not take (SQLite locks the whole database).
+Passes run from `manage.py compact_alerts --loop`.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils import timezone
+
+from nids_app.models import Alert, AlertRollup, RollupCursor
+
+CURSOR_NAME = "alerts"
+
+TRUNC = {
+    AlertRollup.MINUTE: TruncMinute,
+    AlertRollup.HOUR: TruncHour,
+}
+BUCKET_SIZE = {
+    AlertRollup.MINUTE: timedelta(minutes=1),
+    AlertRollup.HOUR: timedelta(hours=1),
+}
+GROUP_FIELDS = ("attack_type", "severity", "ip")
+
+
+def floor_bucket(when, granularity):
+    if granularity == AlertRollup.HOUR:
+        return when.replace(minute=0, second=0, microsecond=0)
+    return when.replace(second=0, microsecond=0)
+
+
+def ceil_bucket(when, granularity):
+    floor = floor_bucket(when, granularity)
+    return floor if floor == when else floor + BUCKET_SIZE[granularity]
+
+
+def cursor_position():
+    cursor = RollupCursor.objects.filter(name=CURSOR_NAME).first()
+    return cursor.last_alert_id if cursor else 0
+
+# -------------------------------------------------
+# Compaction
+# -------------------------------------------------
+
+def merge_counts(granularity, rows):
+    """Add grouped ``rows`` (bucket + GROUP_FIELDS + n) into the rollup table."""
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    buckets = {row["bucket"] for row in rows}
+    existing = {
+        (r.bucket, r.attack_type, r.severity, r.ip): r
+        for r in AlertRollup.objects.filter(granularity=granularity, bucket__in=buckets)
+    }
+
+    created = []
+    updated = []
+
+    for row in rows:
+        key = (row["bucket"], row["attack_type"], row["severity"], row["ip"])
+        rollup = existing.get(key)
+
+        if rollup is None:
+            created.append(AlertRollup(
+                granularity=granularity,
+                bucket=row["bucket"],
+                attack_type=row["attack_type"],
+                severity=row["severity"],
+                ip=row["ip"],
+                count=row["n"],
+            ))
+        else:
+            rollup.count += row["n"]
+            updated.append(rollup)
+
+    batch_size = settings.ALERT_BULK_BATCH_SIZE
+    AlertRollup.objects.bulk_create(created, batch_size=batch_size)
+    AlertRollup.objects.bulk_update(updated, ["count"], batch_size=batch_size)
+    return len(created) + len(updated)
+
+
+def compact_alerts(limit=None, settle_seconds=None):
+    """
+    Fold up to ``limit`` alerts past the cursor into the rollups; returns
+    how many were folded. The cursor row is locked for the pass, so
+    concurrent callers serialize rather than double count.
+    """
+    limit = limit or settings.ROLLUP_COMPACT_BATCH
+    if settle_seconds is None:
+        settle_seconds = settings.ROLLUP_SETTLE_SECONDS
+
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+
+    with transaction.atomic():
+        RollupCursor.objects.get_or_create(name=CURSOR_NAME)
+        cursor = RollupCursor.objects.select_for_update().get(name=CURSOR_NAME)
+
+        ids = list(
+            Alert.objects.filter(id__gt=cursor.last_alert_id, received_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return 0
+
+        window = Alert.objects.filter(id__gt=cursor.last_alert_id, id__lte=ids[-1])
+
+        for granularity, trunc in TRUNC.items():
+            rows = (
+                window.annotate(bucket=trunc("timestamp"))
+                .values("bucket", *GROUP_FIELDS)
+                .annotate(n=Count("id"))
+                .order_by()
+            )
+            merge_counts(granularity, rows)
+
+        cursor.last_alert_id = ids[-1]
+        cursor.save(update_fields=["last_alert_id", "updated_at"])
+
+    return len(ids)
+
+
+def compact_all(settle_seconds=None, log=None):
+    """Run compaction passes until the cursor has caught up."""
+    total = 0
+    while True:
+        folded = compact_alerts(settle_seconds=settle_seconds)
+        if not folded:
+            return total
+        total += folded
+        if log:
+            log(f"Folded {total} alerts")
+
+
+def rebuild_rollups(log=None):
+    """Drop every rollup and recompute them from the raw Alert table."""
+    with transaction.atomic():
+        AlertRollup.objects.all().delete()
+        RollupCursor.objects.update_or_create(name=CURSOR_NAME, defaults={"last_alert_id": 0})
+
+    return compact_all(settle_seconds=0, log=log)
+
+# -------------------------------------------------
+# Retention
+# -------------------------------------------------
+
+def prune(alert_days=None, minute_days=None):
+    """
+    Delete raw alerts older than ``alert_days`` and minute rollups older
+    than ``minute_days`` (0 keeps them). Only alerts already folded into
+    the rollups are deleted, so counts survive pruning; hourly rollups
+    are kept.
+    """
+    alert_days = settings.ALERT_RETENTION_DAYS if alert_days is None else alert_days
+    minute_days = settings.ROLLUP_MINUTE_RETENTION_DAYS if minute_days is None else minute_days
+    now = timezone.now()
+    deleted = {"alerts": 0, "minute_rollups": 0}
+
+    if alert_days:
+        compact_all()
+        deleted["alerts"], _ = Alert.objects.filter(
+            timestamp__lt=now - timedelta(days=alert_days),
+            id__lte=cursor_position(),
+        ).delete()
+
+    if minute_days:
+        deleted["minute_rollups"], _ = AlertRollup.objects.filter(
+            granularity=AlertRollup.MINUTE,
+            bucket__lt=now - timedelta(days=minute_days),
+        ).delete()
+
+    return deleted
+
+# -------------------------------------------------
+# Readers
+# -------------------------------------------------
+
+def pending_alerts(since=None, until=None, last_id=None):
+    """Alerts not folded into the rollups yet (up to id ``last_id``)."""
+    alerts = Alert.objects.filter(id__gt=cursor_position())
+    if last_id is not None:
+        alerts = alerts.filter(id__lte=last_id)
+    if since is not None:
+        alerts = alerts.filter(timestamp__gte=since)
+    if until is not None:
+        alerts = alerts.filter(timestamp__lt=until)
+    return alerts
+
+
+def counts_by(field, since=None, last_id=None):
+    """
+    {value: count} of alerts per ``field`` (one of GROUP_FIELDS), at or
+    after ``since`` to the minute, leaving out unfolded alerts past id
+    ``last_id``. Whole hours come from hourly rollups, the partial first
+    hour from minute rollups.
+    """
+    counts = Counter()
+    hours = AlertRollup.objects.filter(granularity=AlertRollup.HOUR)
+
+    if since is not None:
+        first_hour = ceil_bucket(since, AlertRollup.HOUR)
+        hours = hours.filter(bucket__gte=first_hour)
+
+        minutes = AlertRollup.objects.filter(
+            granularity=AlertRollup.MINUTE,
+            bucket__gte=floor_bucket(since, AlertRollup.MINUTE),
+            bucket__lt=first_hour,
+        )
+        for row in minutes.values(field).annotate(n=Sum("count")).order_by():
+            counts[row[field]] += row["n"]
+
+    for row in hours.values(field).annotate(n=Sum("count")).order_by():
+        counts[row[field]] += row["n"]
+
+    for row in pending_alerts(since, last_id=last_id).values(field).annotate(n=Count("id")).order_by():
+        counts[row[field]] += row["n"]
+
+    return counts
+
+
+def timeseries(granularity, since, until=None, by=None, keys=None):
+    """
+    [(bucket, key, count)] between ``since`` and ``until`` in ``granularity``
+    buckets, split by ``by`` (a GROUP_FIELDS name) or totalled when None.
+    ``keys`` restricts the split to those values.
+    """
+    since = floor_bucket(since, granularity)
+    group = [by] if by else []
+
+    rollups = AlertRollup.objects.filter(granularity=granularity, bucket__gte=since)
+    pending = pending_alerts(since, until).annotate(bucket=TRUNC[granularity]("timestamp"))
+    if until is not None:
+        rollups = rollups.filter(bucket__lt=until)
+    if by and keys:
+        rollups = rollups.filter(**{f"{by}__in": keys})
+        pending = pending.filter(**{f"{by}__in": keys})
+
+    series = Counter()
+
+    for row in rollups.values("bucket", *group).annotate(n=Sum("count")).order_by():
+        series[row["bucket"], row[by] if by else None] += row["n"]
+
+    for row in pending.values("bucket", *group).annotate(n=Count("id")).order_by():
+        series[row["bucket"], row[by] if by else None] += row["n"]
+
+    return sorted(((bucket, key, n) for (bucket, key), n in series.items()), key=lambda r: (r[0], str(r[1])))
@@ -0,0 +1,218 @@
+"""
+Live alert fan-out for the dashboard (server-sent events).
+
+Ingestion publishes each committed batch of alerts once to an in-process
+AlertBroker; every connected browser has a bounded buffer of pending
+events that the broker appends to, so one ingestion reaches any number
+of watchers without a database query per watcher. A slow client whose
+buffer overflows loses the oldest events and is told to resync
+(re-fetch /api/dashboard-live/) instead of stalling the others.
+
+Events carry an "<epoch>-<seq>" id. A reconnecting EventSource sends the
+last one back (Last-Event-ID) and is replayed what it missed from a short
+history; if that is gone, or the server restarted (new epoch), it gets a
+resync event instead. The dashboard snapshot (/api/dashboard-live/)
+returns the id of the last event published before it was read, so the
+page opens the stream with ?last_event_id= exactly where the snapshot
+ends; alerts carry their database id so the page skips the few that
+were committed between the two and are in both.
+
+The broker lives in one process: run the ASGI server with a single worker
+process (``uvicorn nids_project.asgi:application``) and send the sensor
+endpoints to it too, or sensors' alerts only reach watchers connected to
+the process that ingested them (see README.md, Deployment).
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs
+
+STREAM_HISTORY = 2000       # events kept for reconnect resume
+CLIENT_BUFFER = 256         # pending events per client before it must resync
+KEEPALIVE_SECONDS = 15      # comment line to keep proxies from closing idle streams
+RETRY_MS = 3000             # EventSource reconnect delay
+
+
+class Subscription:
+
+    def __init__(self, loop, maxlen):
+        self.loop = loop
+        self.pending = deque(maxlen=maxlen)
+        self.ready = asyncio.Event()
+        self.overflowed = False
+
+    def push(self, event):
+        """Broker side (any thread): queue ``event`` and wake the client's task."""
+        if len(self.pending) == self.pending.maxlen:
+            self.overflowed = True
+        self.pending.append(event)
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+    async def next_events(self, timeout):
+        """Pending events, [] on timeout, or None when the client must resync."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        self.ready.clear()
+        if self.overflowed:
+            self.overflowed = False
+            self.pending.clear()
+            return None
+
+        events = []
+        while self.pending:
+            events.append(self.pending.popleft())
+        return events
+
+
+class AlertBroker:
+
+    def __init__(self, history=STREAM_HISTORY, client_buffer=CLIENT_BUFFER):
+        self.epoch = format(int(time.time()), "x")
+        self.seq = itertools.count(1)
+        self.last_seq = 0
+        self.history = deque(maxlen=history)
+        self.client_buffer = client_buffer
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, alerts):
+        """Fan one ingested batch out to every subscriber; returns the event."""
+        payload = {
+            "alerts": [
+                {
+                    "id": a.pk,
+                    "ip": a.ip,
+                    "attack_type": a.attack_type,
+                    "severity": a.severity,
+                    "timestamp": a.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                for a in alerts
+            ],
+        }
+
+        with self.lock:
+            seq = self.last_seq = next(self.seq)
+            event = (seq, format_event(f"{self.epoch}-{seq}", "alerts", json.dumps(payload)))
+            self.history.append(event)
+            subscribers = list(self.subscribers)
+
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def last_event_id(self):
+        """Id of the latest event; a subscription resumed from it gets every later one."""
+        with self.lock:
+            return f"{self.epoch}-{self.last_seq}"
+
+    def subscribe(self, last_event_id=None):
+        """
+        New subscription plus the events to replay first: those after
+        ``last_event_id`` still in history, or None when the client must
+        resync because they are not.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.client_buffer)
+
+        with self.lock:
+            self.subscribers.add(subscription)
+            backlog = self.replay_after(last_event_id)
+
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def replay_after(self, last_event_id):
+        if not last_event_id:
+            return []
+
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+
+        seq = int(seq)
+        if self.history and seq < self.history[0][0] - 1:
+            return None
+        return [event for event in self.history if event[0] > seq]
+
+
+def format_event(event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n".encode()
+
+
+RESYNC = b"event: resync\ndata: {}\n\n"
+
+broker = AlertBroker()
+
+# -------------------------------------------------
+# ASGI endpoint
+# -------------------------------------------------
+
+async def alert_stream(scope, receive, send):
+    """GET /api/alerts/stream/: text/event-stream of ingested alert batches."""
+    if scope["method"] != "GET":
+        await send({"type": "http.response.start", "status": 405, "headers": [(b"allow", b"GET")]})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    headers = dict(scope.get("headers") or [])
+    query = parse_qs(scope.get("query_string", b"").decode())
+    last_event_id = (
+        headers.get(b"last-event-id", b"").decode()
+        or query.get("last_event_id", [""])[0]
+    )
+
+    subscription, backlog = broker.subscribe(last_event_id)
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+        subscription.ready.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+
+        first = f"retry: {RETRY_MS}\n\n".encode()
+        if backlog is None:
+            first += RESYNC
+        else:
+            first += b"".join(chunk for _, chunk in backlog)
+        await send({"type": "http.response.body", "body": first, "more_body": True})
+
+        while not disconnected.is_set():
+            events = await subscription.next_events(KEEPALIVE_SECONDS)
+            if disconnected.is_set():
+                break
+
+            if events is None:
+                body = RESYNC
+            elif events:
+                body = b"".join(chunk for _, chunk in events)
+            else:
+                body = b": keepalive\n\n"
+
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        broker.unsubscribe(subscription)
+        watcher.cancel()
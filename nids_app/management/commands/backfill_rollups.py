@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from nids_app.alerts.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the alert rollups from the raw alerts in the database. "
+        "Counts of alerts already removed by prune_alerts are lost."
+    )
+
+    def handle(self, *args, **options):
+        total = rebuild_rollups(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt from {total} alerts."))
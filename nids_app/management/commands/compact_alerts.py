@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from nids_app.alerts.rollups import compact_all
+
+
+class Command(BaseCommand):
+    help = "Fold new alerts into the per-minute / per-hour rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="keep running, compacting every --interval seconds")
+        parser.add_argument("--interval", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            folded = compact_all()
+            if folded or not options["loop"]:
+                self.stdout.write(f"Folded {folded} alerts into rollups.")
+
+            if not options["loop"]:
+                return
+
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from nids_app.alerts.rollups import prune
+
+
+class Command(BaseCommand):
+    help = "Delete raw alerts (and minute rollups) past their retention period."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="raw alert retention (default ALERT_RETENTION_DAYS)")
+        parser.add_argument("--minute-days", type=int, default=None,
+                            help="minute rollup retention (default ROLLUP_MINUTE_RETENTION_DAYS)")
+
+    def handle(self, *args, **options):
+        deleted = prune(alert_days=options["days"], minute_days=options["minute_days"])
+        self.stdout.write(
+            f"Deleted {deleted['alerts']} alerts and {deleted['minute_rollups']} minute rollups."
+        )
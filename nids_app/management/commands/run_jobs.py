@@ -0,0 +1,25 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from nids_app.pipeline.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued pipeline jobs (use with JOB_WORKER=external)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=None, help="jobs run at once (default JOB_CONCURRENCY)")
+        parser.add_argument("--poll", type=float, default=None, help="seconds between queue polls (default JOB_POLL_SECONDS)")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format="[JOBS] %(message)s")
+
+        worker = Worker(concurrency=options["concurrency"], poll_interval=options["poll"])
+        self.stdout.write(f"Job worker started (concurrency {worker.concurrency}).")
+
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            worker.stop()
+            self.stdout.write("Job worker stopped.")
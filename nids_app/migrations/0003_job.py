@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nids_app', '0002_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(db_index=True, max_length=64)),
+                ('kind', models.CharField(choices=[('preprocess', 'Preprocessing'), ('train', 'Model Training'), ('predict', 'Prediction'), ('hybrid', 'Hybrid Detection'), ('pipeline', 'Automated Pipeline')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('log', models.TextField(blank=True, default='')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nids_app', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['timestamp', 'attack_type'], name='alert_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['attack_type', 'timestamp'], name='alert_attack_type_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nids_app', '0004_alert_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_alert_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlertRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('attack_type', models.CharField(max_length=100)),
+                ('severity', models.CharField(max_length=20)),
+                ('ip', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='alert_rollup_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'attack_type', 'severity', 'ip'), name='alert_rollup_unique_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nids_app', '0005_alert_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='slot',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('slot',), name='job_running_slot_unique'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nids_app', '0006_job_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='received_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
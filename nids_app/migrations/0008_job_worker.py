@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nids_app', '0007_alert_received_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='worker',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+    ]
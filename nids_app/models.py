@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.utils import timezone
 
 class Prediction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -13,7 +14,121 @@ class Alert(models.Model):
     ip = models.CharField(max_length=50)
     attack_type = models.CharField(max_length=100)
     severity = models.CharField(max_length=20)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the sensor detected it (sent along when replayed from a spool)
+    timestamp = models.DateTimeField(default=timezone.now)
+    # When the collector stored it; rollup compaction settles on this
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Recent alerts, and since= windows counted from the index alone
+            models.Index(fields=["timestamp", "attack_type"], name="alert_timestamp_idx"),
+            # Per-attack-type counts, also answered from the index alone
+            models.Index(fields=["attack_type", "timestamp"], name="alert_attack_type_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.ip} - {self.attack_type}"
+
+class Job(models.Model):
+    """A pipeline stage (or the full pipeline) queued for a background worker."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    KIND_CHOICES = [
+        ("preprocess", "Preprocessing"),
+        ("train", "Model Training"),
+        ("predict", "Prediction"),
+        ("hybrid", "Hybrid Detection"),
+        ("pipeline", "Automated Pipeline"),
+    ]
+
+    session_id = models.CharField(max_length=64, db_index=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    log = models.TextField(blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Concurrency slot (0 .. JOB_CONCURRENCY - 1) held while RUNNING
+    slot = models.PositiveSmallIntegerField(null=True, blank=True)
+    # "<host>:<pid>" of the worker process that claimed the job
+    worker = models.CharField(max_length=128, blank=True, default="")
+
+    class Meta:
+        ordering = ["created_at"]
+        constraints = [
+            # Two workers claiming the same slot: the second UPDATE fails
+            models.UniqueConstraint(
+                fields=["slot"],
+                condition=models.Q(status="running"),
+                name="job_running_slot_unique",
+            ),
+        ]
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+    def __str__(self):
+        return f"Job {self.id} - {self.kind} ({self.status})"
+
+
+class AlertRollup(models.Model):
+    """
+    Alert counts per time bucket and (attack_type, severity, ip), kept up
+    to date from the raw Alert table by nids_app.alerts.rollups.
+    """
+
+    MINUTE = "minute"
+    HOUR = "hour"
+
+    GRANULARITY_CHOICES = [
+        (MINUTE, "Minute"),
+        (HOUR, "Hour"),
+    ]
+
+    granularity = models.CharField(max_length=6, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    attack_type = models.CharField(max_length=100)
+    severity = models.CharField(max_length=20)
+    ip = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "attack_type", "severity", "ip"],
+                name="alert_rollup_unique_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "bucket"], name="alert_rollup_bucket_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} {self.attack_type} {self.ip}: {self.count}"
+
+
+class RollupCursor(models.Model):
+    """How far the Alert table has been folded into AlertRollup."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    last_alert_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.ip} - {self.attack_type}"
\ No newline at end of file
+        return f"{self.name} @ {self.last_alert_id}"
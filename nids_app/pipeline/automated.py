@@ -1,81 +1,281 @@
-from cmath import log
-import os
+import logging
 import sys
 import subprocess
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from django.conf import settings
-from pkg_resources import run_script
 
 # from nids_project.scripts.hybrid_detect import BASE
 
+# Intermediate artifacts the in-process pipeline can be asked to write.
+# hybrid_output is always written.
+CHECKPOINTS = {"preprocessed", "model", "predictions"}
 
-def run_full_pipeline(session_id, log_callback=None):
+# Stage scripts by job kind: (step name, script under scripts/, streams --chunksize)
+STAGES = {
+    "preprocess": ("Preprocessing", "preprocess.py", True),
+    "train": ("Model Training", "train_model.py", False),
+    "predict": ("Prediction", "predict.py", True),
+    "hybrid": ("Hybrid Detection", "signature_detect.py", True),
+}
+
+
+# Rows per chunk for an upload too large to load whole when
+# PIPELINE_CHUNKSIZE is unset
+LARGE_UPLOAD_CHUNKSIZE = 100_000
+
+
+def pipeline_chunksize(session_id):
+    """
+    Rows per chunk for the streaming-capable stages: PIPELINE_CHUNKSIZE,
+    else LARGE_UPLOAD_CHUNKSIZE when the session's upload would not fit
+    the training memory budget loaded whole, else None (load whole).
+    """
+    chunksize = getattr(settings, "PIPELINE_CHUNKSIZE", None)
+    if chunksize:
+        return chunksize
+
+    from scripts.out_of_core import raw_fits_in_memory
+
+    raw_path = Path(settings.BASE_DIR) / "data" / "raw" / session_id / "input.csv"
+    if raw_path.exists() and not raw_fits_in_memory(raw_path):
+        return LARGE_UPLOAD_CHUNKSIZE
+    return None
+
+
+def chunk_args(session_id):
+    """--chunksize for the streaming-capable stages, when they stream."""
+    chunksize = pipeline_chunksize(session_id)
+    return ["--chunksize", str(chunksize)] if chunksize else []
+
+
+class CallbackLogHandler(logging.Handler):
+    """Forwards stage log records from the calling thread to a log callback."""
+
+    def __init__(self, log):
+        super().__init__(level=logging.INFO)
+        self.log = log
+        self.thread = threading.get_ident()
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            self.log(self.format(record))
+
+
+_forwarding_lock = threading.Lock()
+_forwarding = {"count": 0, "level": logging.NOTSET}
+
+
+@contextmanager
+def forward_logs(log):
+    # Pipelines may run concurrently (background jobs): the logger level is
+    # raised by the first one in and restored by the last one out.
+    logger = logging.getLogger("scripts")
+    handler = CallbackLogHandler(log)
+
+    with _forwarding_lock:
+        if _forwarding["count"] == 0:
+            _forwarding["level"] = logger.level
+            logger.setLevel(logging.INFO)
+        _forwarding["count"] += 1
+        logger.addHandler(handler)
+    try:
+        yield
+    finally:
+        with _forwarding_lock:
+            logger.removeHandler(handler)
+            _forwarding["count"] -= 1
+            if _forwarding["count"] == 0:
+                logger.setLevel(_forwarding["level"])
+
+
+def run_full_pipeline(session_id, log_callback=None, in_process=None, checkpoints=None, progress_callback=None):
     """
     Lightweight automated pipeline for production deployment.
-    Uses pretrained model instead of retraining.
+
+    By default (settings.PIPELINE_IN_PROCESS) the four stages run as
+    functions in this process and hand DataFrames to each other in memory;
+    only hybrid_output plus the requested ``checkpoints`` (see
+    CHECKPOINTS, default settings.PIPELINE_CHECKPOINTS) are written.
+    ``in_process=False`` runs each stage script in its own interpreter.
+
+    ``progress_callback(done, total)`` is called after each stage.
     """
 
     BASE = Path(settings.BASE_DIR)
 
-    SCRIPTS_DIR = BASE / "scripts"
+    if in_process is None:
+        in_process = getattr(settings, "PIPELINE_IN_PROCESS", True)
+
+    if checkpoints is None:
+        checkpoints = getattr(settings, "PIPELINE_CHECKPOINTS", ())
 
-    PREPROCESS_SCRIPT = SCRIPTS_DIR / "preprocess.py"
-    TRAIN_SCRIPT = SCRIPTS_DIR / "train_model.py"
-    PREDICT_SCRIPT = SCRIPTS_DIR / "predict.py"
-    HYBRID_SCRIPT = SCRIPTS_DIR / "signature_detect.py"
+    unknown = set(checkpoints) - CHECKPOINTS
+    if unknown:
+        raise ValueError(f"Unknown pipeline checkpoints: {sorted(unknown)}")
 
     def log(msg):
         if log_callback:
             log_callback(msg + "\n")
 
-    def run_script(script_path, step_name):
-        if not script_path.exists():
-            raise FileNotFoundError(f"{step_name} script not found: {script_path}")
+    done = 0
 
-        process = subprocess.Popen(
-            [sys.executable, str(script_path), session_id],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True
-        )
+    def stage_done():
+        nonlocal done
+        done += 1
+        if progress_callback:
+            progress_callback(done, len(STAGES))
 
-        for line in process.stdout:
-            log(line.strip())
+    processed_path = BASE / "data" / "processed" / session_id
+    processed_path.mkdir(parents=True, exist_ok=True)
 
-        process.wait()
+    if in_process:
+        run_stages_in_process(session_id, log, set(checkpoints), stage_done)
+    else:
+        run_stages_subprocess(BASE, session_id, log, stage_done)
 
-        if process.returncode != 0:
-            raise RuntimeError(f"{step_name} failed with exit code {process.returncode}")
-        
-    import shutil
+    return "Automated pipeline executed successfully"
+
+
+@contextmanager
+def stage(log, step_name, running_msg, done_msg):
+    log(running_msg)
+    try:
+        yield
+    except Exception as e:
+        raise RuntimeError(f"{step_name} failed: {e}") from e
+    log(done_msg)
+
+
+def run_stages_in_process(session_id, log, checkpoints, stage_done):
+    # Imported here so the web process only loads sklearn when a pipeline runs
+    from scripts import predict, preprocess, signature_detect, train_model
+
+    # Streamed uploads leave df None, so training reads the artifact and
+    # goes out of core when its matrix is over the budget
+    chunksize = pipeline_chunksize(session_id)
+
+    with forward_logs(log):
+        # -------------------------------------------------
+        # 1️⃣ Preprocessing
+        # -------------------------------------------------
+        with stage(log, "Preprocessing", "▶ Running Preprocessing...", "Preprocessing completed successfully."):
+            if chunksize:
+                preprocess.run_chunked(session_id, chunksize)
+                df = None
+            else:
+                df = preprocess.run(session_id, save="preprocessed" in checkpoints)
+        stage_done()
+
+        # -------------------------------------------------
+        # 2️⃣ Model Training
+        # -------------------------------------------------
+        with stage(log, "Model Training", "▶ Running Model Training...", "Model training completed successfully."):
+            model = train_model.run(session_id, df, save="model" in checkpoints)
+        stage_done()
+
+        # -------------------------------------------------
+        # 3️⃣ Prediction
+        # -------------------------------------------------
+        with stage(log, "Prediction", "▶ Running Prediction...", "Prediction completed successfully."):
+            if chunksize:
+                predict.run_chunked(session_id, chunksize, model=model)
+            else:
+                df = predict.run(session_id, df, model=model, save="predictions" in checkpoints)
+        stage_done()
+
+        # -------------------------------------------------
+        # 4️⃣ Hybrid Detection
+        # -------------------------------------------------
+        with stage(log, "Hybrid Detection", "▶ Running Hybrid Detection...", "Hybrid detection completed successfully."):
+            if chunksize:
+                signature_detect.run_chunked(session_id, chunksize)
+            else:
+                signature_detect.run(session_id, df)
+        stage_done()
+
+
+def run_stage_in_process(kind, session_id, log):
+    """
+    Run one stage (a STAGES kind) as a function call in this process, so
+    predictions reuse the warm model registry instead of a fresh
+    interpreter unpickling model.pkl.
+    """
+    from scripts import predict, preprocess, signature_detect, train_model
+
+    modules = {
+        "preprocess": preprocess,
+        "train": train_model,
+        "predict": predict,
+        "hybrid": signature_detect,
+    }
+    step_name, _, streams = STAGES[kind]
+    chunksize = pipeline_chunksize(session_id)
+
+    with forward_logs(log):
+        with stage(log, step_name, f"▶ Running {step_name}...", f"{step_name} completed successfully."):
+            if streams and chunksize:
+                modules[kind].run_chunked(session_id, chunksize)
+            else:
+                modules[kind].run(session_id)
+
+
+def run_stage_script(BASE, script_name, step_name, session_id, log, extra_args=()):
+    """Run one stage script in its own interpreter, streaming its output to ``log``."""
+    script_path = BASE / "scripts" / script_name
+
+    if not script_path.exists():
+        raise FileNotFoundError(f"{step_name} script not found: {script_path}")
+
+    process = subprocess.Popen(
+        [sys.executable, str(script_path), session_id, *extra_args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+
+    for line in process.stdout:
+        log(line.strip())
+
+    process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"{step_name} failed with exit code {process.returncode}")
+
+
+def run_stages_subprocess(BASE, session_id, log, stage_done):
+    def run_script(script_name, step_name, extra_args=()):
+        run_stage_script(BASE, script_name, step_name, session_id, log, extra_args)
 
-    processed_path = BASE / "data" / "processed" / session_id
-    processed_path.mkdir(parents=True, exist_ok=True)
     # -------------------------------------------------
     # 1️⃣ Preprocessing
     # -------------------------------------------------
     log("▶ Running Preprocessing...")
-    run_script(PREPROCESS_SCRIPT, "Preprocessing")
+    run_script("preprocess.py", "Preprocessing", chunk_args(session_id))
     log("Preprocessing completed successfully.")
+    stage_done()
 
     # -------------------------------------------------
     # 2️⃣ Model Training
     # -------------------------------------------------
     log("▶ Running Model Training...")
-    run_script(TRAIN_SCRIPT, "Model Training")
+    run_script("train_model.py", "Model Training")
     log("Model training completed successfully.")
+    stage_done()
+
     # -------------------------------------------------
     # 3️⃣ Prediction
     # -------------------------------------------------
     log("▶ Running Prediction...")
-    run_script(PREDICT_SCRIPT, "Prediction")
+    run_script("predict.py", "Prediction", chunk_args(session_id))
     log("Prediction completed successfully.")
+    stage_done()
 
     # -------------------------------------------------
     # 4️⃣ Hybrid Detection
     # -------------------------------------------------
     log("▶ Running Hybrid Detection...")
-    run_script(HYBRID_SCRIPT, "Hybrid Detection")
+    run_script("signature_detect.py", "Hybrid Detection", chunk_args(session_id))
     log("Hybrid detection completed successfully.")
-
-    return "Automated pipeline executed successfully"
\ No newline at end of file
+    stage_done()
@@ -0,0 +1,323 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from nids_app.models import Job
+from nids_app.pipeline.automated import (
+    STAGES,
+    chunk_args,
+    run_full_pipeline,
+    run_stage_in_process,
+    run_stage_script,
+)
+
+log = logging.getLogger(__name__)
+
+
+def worker_id():
+    """Identity recorded on claimed jobs: "<host>:<pid>" (read per call, forks differ)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(kind, session_id):
+    """Queue a pipeline job for ``session_id`` and wake the embedded worker."""
+    if kind != "pipeline" and kind not in STAGES:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = Job.objects.create(session_id=session_id, kind=kind)
+
+    if getattr(settings, "JOB_WORKER", "embedded") == "embedded":
+        embedded_worker().wake()
+
+    return job
+
+
+# -------------------------------------------------
+# Claiming
+# -------------------------------------------------
+def running_jobs():
+    return Job.objects.filter(status=Job.RUNNING).count()
+
+
+def free_slots():
+    """Concurrency slots no RUNNING job holds, lowest first."""
+    held = list(Job.objects.filter(status=Job.RUNNING).values_list("slot", flat=True))
+    free = [slot for slot in range(settings.JOB_CONCURRENCY) if slot not in held]
+    # Jobs claimed before slots existed hold none but still count
+    return free[:max(0, settings.JOB_CONCURRENCY - len(held))]
+
+
+def claim_next():
+    """
+    Move the oldest queued job to RUNNING and return it, or None when the
+    queue is empty or JOB_CONCURRENCY jobs already run. The claim takes a
+    free slot in the same conditional UPDATE; a unique index on the slots
+    of RUNNING jobs fails the UPDATE of a worker that lost a race for a
+    slot, so the limit holds across worker threads and processes.
+    """
+    slots = free_slots()
+
+    for job_id in Job.objects.filter(status=Job.QUEUED).values_list("id", flat=True)[:5]:
+        while slots:
+            now = timezone.now()
+            try:
+                with transaction.atomic():
+                    claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+                        status=Job.RUNNING,
+                        slot=slots[0],
+                        worker=worker_id(),
+                        started_at=now,
+                        updated_at=now,
+                    )
+            except IntegrityError:
+                # Another worker took the slot first
+                slots.pop(0)
+                continue
+
+            if claimed:
+                return Job.objects.get(id=job_id)
+            # Another worker took the job first
+            break
+
+        if not slots:
+            return None
+
+    return None
+
+
+def fail_jobs(jobs, error):
+    return jobs.update(status=Job.FAILED, error=error, finished_at=timezone.now())
+
+
+def fail_stale_jobs():
+    """Fail RUNNING jobs whose worker stopped sending heartbeats (crash or restart)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    stale = Job.objects.filter(status=Job.RUNNING, updated_at__lt=cutoff)
+
+    # Checked on every poll: read first so the common case writes nothing
+    if not stale.exists():
+        return 0
+
+    return fail_jobs(stale, "Worker stopped before the job finished.")
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, owned by another user
+        return True
+    return True
+
+
+def fail_orphaned_jobs():
+    """
+    Fail RUNNING jobs claimed on this host by a process that no longer
+    exists, or by this process's own pid (reused after a restart, e.g.
+    pid 1 in a container). Called when a worker starts, so a restart
+    frees its slots without waiting JOB_STALE_SECONDS.
+    """
+    host, pid = worker_id().rsplit(":", 1)
+    orphaned = []
+    running = Job.objects.filter(status=Job.RUNNING, worker__startswith=f"{host}:")
+    for job_id, worker in running.values_list("id", "worker"):
+        owner = int(worker.rsplit(":", 1)[1])
+        if owner == int(pid) or not process_alive(owner):
+            orphaned.append(job_id)
+
+    if not orphaned:
+        return 0
+
+    return fail_jobs(
+        Job.objects.filter(id__in=orphaned, status=Job.RUNNING),
+        "Worker restarted before the job finished.",
+    )
+
+# -------------------------------------------------
+# Running
+# -------------------------------------------------
+class JobReporter:
+    """
+    Buffers log lines and progress for one job and writes them to the DB
+    at most every JOB_LOG_FLUSH_SECONDS. While started, a heartbeat thread
+    also flushes every JOB_LOG_FLUSH_SECONDS, so a stage that logs nothing
+    for longer than JOB_STALE_SECONDS is not failed as stale.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.lines = []
+        self.progress = None
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+        # Flushes from the job and heartbeat threads write in order
+        self.writing = threading.Lock()
+        self.stopped = threading.Event()
+        self.heartbeat = threading.Thread(target=self.beat, name=f"job-{job_id}-heartbeat", daemon=True)
+
+    def start(self):
+        self.heartbeat.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.heartbeat.join()
+
+    def beat(self):
+        try:
+            while not self.stopped.wait(settings.JOB_LOG_FLUSH_SECONDS):
+                if time.monotonic() - self.flushed_at >= settings.JOB_LOG_FLUSH_SECONDS:
+                    self.flush()
+        finally:
+            # This thread's own connection
+            connection.close()
+
+    def log(self, msg):
+        with self.lock:
+            self.lines.append(msg if msg.endswith("\n") else msg + "\n")
+        self.maybe_flush()
+
+    def set_progress(self, done, total):
+        with self.lock:
+            self.progress = int(100 * done / total)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed_at >= settings.JOB_LOG_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self, **fields):
+        with self.writing:
+            with self.lock:
+                text, self.lines = "".join(self.lines), []
+                progress, self.progress = self.progress, None
+                self.flushed_at = time.monotonic()
+
+            if text:
+                fields["log"] = Concat(F("log"), Value(text))
+            if progress is not None:
+                fields["progress"] = progress
+            fields["updated_at"] = timezone.now()
+
+            Job.objects.filter(id=self.job_id).update(**fields)
+
+
+def run_job(job):
+    """Execute a claimed job, recording its log, progress and outcome."""
+    reporter = JobReporter(job.id)
+    reporter.start()
+
+    try:
+        if job.kind == "pipeline":
+            reporter.log(run_full_pipeline(
+                job.session_id,
+                log_callback=reporter.log,
+                progress_callback=reporter.set_progress,
+            ))
+        elif getattr(settings, "PIPELINE_IN_PROCESS", True):
+            run_stage_in_process(job.kind, job.session_id, reporter.log)
+        else:
+            step_name, script_name, streams = STAGES[job.kind]
+            run_stage_script(
+                Path(settings.BASE_DIR),
+                script_name,
+                step_name,
+                job.session_id,
+                reporter.log,
+                chunk_args(job.session_id) if streams else (),
+            )
+
+    except Exception as e:
+        log.exception(f"Job {job.id} ({job.kind}) failed")
+        reporter.stop()
+        reporter.flush(status=Job.FAILED, error=str(e), finished_at=timezone.now())
+        return False
+
+    reporter.stop()
+    reporter.flush(status=Job.SUCCEEDED, progress=100, finished_at=timezone.now())
+    return True
+
+
+# -------------------------------------------------
+# Worker
+# -------------------------------------------------
+class Worker:
+    """
+    Polls the queue and runs up to JOB_CONCURRENCY jobs on a thread pool.
+    Runs in the web process (JOB_WORKER=embedded) or in its own process
+    via ``manage.py run_jobs``.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None):
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_POLL_SECONDS
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job")
+        self.slots = threading.Semaphore(self.concurrency)
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def _run(self, job):
+        try:
+            run_job(job)
+        finally:
+            close_old_connections()
+            self.slots.release()
+            self.wake()
+
+    def run_forever(self):
+        reclaimed = fail_orphaned_jobs()
+        if reclaimed:
+            log.warning(f"Failed {reclaimed} job(s) left running by a previous worker on this host")
+
+        try:
+            while not self.stopping.is_set():
+                self.wakeup.clear()
+                fail_stale_jobs()
+
+                while self.slots.acquire(blocking=False):
+                    job = claim_next()
+                    if job is None:
+                        self.slots.release()
+                        break
+                    log.info(f"Starting job {job.id} ({job.kind}) for session {job.session_id}")
+                    self.pool.submit(self._run, job)
+
+                close_old_connections()
+                self.wakeup.wait(self.poll_interval)
+        finally:
+            self.pool.shutdown(wait=True)
+
+
+_embedded = None
+_embedded_lock = threading.Lock()
+
+
+def embedded_worker():
+    """The web process's worker, started in a daemon thread on first use."""
+    global _embedded
+
+    with _embedded_lock:
+        if _embedded is None:
+            _embedded = Worker()
+            threading.Thread(target=_embedded.run_forever, name="job-worker", daemon=True).start()
+
+    return _embedded
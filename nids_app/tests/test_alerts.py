@@ -0,0 +1,461 @@
+import asyncio
+import json
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from alert_dispatcher import AlertDispatcher
+from nids_app.alerts.rollups import compact_alerts, counts_by, prune, rebuild_rollups, timeseries
+from nids_app.alerts.stream import AlertBroker, alert_stream
+from nids_app.models import Alert, AlertRollup
+
+
+ATTACKS = ["DoS", "PortScan", "DDoS"]
+
+
+def make_alerts(n, start, step=timedelta(seconds=50)):
+    return Alert.objects.bulk_create([
+        Alert(
+            ip=f"10.0.0.{i % 7}",
+            attack_type=ATTACKS[i % len(ATTACKS)],
+            severity="High" if i % 2 else "Low",
+            timestamp=start + i * step,
+        )
+        for i in range(n)
+    ])
+
+
+def response(status, text=""):
+    return mock.Mock(status_code=status, text=text)
+
+
+class DispatcherTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = Path(directory.name) / "spool.ndjson"
+
+        self.dispatcher = AlertDispatcher("http://collector/api/alerts/bulk/", single_url="http://collector/api/alert/",
+                                          spool_path=self.spool, queue_size=1, batch_size=3)
+        # No sender thread: the tests drive it
+        self.dispatcher.start = lambda: None
+        self.post = mock.patch.object(self.dispatcher.session, "post").start()
+        # The dispatcher reports each send on stdout
+        mock.patch("alert_dispatcher.print", create=True).start()
+        self.addCleanup(mock.patch.stopall)
+        self.alerts = [{"ip": f"10.0.0.{i}", "attack_type": "DoS", "severity": "High"} for i in range(10)]
+
+    def test_dropped_alert_does_not_start_cooldown(self):
+        self.assertTrue(self.dispatcher.submit("1.1.1.1", "DoS"))
+        self.assertFalse(self.dispatcher.submit("2.2.2.2", "DoS"))
+
+        self.assertEqual(self.dispatcher.stats["dropped"], 1)
+        self.assertNotIn("2.2.2.2", self.dispatcher.last_alert_time)
+
+        self.dispatcher.queue.get_nowait()
+        self.assertTrue(self.dispatcher.submit("2.2.2.2", "DoS"))
+        self.assertFalse(self.dispatcher.submit("2.2.2.2", "DoS"))
+        self.assertEqual(self.dispatcher.stats["suppressed"], 1)
+
+    def test_submitted_alert_carries_detection_time(self):
+        self.dispatcher.submit("1.1.1.1", "DoS", "Low")
+        alert = self.dispatcher.queue.get_nowait()
+
+        self.assertEqual({k: alert[k] for k in ("ip", "attack_type", "severity")},
+                         {"ip": "1.1.1.1", "attack_type": "DoS", "severity": "Low"})
+        detected = datetime.fromisoformat(alert["timestamp"])
+        self.assertLess(abs(datetime.now(dt_timezone.utc) - detected).total_seconds(), 5)
+
+    def test_batch_is_one_request(self):
+        self.post.return_value = response(200)
+
+        self.assertTrue(self.dispatcher.send(self.alerts[:3]))
+
+        self.post.assert_called_once()
+        self.assertEqual(self.post.call_args.kwargs["json"], self.alerts[:3])
+        self.assertEqual(self.dispatcher.stats["sent"], 3)
+
+    def test_failure_backs_off_and_spools(self):
+        self.post.return_value = response(503)
+
+        self.assertFalse(self.dispatcher.send(self.alerts[:3]))
+        self.assertEqual(self.dispatcher.stats["failures"], 1)
+        self.assertGreater(self.dispatcher.retry_at, 0)
+
+        self.dispatcher.spool(self.alerts[:3])
+        self.assertEqual([json.loads(line) for line in self.spool.read_text().splitlines()], self.alerts[:3])
+
+    def test_falls_back_to_single_endpoint(self):
+        self.post.side_effect = [response(404), response(200), response(200), response(503)]
+        batch = list(self.alerts[:3])
+
+        self.assertFalse(self.dispatcher.send(batch))
+
+        self.assertFalse(self.dispatcher.bulk_supported)
+        self.assertEqual([call.args[0] for call in self.post.call_args_list[1:]], ["http://collector/api/alert/"] * 3)
+        # Only the alert the collector did not take is left to spool
+        self.assertEqual(batch, self.alerts[2:3])
+
+    def test_connection_error_keeps_only_undelivered_alerts(self):
+        self.dispatcher.bulk_supported = False
+        self.post.side_effect = [response(200), requests.ConnectionError("reset")]
+        batch = list(self.alerts[:3])
+
+        self.assertFalse(self.dispatcher.send(batch))
+
+        self.assertEqual(batch, self.alerts[1:3])
+
+    def test_replay_skips_corrupt_lines(self):
+        self.dispatcher.spool(self.alerts[:2])
+        with open(self.spool, "ab") as f:
+            f.write(b'{"ip": "10.0.0.9", "attack_ty\n42\n\xff\xfe\n')
+        self.dispatcher.spool(self.alerts[2:4])
+
+        batches = []
+        self.dispatcher.send = lambda batch: batches.append(list(batch)) or True
+        self.dispatcher.replay_spool()
+
+        self.assertEqual([a for batch in batches for a in batch], self.alerts[:4])
+        self.assertEqual(self.dispatcher.stats["corrupt"], 3)
+        self.assertEqual(self.dispatcher.stats["replayed"], 4)
+        self.assertFalse(self.spool.exists())
+
+    def test_replay_keeps_unsent_alerts_in_order(self):
+        self.dispatcher.spool(self.alerts)
+
+        batches = []
+
+        def send(batch):
+            # The collector is down from the second batch on
+            if batches:
+                return False
+            batches.append(list(batch))
+            return True
+
+        self.dispatcher.send = send
+        self.dispatcher.replay_spool()
+
+        left = [json.loads(line) for line in self.spool.read_text().splitlines()]
+        self.assertEqual(batches, [self.alerts[:3]])
+        self.assertEqual(left, self.alerts[3:])
+        self.assertEqual(self.dispatcher.stats["replayed"], 3)
+
+        self.dispatcher.send = lambda batch: batches.append(list(batch)) or True
+        self.dispatcher.replay_spool()
+
+        self.assertFalse(self.spool.exists())
+        self.assertEqual([a for batch in batches for a in batch], self.alerts)
+
+
+class AlertIngestTests(TestCase):
+
+    def post(self, url, payload):
+        return self.client.post(url, data=json.dumps(payload), content_type="application/json")
+
+    def test_single_alert_keeps_detection_time(self):
+        detected = datetime(2026, 1, 1, 12, 30, tzinfo=dt_timezone.utc)
+        response = self.post("/api/alert/", {
+            "ip": "1.1.1.1", "attack_type": "DoS", "severity": "High", "timestamp": detected.isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Alert.objects.get().timestamp, detected)
+
+    def test_bulk_json_array(self):
+        response = self.post("/api/alerts/bulk/", [
+            {"ip": "1.1.1.1", "attack_type": "DoS", "severity": "High"},
+            {"ip": "2.2.2.2", "attack_type": "PortScan"},
+        ])
+
+        self.assertEqual(response.json(), {"status": "success", "created": 2})
+        self.assertEqual(list(Alert.objects.order_by("id").values_list("ip", "attack_type", "severity")), [
+            ("1.1.1.1", "DoS", "High"),
+            ("2.2.2.2", "PortScan", ""),
+        ])
+
+    def test_bulk_ndjson(self):
+        body = "\n".join(json.dumps({"ip": f"10.0.0.{i}", "attack_type": "DoS"}) for i in range(5)) + "\n\n"
+        response = self.client.post("/api/alerts/bulk/", data=body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.json()["created"], 5)
+        self.assertEqual(Alert.objects.count(), 5)
+
+    def test_bulk_is_all_or_nothing(self):
+        response = self.post("/api/alerts/bulk/", [
+            {"ip": "1.1.1.1", "attack_type": "DoS"},
+            {"ip": "2.2.2.2"},
+            "not an object",
+            {"ip": "3.3.3.3", "attack_type": "x" * 500},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.json()["errors"]], [1, 2, 3])
+        self.assertFalse(Alert.objects.exists())
+
+    def test_bulk_rejects_malformed_json(self):
+        response = self.client.post("/api/alerts/bulk/", data="[{", content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Alert.objects.exists())
+
+    @override_settings(ALERT_BULK_MAX_ITEMS=3)
+    def test_bulk_too_many_alerts(self):
+        response = self.post("/api/alerts/bulk/", [{"ip": "1.1.1.1", "attack_type": "DoS"}] * 4)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Alert.objects.exists())
+
+    def test_bulk_keeps_detection_time(self):
+        detected = datetime(2026, 1, 1, 12, 30, tzinfo=dt_timezone.utc)
+        response = self.post("/api/alerts/bulk/", [
+            {"ip": "1.1.1.1", "attack_type": "DoS", "timestamp": detected.isoformat()},
+            {"ip": "2.2.2.2", "attack_type": "DoS", "timestamp": detected.timestamp()},
+            {"ip": "3.3.3.3", "attack_type": "DoS"},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        first, second, third = Alert.objects.order_by("id")
+        self.assertEqual(first.timestamp, detected)
+        self.assertEqual(second.timestamp, detected)
+        self.assertLess(abs(third.timestamp - third.received_at), timedelta(seconds=5))
+
+    def test_future_timestamp_is_capped(self):
+        self.post("/api/alerts/bulk/", [
+            {"ip": "1.1.1.1", "attack_type": "DoS", "timestamp": "2999-01-01T00:00:00Z"},
+        ])
+        self.assertLessEqual(Alert.objects.get().timestamp, timezone.now())
+
+    def test_invalid_timestamp_rejects_request(self):
+        response = self.post("/api/alerts/bulk/", [
+            {"ip": "1.1.1.1", "attack_type": "DoS"},
+            {"ip": "2.2.2.2", "attack_type": "DoS", "timestamp": "yesterday"},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"][0]["index"], 1)
+        self.assertFalse(Alert.objects.exists())
+
+
+class DashboardLiveTests(TestCase):
+
+    def setUp(self):
+        self.start = timezone.now().replace(second=0, microsecond=0) - timedelta(hours=3)
+        make_alerts(100, self.start)
+
+    def test_counts_by_attack_type(self):
+        data = self.client.get("/api/dashboard-live/").json()
+
+        self.assertEqual(data["malicious"], 100)
+        self.assertEqual({a["name"]: a["count"] for a in data["attacks"]}, {"DoS": 34, "PortScan": 33, "DDoS": 33})
+        self.assertEqual(data["attacks"][0]["name"], "DoS")
+        self.assertEqual(data["last_alert_id"], Alert.objects.latest("id").id)
+
+    def test_recent_alerts_newest_first(self):
+        data = self.client.get("/api/dashboard-live/").json()
+
+        newest = Alert.objects.order_by("-timestamp")[:50]
+        self.assertEqual([a["id"] for a in data["alerts"]], [a.id for a in newest])
+
+    def test_since_limits_counts_and_alerts(self):
+        since = self.start + timedelta(minutes=60)
+        data = self.client.get("/api/dashboard-live/", {"since": since.isoformat()}).json()
+
+        expected = Alert.objects.filter(timestamp__gte=since)
+        self.assertEqual(data["malicious"], expected.count())
+        self.assertEqual(len(data["alerts"]), min(50, expected.count()))
+
+    def test_invalid_since(self):
+        self.assertEqual(self.client.get("/api/dashboard-live/", {"since": "soon"}).status_code, 400)
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.start = timezone.now().replace(second=0, microsecond=0) - timedelta(hours=3)
+        make_alerts(200, self.start)
+        compact_alerts(settle_seconds=0)
+        # Alerts past the cursor are counted from the Alert table
+        make_alerts(30, self.start + timedelta(minutes=7))
+
+    def table_counts(self, field, since=None):
+        alerts = Alert.objects.all()
+        if since is not None:
+            alerts = alerts.filter(timestamp__gte=since)
+        return Counter(alerts.values_list(field, flat=True))
+
+    def test_counts_match_alert_table(self):
+        for field in ("attack_type", "severity", "ip"):
+            with self.subTest(field=field):
+                self.assertEqual(counts_by(field), self.table_counts(field))
+
+    def test_counts_since_match_alert_table(self):
+        # since= counts to the minute
+        since = self.start + timedelta(minutes=95)
+        self.assertEqual(counts_by("attack_type", since), self.table_counts("attack_type", since))
+
+    def test_counts_stop_at_last_id(self):
+        last = Alert.objects.order_by("id")[209]
+        expected = Counter(Alert.objects.filter(id__lte=last.id).values_list("attack_type", flat=True))
+        self.assertEqual(counts_by("attack_type", last_id=last.id), expected)
+
+    def test_timeseries_matches_alert_table(self):
+        series = timeseries(AlertRollup.MINUTE, self.start)
+
+        expected = Counter(
+            a.timestamp.replace(second=0, microsecond=0) for a in Alert.objects.all()
+        )
+        self.assertEqual({bucket: n for bucket, _, n in series}, dict(expected))
+
+    def test_hourly_timeseries_by_key(self):
+        series = timeseries(AlertRollup.HOUR, self.start, by="attack_type")
+
+        expected = Counter(
+            (a.timestamp.replace(minute=0, second=0, microsecond=0), a.attack_type) for a in Alert.objects.all()
+        )
+        self.assertEqual({(bucket, key): n for bucket, key, n in series}, dict(expected))
+
+    def test_second_pass_folds_the_rest(self):
+        before = counts_by("attack_type")
+        self.assertEqual(compact_alerts(settle_seconds=0), 30)
+        self.assertEqual(compact_alerts(settle_seconds=0), 0)
+        self.assertEqual(counts_by("attack_type"), before)
+
+    def test_unsettled_alerts_wait(self):
+        # Just received: a slow transaction may still commit lower ids
+        self.assertEqual(compact_alerts(settle_seconds=60), 0)
+
+    def test_rebuild_matches(self):
+        before = counts_by("attack_type")
+        self.assertEqual(rebuild_rollups(), 230)
+        self.assertEqual(counts_by("attack_type"), before)
+
+    @override_settings(ROLLUP_SETTLE_SECONDS=0)
+    def test_prune_keeps_counts(self):
+        Alert.objects.filter(timestamp__lt=self.start + timedelta(hours=1)).update(
+            timestamp=F("timestamp") - timedelta(days=40),
+        )
+        rebuild_rollups()
+        before = counts_by("attack_type")
+
+        deleted = prune(alert_days=30, minute_days=0)
+
+        self.assertGreater(deleted["alerts"], 0)
+        self.assertFalse(Alert.objects.filter(timestamp__lt=timezone.now() - timedelta(days=30)).exists())
+        self.assertEqual(counts_by("attack_type"), before)
+
+    def test_timeseries_api(self):
+        response = self.client.get("/api/alerts/timeseries/", {
+            "granularity": "hour", "since": self.start.isoformat(), "by": "severity",
+        })
+
+        series = response.json()["series"]
+        self.assertEqual(sum(point["count"] for point in series), 230)
+        self.assertEqual({point["key"] for point in series}, {"High", "Low"})
+
+        self.assertEqual(self.client.get("/api/alerts/timeseries/", {"granularity": "week"}).status_code, 400)
+
+
+async def read_stream(query, method="GET"):
+    """Body of /api/alerts/stream/ up to a disconnect shortly after the replay."""
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "headers": [], "query_string": query.encode()}
+    await alert_stream(scope, receive, send)
+    return sent[0]["status"], b"".join(message.get("body", b"") for message in sent).decode()
+
+
+def stream_events(body):
+    return [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: {\"")]
+
+
+class AlertStreamTests(TestCase):
+
+    def post(self, payload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/alerts/bulk/", data=json.dumps(payload), content_type="application/json")
+
+    def test_stream_resumes_where_the_snapshot_ends(self):
+        self.post([{"ip": "1.1.1.1", "attack_type": "DoS"}])
+
+        snapshot = self.client.get("/api/dashboard-live/").json()
+        self.assertEqual(snapshot["malicious"], 1)
+
+        self.post([
+            {"ip": "2.2.2.2", "attack_type": "PortScan"},
+            {"ip": "3.3.3.3", "attack_type": "PortScan"},
+        ])
+
+        status, body = asyncio.run(read_stream(f"last_event_id={snapshot['stream_id']}"))
+
+        self.assertEqual(status, 200)
+        streamed = [a["id"] for event in stream_events(body) for a in event["alerts"]]
+        after = list(Alert.objects.filter(id__gt=snapshot["last_alert_id"]).values_list("id", flat=True))
+        self.assertEqual(streamed, after)
+
+    def test_unknown_position_asks_for_resync(self):
+        self.post([{"ip": "1.1.1.1", "attack_type": "DoS"}])
+
+        _, body = asyncio.run(read_stream("last_event_id=0-1"))
+
+        self.assertIn("event: resync", body)
+        self.assertEqual(stream_events(body), [])
+
+    def test_only_get(self):
+        status, _ = asyncio.run(read_stream("", method="POST"))
+        self.assertEqual(status, 405)
+
+    def test_not_served_over_wsgi(self):
+        # gunicorn deployments: the page's EventSource fails and it polls instead
+        self.assertEqual(self.client.get("/api/alerts/stream/").status_code, 404)
+
+
+class BrokerTests(SimpleTestCase):
+
+    def alerts(self, n):
+        now = timezone.now()
+        return [Alert(id=i, ip="1.1.1.1", attack_type="DoS", severity="High", timestamp=now) for i in range(n)]
+
+    def test_history_replay_and_expiry(self):
+        broker = AlertBroker(history=3)
+        start = broker.last_event_id()
+        for i in range(5):
+            broker.publish(self.alerts(1))
+
+        self.assertIsNone(broker.replay_after(start))
+        self.assertEqual([seq for seq, _ in broker.replay_after(f"{broker.epoch}-2")], [3, 4, 5])
+        self.assertEqual(broker.replay_after(broker.last_event_id()), [])
+        self.assertEqual(broker.replay_after(""), [])
+
+    def test_slow_client_is_told_to_resync(self):
+        async def overflow():
+            broker = AlertBroker(client_buffer=2)
+            subscription, backlog = broker.subscribe()
+            for _ in range(3):
+                broker.publish(self.alerts(1))
+            first = await subscription.next_events(1)
+
+            broker.publish(self.alerts(2))
+            second = await subscription.next_events(1)
+            return backlog, first, second
+
+        backlog, first, second = asyncio.run(overflow())
+
+        self.assertEqual(backlog, [])
+        self.assertIsNone(first)
+        self.assertEqual([seq for seq, _ in second], [4])
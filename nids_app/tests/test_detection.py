@@ -0,0 +1,121 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase
+
+# The benchmarks hold the legacy row-wise engine and the synthetic flows
+sys.path.insert(0, str(Path(settings.BASE_DIR) / "benchmarks"))
+
+from bench_hybrid_detection import legacy_hybrid_detection, legacy_match_signatures  # noqa: E402
+from synthetic import SIGNATURES, make_predictions  # noqa: E402
+
+from scripts.signature_detect import (  # noqa: E402
+    AhoCorasick,
+    SignatureMatcher,
+    hybrid_detection,
+    load_matcher,
+    required_literals,
+)
+
+TEXTS = [
+    "GET /search?q=1 UNION   SELECT password FROM users",
+    "<SCRIPT>alert(1)</script>",
+    "ssh-bruteforce from 10.0.0.1",
+    "spawned CMD.EXE /c whoami",
+    "powershell.exe -enc AAAA",
+    "items[0]",
+    "DDoS LOIC",
+    "aaab",
+    "plain benign traffic",
+    "",
+]
+
+EXTRA_SIGNATURES = [r"a+b", r"\bselect\b", r"(?i)loic", r"whoami$", r"items\[", r"("]
+
+
+class HybridDetectionTests(SimpleTestCase):
+
+    def frame(self, n=2000):
+        df = make_predictions(n)
+        rng = np.random.default_rng(7)
+        df["Payload"] = rng.choice(TEXTS + [None], len(df))
+        return df
+
+    def test_output_identical_to_legacy(self):
+        df = self.frame()
+
+        legacy = legacy_hybrid_detection(df, SIGNATURES)
+        vectorized = hybrid_detection(df, SIGNATURES)
+
+        self.assertEqual(vectorized.to_csv(index=False), legacy.to_csv(index=False))
+
+    def test_input_frame_is_left_alone(self):
+        df = self.frame(200)
+        before = df.copy()
+
+        hybrid_detection(df, SIGNATURES)
+
+        self.assertEqual(list(df.columns), list(before.columns))
+        self.assertTrue(df.equals(before))
+
+    def test_without_probability_column(self):
+        df = self.frame(200).drop(columns=["ml_probability"])
+
+        legacy = legacy_hybrid_detection(df, SIGNATURES)
+        vectorized = hybrid_detection(df, SIGNATURES)
+
+        self.assertEqual(vectorized.to_csv(index=False), legacy.to_csv(index=False))
+
+
+class SignatureMatcherTests(SimpleTestCase):
+
+    def matcher(self, sigs):
+        # Invalid regexes are logged and matched as plain text
+        with self.assertLogs("scripts.signature_detect", "INFO"):
+            return SignatureMatcher(sigs)
+
+    def test_match_agrees_with_legacy_engine(self):
+        sigs = SIGNATURES + EXTRA_SIGNATURES
+        matcher = self.matcher(sigs)
+
+        for text in TEXTS:
+            with self.subTest(text=text):
+                self.assertEqual(matcher.match(text), legacy_match_signatures(text, sigs))
+
+    def test_duplicate_signatures_compiled_once(self):
+        matcher = self.matcher([r"DDoS", r"DDoS", r"<script>"])
+
+        self.assertEqual(len(matcher), 2)
+        self.assertEqual(matcher.match("ddos <SCRIPT>"), ["DDoS", "<script>"])
+
+    def test_required_literals(self):
+        self.assertEqual(required_literals(r"union\s+select"), ("select",))
+        self.assertEqual(required_literals(r"(?:cmd|powershell)\.exe"), (".exe",))
+        self.assertEqual(required_literals(r"(?:cmd|powershell)"), ("cmd", "powershell"))
+        # Digits-only literals can occur in numeric columns: no prefilter
+        self.assertEqual(required_literals(r"4444"), ())
+
+    def test_aho_corasick_finds_overlapping_words(self):
+        automaton = AhoCorasick(["he", "she", "hers"])
+        self.assertEqual(automaton.find("ushers"), {0, 1, 2})
+        self.assertEqual(automaton.find("nothing"), set())
+
+    def test_load_matcher_rebuilds_when_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "signatures.txt"
+            path.write_text("DDoS\n")
+            with self.assertLogs("scripts.signature_detect", "INFO"):
+                first = load_matcher(path)
+            self.assertIs(load_matcher(path), first)
+
+            path.write_text("DDoS\nPortScan\n")
+            os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+            with self.assertLogs("scripts.signature_detect", "INFO"):
+                second = load_matcher(path)
+
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second), 2)
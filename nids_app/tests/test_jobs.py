@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from nids_app.models import Job
+from nids_app.pipeline import jobs
+
+
+@override_settings(JOB_CONCURRENCY=2, JOB_WORKER="external")
+class ClaimTests(TestCase):
+
+    def enqueue(self, n):
+        return [jobs.enqueue("preprocess", f"session-{i}") for i in range(n)]
+
+    def test_claims_stop_at_concurrency(self):
+        queued = self.enqueue(3)
+
+        first, second = jobs.claim_next(), jobs.claim_next()
+
+        self.assertEqual([first.id, second.id], [queued[0].id, queued[1].id])
+        self.assertEqual({first.slot, second.slot}, {0, 1})
+        self.assertEqual(first.worker, jobs.worker_id())
+        self.assertIsNone(jobs.claim_next())
+        self.assertEqual(Job.objects.get(id=queued[2].id).status, Job.QUEUED)
+
+    def test_finished_job_frees_its_slot(self):
+        queued = self.enqueue(3)
+        first, _ = jobs.claim_next(), jobs.claim_next()
+
+        Job.objects.filter(id=first.id).update(status=Job.SUCCEEDED)
+        third = jobs.claim_next()
+
+        self.assertEqual(third.id, queued[2].id)
+        self.assertEqual(third.slot, first.slot)
+
+    def test_running_slot_is_unique(self):
+        a, b = self.enqueue(2)
+        Job.objects.filter(id=a.id).update(status=Job.RUNNING, slot=0)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.filter(id=b.id).update(status=Job.RUNNING, slot=0)
+
+    def test_claim_with_stale_free_slots_takes_the_next_slot(self):
+        # Another worker took slot 0 after this one listed the free slots
+        self.enqueue(2)
+        jobs.claim_next()
+
+        with mock.patch.object(jobs, "free_slots", return_value=[0, 1]):
+            job = jobs.claim_next()
+        self.assertEqual(job.slot, 1)
+
+        Job.objects.create(session_id="late", kind="predict")
+        with mock.patch.object(jobs, "free_slots", return_value=[0]):
+            self.assertIsNone(jobs.claim_next())
+        self.assertEqual(Job.objects.filter(status=Job.RUNNING).count(), 2)
+
+    def test_running_job_without_slot_counts(self):
+        Job.objects.create(session_id="old", kind="train", status=Job.RUNNING)
+        self.enqueue(2)
+
+        self.assertIsNotNone(jobs.claim_next())
+        self.assertIsNone(jobs.claim_next())
+
+    @override_settings(JOB_STALE_SECONDS=60)
+    def test_stale_running_job_is_failed(self):
+        job = self.enqueue(1)[0]
+        jobs.claim_next()
+        Job.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(minutes=5))
+
+        self.assertEqual(jobs.fail_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.FAILED)
+        self.assertEqual(jobs.fail_stale_jobs(), 0)
+
+    def test_orphaned_jobs_on_this_host_are_failed(self):
+        host = jobs.worker_id().rsplit(":", 1)[0]
+        finished = subprocess.Popen([sys.executable, "-c", "pass"])
+        finished.wait()
+
+        owners = {
+            "own pid": jobs.worker_id(),
+            "dead process": f"{host}:{finished.pid}",
+            "live process": f"{host}:{os.getppid()}",
+            "other host": f"{host}-other:{finished.pid}",
+            "unknown": "",
+        }
+        running = {
+            name: Job.objects.create(session_id=name, kind="train", status=Job.RUNNING, worker=worker)
+            for name, worker in owners.items()
+        }
+
+        self.assertEqual(jobs.fail_orphaned_jobs(), 2)
+        status = {name: Job.objects.get(id=job.id).status for name, job in running.items()}
+        self.assertEqual(status, {
+            "own pid": Job.FAILED,
+            "dead process": Job.FAILED,
+            "live process": Job.RUNNING,
+            "other host": Job.RUNNING,
+            "unknown": Job.RUNNING,
+        })
+        self.assertEqual(jobs.fail_orphaned_jobs(), 0)
+
+    def test_worker_reclaims_orphans_on_start(self):
+        job = Job.objects.create(session_id="old", kind="train", status=Job.RUNNING, slot=0, worker=jobs.worker_id())
+        worker = jobs.Worker(concurrency=1, poll_interval=0.01)
+        worker.stop()
+
+        worker.run_forever()
+
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.FAILED)
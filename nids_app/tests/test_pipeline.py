@@ -0,0 +1,360 @@
+import shutil
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, str(Path(settings.BASE_DIR) / "benchmarks"))
+
+from synthetic import NUMERIC_FEATURES, SIGNATURES, make_flows  # noqa: E402
+
+from nids_app import views  # noqa: E402
+from nids_app.pipeline import automated  # noqa: E402
+from nids_app.pipeline.automated import run_full_pipeline  # noqa: E402
+from scripts import artifacts, out_of_core, predict, preprocess, signature_detect, train_model  # noqa: E402
+
+FEATURES = ["Destination Port"] + NUMERIC_FEATURES[:8]
+
+
+def small_model():
+    train = make_flows(1000, seed=1)
+    clf = RandomForestClassifier(n_estimators=10, random_state=0)
+    clf.fit(train[FEATURES], train["Label"] == "BENIGN")
+    return clf, FEATURES
+
+
+class SessionTestCase(SimpleTestCase):
+    """A session under a temporary data/ directory, with a synthetic upload."""
+
+    ROWS = 5000
+
+    def setUp(self):
+        self.base_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+
+        for target, value in (
+            (preprocess, {"BASE_DIR": self.base_dir}),
+            (predict, {"BASE_DIR": self.base_dir}),
+            (train_model, {"BASE_DIR": self.base_dir}),
+            (signature_detect, {
+                "data_dir": self.base_dir / "data",
+                "SIGNATURES_PATH": self.base_dir / "data" / "signatures.txt",
+            }),
+        ):
+            patcher = mock.patch.multiple(target, **value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        overrides = override_settings(BASE_DIR=self.base_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        (self.base_dir / "data").mkdir()
+        (self.base_dir / "data" / "signatures.txt").write_text("\n".join(SIGNATURES) + "\n")
+
+        self.session_id = str(uuid.uuid4())
+        self.raw_path, self.store = preprocess.session_paths(self.session_id)
+        self.raw_path.parent.mkdir(parents=True)
+        self.write_upload(make_flows(self.ROWS))
+
+    def write_upload(self, df):
+        df.to_csv(self.raw_path, index=False)
+
+
+class ChunkedPipelineTests(SessionTestCase):
+    """--chunksize streaming writes the same artifacts as the in-memory run."""
+
+    CHUNKSIZE = 777
+
+    def assert_same_artifact(self, name, run_full, run_chunked):
+        run_full()
+        full_bytes = self.store.locate(name).read_bytes()
+        full = self.store.read(name)
+
+        rows = run_chunked()
+
+        self.assertEqual(rows, len(full))
+        pd.testing.assert_frame_equal(self.store.read(name), full)
+        if self.store.locate(name).suffix == ".csv":
+            self.assertEqual(self.store.locate(name).read_bytes(), full_bytes)
+
+    def check_stages(self):
+        model = small_model()
+
+        with self.subTest(stage="preprocess"):
+            self.assert_same_artifact(
+                "preprocessed",
+                lambda: preprocess.run(self.session_id),
+                lambda: preprocess.run_chunked(self.session_id, self.CHUNKSIZE),
+            )
+        with self.subTest(stage="predict"):
+            self.assert_same_artifact(
+                "predictions",
+                lambda: predict.run(self.session_id, model=model),
+                lambda: predict.run_chunked(self.session_id, self.CHUNKSIZE, model=model),
+            )
+        with self.subTest(stage="hybrid"), self.assertLogs("scripts.signature_detect", "INFO"):
+            self.assert_same_artifact(
+                "hybrid_output",
+                lambda: signature_detect.run(self.session_id),
+                lambda: signature_detect.run_chunked(self.session_id, self.CHUNKSIZE),
+            )
+
+    def test_feather_stages(self):
+        with mock.patch.object(artifacts, "ARTIFACT_FORMAT", "feather"):
+            self.check_stages()
+
+    def test_csv_stages_byte_identical(self):
+        with mock.patch.object(artifacts, "ARTIFACT_FORMAT", "csv"):
+            self.check_stages()
+
+    def test_int_column_with_late_missing_values(self):
+        # int in the first chunks, float once a NaN shows up: whole-file dtype in every chunk
+        df = make_flows(self.ROWS)
+        df["Fwd PSH Flags"] = np.arange(self.ROWS, dtype=float)
+        df.loc[self.ROWS - 3, "Fwd PSH Flags"] = np.nan
+        self.write_upload(df)
+
+        with mock.patch.object(artifacts, "ARTIFACT_FORMAT", "csv"):
+            self.assert_same_artifact(
+                "preprocessed",
+                lambda: preprocess.run(self.session_id),
+                lambda: preprocess.run_chunked(self.session_id, self.CHUNKSIZE),
+            )
+
+    def test_column_turning_text_late(self):
+        # Past pandas' low_memory block size a plain read_csv parses the
+        # first block as ints ("00042" -> 42) and keeps the rest as text
+        n = 300_000
+        df = pd.DataFrame({"Flow ID": [f"{i:05d}" for i in range(n)], "Label": "BENIGN"})
+        df.loc[n - 5, "Flow ID"] = "192.168.0.1-80"
+        self.write_upload(df)
+
+        with mock.patch.object(artifacts, "ARTIFACT_FORMAT", "feather"):
+            self.assert_same_artifact(
+                "preprocessed",
+                lambda: preprocess.run(self.session_id),
+                lambda: preprocess.run_chunked(self.session_id, 50_000),
+            )
+
+    def test_missing_upload(self):
+        self.raw_path.unlink()
+        with self.assertRaises(FileNotFoundError):
+            preprocess.run_chunked(self.session_id, self.CHUNKSIZE)
+
+
+class InProcessPipelineTests(SessionTestCase):
+
+    ROWS = 2000
+
+    def run_pipeline(self, **kwargs):
+        lines, progress = [], []
+        with self.assertLogs("scripts", "INFO"):
+            run_full_pipeline(self.session_id, log_callback=lines.append, in_process=True,
+                              progress_callback=lambda done, total: progress.append((done, total)), **kwargs)
+        return lines, progress
+
+    def test_same_output_as_stage_by_stage(self):
+        self.run_pipeline()
+        in_memory = self.store.read("hybrid_output")
+
+        # The stages one by one, each reading the previous stage's artifact
+        with self.assertLogs("scripts", "INFO"):
+            preprocess.run(self.session_id)
+            train_model.run(self.session_id, mode="full")
+            predict.run(self.session_id, model=None)
+            signature_detect.run(self.session_id)
+
+        pd.testing.assert_frame_equal(self.store.read("hybrid_output"), in_memory)
+
+    def test_only_requested_checkpoints_are_written(self):
+        lines, progress = self.run_pipeline(checkpoints=["predictions"])
+
+        self.assertTrue(self.store.exists("hybrid_output"))
+        self.assertTrue(self.store.exists("predictions"))
+        self.assertFalse(self.store.exists("preprocessed"))
+        self.assertFalse((self.store.directory / "model.pkl").exists())
+
+        self.assertEqual(progress, [(1, 4), (2, 4), (3, 4), (4, 4)])
+        self.assertIn("Hybrid detection completed successfully.\n", lines)
+
+    def test_unknown_checkpoint(self):
+        with self.assertRaises(ValueError):
+            run_full_pipeline(self.session_id, in_process=True, checkpoints=["everything"])
+
+    def test_upload_over_the_memory_budget_streams(self):
+        budget = self.raw_path.stat().st_size
+        with mock.patch.object(out_of_core, "memory_budget", return_value=budget), \
+                mock.patch.object(automated, "LARGE_UPLOAD_CHUNKSIZE", 500), \
+                mock.patch.object(preprocess, "run", wraps=preprocess.run) as run_whole, \
+                mock.patch.object(train_model, "run", wraps=train_model.run) as train, \
+                mock.patch.object(train_model, "run_out_of_core", wraps=train_model.run_out_of_core) as streamed:
+            self.run_pipeline()
+
+        run_whole.assert_not_called()
+        self.assertIsNone(train.call_args.args[1])
+        streamed.assert_called_once()
+        self.assertEqual(self.store.rows("hybrid_output"), self.ROWS)
+
+    def test_stage_failure_names_the_stage(self):
+        self.raw_path.unlink()
+        with self.assertRaisesRegex(RuntimeError, "^Preprocessing failed"), self.assertLogs("scripts", "INFO"):
+            run_full_pipeline(self.session_id, in_process=True)
+
+
+class ArtifactStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.df = make_flows(500, seed=4)
+
+    def test_round_trip_every_format(self):
+        for fmt in artifacts.FORMATS:
+            with self.subTest(fmt=fmt):
+                store = artifacts.ArtifactStore(self.directory / fmt, fmt)
+                path = store.write("predictions", self.df)
+
+                self.assertEqual(path.suffix, f".{fmt}")
+                pd.testing.assert_frame_equal(store.read("predictions"), self.df)
+                self.assertEqual(store.rows("predictions"), len(self.df))
+                self.assertEqual(store.columns("predictions"), list(self.df.columns))
+                pd.testing.assert_frame_equal(store.read("predictions", columns=["Label"]), self.df[["Label"]])
+
+    def test_chunked_write_and_read(self):
+        for fmt in artifacts.FORMATS:
+            with self.subTest(fmt=fmt):
+                store = artifacts.ArtifactStore(self.directory / fmt, fmt)
+                chunks = [self.df.iloc[i:i + 200] for i in range(0, len(self.df), 200)]
+
+                self.assertEqual(store.write_chunks("predictions", chunks), len(self.df))
+                parts = list(store.iter_chunks("predictions", 150))
+                self.assertLessEqual(max(len(p) for p in parts), 150)
+                pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), self.df)
+
+    def test_later_chunks_widen_the_schema(self):
+        df = pd.DataFrame({
+            "Flow Duration": [1.0, 2.0, 1.5, 2.5],
+            "Destination Port": [80, 443, 22, "http-alt"],
+            "Label": ["BENIGN", "BENIGN", "DDoS", None],
+        })
+        for fmt in artifacts.FORMATS:
+            with self.subTest(fmt=fmt):
+                store = artifacts.ArtifactStore(self.directory / fmt, fmt)
+                store.write("whole", df)
+                # First chunk: integers in both numeric columns
+                chunks = [
+                    df.iloc[:2].astype({"Flow Duration": "int64", "Destination Port": "int64"}),
+                    df.iloc[2:3].astype({"Destination Port": "int64"}),
+                    df.iloc[3:],
+                ]
+
+                self.assertEqual(store.write_chunks("chunked", chunks), len(df))
+                pd.testing.assert_frame_equal(store.read("chunked"), store.read("whole"))
+                self.assertEqual(sorted(p.name for p in store.directory.iterdir()),
+                                 sorted([f"chunked.{fmt}", f"whole.{fmt}"]))
+
+    def test_reads_artifact_written_in_another_format(self):
+        artifacts.ArtifactStore(self.directory, "csv").write("preprocessed", self.df)
+
+        store = artifacts.ArtifactStore(self.directory, "feather")
+        self.assertTrue(store.exists("preprocessed"))
+        self.assertEqual(store.locate("preprocessed").suffix, ".csv")
+        pd.testing.assert_frame_equal(store.read("preprocessed"), self.df)
+
+        # Rewriting in the new format removes the old copy
+        store.write("preprocessed", self.df)
+        self.assertEqual(sorted(p.name for p in self.directory.iterdir()), ["preprocessed.feather"])
+
+    def test_missing_artifact(self):
+        store = artifacts.ArtifactStore(self.directory)
+        self.assertFalse(store.exists("hybrid_output"))
+        with self.assertRaises(FileNotFoundError):
+            store.read("hybrid_output")
+
+    def test_reads_do_not_create_the_directory(self):
+        store = artifacts.ArtifactStore(self.directory / "session")
+        self.assertFalse(store.exists("preprocessed"))
+        self.assertEqual(store.locate("preprocessed"), store.path("preprocessed"))
+        self.assertFalse(store.directory.exists())
+
+        store.write_chunks("preprocessed", [self.df])
+        self.assertTrue(store.exists("preprocessed"))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            artifacts.ArtifactStore(self.directory, "xlsx")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class DashboardBatchTests(TestCase):
+
+    def setUp(self):
+        self.base_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+        overrides = override_settings(BASE_DIR=self.base_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(cache.clear)
+
+        self.assertEqual(self.get().json(), {"benign": 0, "malicious": 0, "attacks": []})
+        self.store = views.session_store(self.client.session["pipeline_session"])
+
+    def get(self, **headers):
+        return self.client.get("/api/dashboard-batch/", headers=headers)
+
+    def write_output(self, decisions):
+        self.store.write("hybrid_output", pd.DataFrame({
+            "Final Decision": decisions,
+            "Attack Type": ["DoS" if d == "Malicious" else "BENIGN" for d in decisions],
+            "ml_probability": [0.9 if d == "Malicious" else 0.1 for d in decisions],
+        }))
+
+    def test_summary_is_cached_until_the_output_changes(self):
+        self.write_output(["Benign", "Malicious", "Malicious"])
+
+        with mock.patch.object(views, "batch_summary", wraps=views.batch_summary) as summary:
+            first = self.get()
+            second = self.get()
+            self.assertEqual(summary.call_count, 1)
+
+            # Fewer rows: the size changes even within one mtime tick
+            self.write_output(["Malicious"])
+            third = self.get()
+            self.assertEqual(summary.call_count, 2)
+
+        self.assertEqual(first.json()["malicious"], 2)
+        self.assertEqual(first.json()["attacks"][0]["name"], "DoS")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(third.json()["malicious"], 1)
+        self.assertNotEqual(third["ETag"], first["ETag"])
+
+    def test_etag_revalidation(self):
+        self.write_output(["Benign", "Malicious"])
+        etag = self.get()["ETag"]
+
+        response = self.get(if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    @override_settings(DASHBOARD_CACHE_FINGERPRINT="hash")
+    def test_hash_fingerprint_ignores_identical_rewrites(self):
+        self.write_output(["Benign", "Malicious"])
+        etag = self.get()["ETag"]
+
+        self.write_output(["Benign", "Malicious"])
+        self.assertEqual(self.get()["ETag"], etag)
+
+        self.write_output(["Malicious", "Benign"])
+        self.assertNotEqual(self.get()["ETag"], etag)
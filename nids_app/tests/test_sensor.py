@@ -0,0 +1,431 @@
+import contextlib
+import io
+import queue
+import shutil
+import sys
+import tempfile
+from collections import deque
+from pathlib import Path
+from unittest import mock
+
+import joblib
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase
+from scapy.layers.inet import ICMP, IP, TCP, UDP
+from scapy.layers.inet6 import IPv6
+from scapy.layers.l2 import ARP, Dot1Q, Ether
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, str(Path(settings.BASE_DIR) / "benchmarks"))
+
+from synthetic import synthetic_frames, write_pcap  # noqa: E402
+
+import live_detection  # noqa: E402
+from capture import parse_frame, parse_packet, pcap_frames  # noqa: E402
+from cic_flow import ACK, CIC_FEATURES, FIN, SYN, CICFlowTable  # noqa: E402
+from flow_table import FlowTable  # noqa: E402
+from scripts.compiled_forest import compile_forest  # noqa: E402
+
+
+def live_model(seed=0):
+    rng = np.random.default_rng(seed)
+    n = 2000
+    df = pd.DataFrame({
+        "duration": rng.exponential(4.0, n),
+        "packet_count": rng.integers(1, 200, n),
+        "byte_count": rng.integers(60, 20000, n),
+    })
+    df["bytes_per_sec"] = df["byte_count"] / (df["duration"] + 1)
+    y = np.where(df["packet_count"] > 120, "Attack", "BENIGN")
+
+    model = RandomForestClassifier(n_estimators=10, random_state=seed)
+    model.fit(df[live_detection.FEATURES], y)
+    return model
+
+
+def patch_sensor(test, **values):
+    """Replace live_detection module state for the duration of ``test``."""
+    for name, value in values.items():
+        patcher = mock.patch.object(live_detection, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+def quietly(fn, *args, **kwargs):
+    # The sensor prints every verdict
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+class LiveInferenceTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.model = live_model()
+
+    def setUp(self):
+        self.now = 1_700_000_000.0
+        self.table = FlowTable(64)
+        rng = np.random.default_rng(3)
+        for i in range(40):
+            key = (f"10.0.0.{i}", "10.1.0.1", 6)
+            packets = int(rng.integers(1, 200))
+            for t, port in zip(np.linspace(self.now - 4, self.now - 1, packets), rng.integers(1, 1024, packets)):
+                self.table.update(key, t, int(rng.integers(60, 200)), int(port))
+
+        patch_sensor(self, flows=self.table, model=self.model, compiled_model=None)
+
+    def test_one_batch_matches_per_flow_predictions(self):
+        keys, X, _ = live_detection.collect_due_flows(self.now)
+        labels, probs = live_detection.classify(X)
+
+        self.assertEqual(len(keys), 40)
+        frame = pd.DataFrame(X, columns=live_detection.FEATURES)
+        for i in range(len(keys)):
+            row = frame.iloc[[i]]
+            self.assertEqual(labels[i], self.model.predict(row)[0])
+            self.assertEqual(probs[i], self.model.predict_proba(row)[0][1])
+
+    def test_compiled_forest_agrees(self):
+        _, X, _ = live_detection.collect_due_flows(self.now)
+        labels, probs = live_detection.classify(X)
+
+        with mock.patch.object(live_detection, "compiled_model", compile_forest(self.model)):
+            compiled_labels, compiled_probs = live_detection.classify(X)
+
+        np.testing.assert_array_equal(compiled_labels, labels)
+        np.testing.assert_allclose(compiled_probs, probs)
+
+    def test_signature_alerts(self):
+        keys = [(f"10.0.0.{i}", "10.1.0.1", 6) for i in range(4)]
+        X = np.array([
+            [2.0, 10, 9000, 4500],   # large transfer
+            [2.0, 10, 600, 300],     # many ports
+            [2.0, 50, 3000, 1500],   # many packets
+            [2.0, 3, 180, 90],
+        ])
+        alerts = []
+
+        with mock.patch.object(live_detection, "model", None):
+            quietly(live_detection.analyze_flows, keys, X, [1, 30, 1, 1], alert=lambda *a: alerts.append(a))
+
+        self.assertEqual(alerts, [
+            ("10.0.0.0", "Data Exfiltration", "High"),
+            ("10.0.0.1", "Port Scan", "Medium"),
+            ("10.0.0.2", "DoS Attack", "High"),
+        ])
+
+
+class FlowTableTests(SimpleTestCase):
+
+    def test_counts_and_features(self):
+        table = FlowTable(8)
+        key = ("10.0.0.1", "10.0.0.2", 6)
+        table.update(key, 10.0, 100, 80)
+        table.update(key, 12.0, 300, 80)
+
+        slot = table.slots[key]
+        np.testing.assert_array_equal(table.features([slot]), [[2.0, 2.0, 400.0, 200.0]])
+        self.assertEqual(table.distinct_ports(np.array([slot])).tolist(), [1])
+        self.assertEqual(table.flow_keys([slot]), [key])
+
+    def test_distinct_port_estimate(self):
+        table = FlowTable(1)
+        key = ("10.0.0.1", "10.0.0.2", 6)
+        for port in range(1, 101):
+            table.update(key, 1.0, 60, port)
+
+        estimate = table.distinct_ports(np.array([0]))[0]
+        self.assertLess(abs(estimate - 100), 15)
+
+    def test_idle_flows_expire_before_eviction(self):
+        table = FlowTable(4, idle_timeout=5)
+        for i in range(4):
+            table.update((f"10.0.0.{i}", "10.0.0.9", 6), float(i * 3), 60)
+
+        # Only the first flow (last seen at 0) is idle at t=7
+        table.update(("10.0.0.8", "10.0.0.9", 6), 7.0, 60)
+
+        self.assertEqual((table.expired, table.evicted), (1, 0))
+        self.assertNotIn(("10.0.0.0", "10.0.0.9", 6), table)
+        self.assertEqual(len(table), 4)
+
+    def test_full_table_evicts_least_recently_seen(self):
+        table = FlowTable(32)
+        for i in range(32):
+            table.update((f"10.0.0.{i}", "10.0.0.9", 6), float(i), 60)
+
+        table.update(("10.0.1.0", "10.0.0.9", 6), 100.0, 60)
+
+        # One sixteenth of the table goes at once: the two oldest flows
+        self.assertEqual(table.evicted, 2)
+        self.assertNotIn(("10.0.0.0", "10.0.0.9", 6), table)
+        self.assertNotIn(("10.0.0.1", "10.0.0.9", 6), table)
+        self.assertIn(("10.0.0.2", "10.0.0.9", 6), table)
+        self.assertEqual(table.stats()["peak"], 32)
+
+    def test_released_slot_starts_clean(self):
+        table = FlowTable(1)
+        table.update(("10.0.0.1", "10.0.0.2", 6), 1.0, 500, 22)
+        table.expire(10.0, 5)
+
+        table.update(("10.0.0.3", "10.0.0.2", 17), 11.0, 60, 53)
+
+        np.testing.assert_array_equal(table.features([0]), [[0.0, 1.0, 60.0, 0.0]])
+        self.assertEqual(table.distinct_ports(np.array([0])).tolist(), [1])
+        self.assertEqual(table.inserted, 2)
+
+
+def closing_packet(i):
+    """parse_packet() tuple of a one-packet TCP flow ended by FIN."""
+    return (f"10.0.0.{i}", "192.168.0.1", 40000 + i, 80, 6, 100, 20, FIN | ACK, 64240)
+
+
+class CICFlowTests(SimpleTestCase):
+
+    def finish(self, table, *flows):
+        for i in flows:
+            table.update(closing_packet(i), ts=float(i))
+
+    def test_reply_joins_the_forward_flow(self):
+        table = CICFlowTable(capacity=8)
+        client = ("10.0.0.1", "10.0.0.2", 40000, 443, 6)
+        table.update((*client, 0, 40, SYN, 64240), ts=1.0)
+        table.update(("10.0.0.2", "10.0.0.1", 443, 40000, 6, 0, 40, SYN | ACK, 65535), ts=1.5)
+        table.update((*client, 200, 32, FIN | ACK, 64240), ts=3.0)
+
+        keys, X = table.collect()
+        row = dict(zip(CIC_FEATURES, X[0]))
+
+        self.assertEqual(keys, [client])
+        self.assertEqual(row["Destination Port"], 443)
+        self.assertEqual(row["Flow Duration"], 2e6)
+        self.assertEqual((row["Total Fwd Packets"], row["Total Backward Packets"]), (2, 1))
+        self.assertEqual(row["Total Length of Fwd Packets"], 200)
+        self.assertEqual((row["SYN Flag Count"], row["FIN Flag Count"]), (2, 1))
+        self.assertEqual((row["Init_Win_bytes_forward"], row["Init_Win_bytes_backward"]), (64240, 65535))
+        self.assertEqual(row["Flow IAT Max"], 1.5e6)
+        self.assertEqual(table.stats()["closed"], 1)
+
+    def test_idle_flows_expire(self):
+        table = CICFlowTable(capacity=8, idle_timeout=5)
+        table.update(("10.0.0.1", "10.0.0.2", 5353, 53, 17, 30, 8, 0, 0), ts=0.0)
+        table.update(("10.0.0.3", "10.0.0.2", 5353, 53, 17, 30, 8, 0, 0), ts=4.0)
+
+        self.assertEqual(table.expire(7.0), 1)
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table.collect()[0][0][0], "10.0.0.1")
+
+    def test_requeued_flows_come_back_first(self):
+        table = CICFlowTable(capacity=10)
+        self.finish(table, 1, 2)
+        keys, X = table.collect()
+
+        # Analysis skipped the tick: hand the flows back, more finish meanwhile
+        table.requeue(keys, X)
+        self.finish(table, 3)
+        again, X_again = table.collect()
+
+        self.assertEqual(again[:2], keys)
+        self.assertEqual(again[2][0], "10.0.0.3")
+        self.assertEqual(X_again[:2].tolist(), X.tolist())
+        self.assertEqual(table.lost, 0)
+
+    def test_requeue_beyond_capacity_counts_lost(self):
+        table = CICFlowTable(capacity=2)
+        self.finish(table, 1, 2)
+        keys, X = table.collect()
+        self.finish(table, 3)
+
+        table.requeue(keys, X)
+
+        self.assertEqual(table.lost, 1)
+        self.assertEqual(table.stats()["pending"], 2)
+        self.assertEqual([key[0] for key in table.collect()[0]], ["10.0.0.2", "10.0.0.3"])
+
+
+class IngestTests(SimpleTestCase):
+
+    def setUp(self):
+        self.stats = dict.fromkeys(live_detection.ingest_stats, 0)
+        patch_sensor(
+            self,
+            flows=FlowTable(16, idle_timeout=live_detection.FLOW_TIMEOUT),
+            packet_buffer=deque(),
+            analysis_queue=queue.Queue(maxsize=1),
+            ingest_stats=self.stats,
+            cic_flows=None,
+            last_packet_ts=0.0,
+            PACKET_BUFFER_SIZE=3,
+        )
+
+    def packet(self, i, ts, **kwargs):
+        return live_detection.enqueue_packet((f"10.0.0.{i}", "10.0.0.9", 6), ts, 60, 80, **kwargs)
+
+    def test_full_buffer_drops_instead_of_blocking(self):
+        results = [self.packet(i, 1.0) for i in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual((self.stats["captured"], self.stats["dropped"]), (3, 2))
+
+    def test_drain_applies_buffered_packets(self):
+        for i, ts in enumerate([1.0, 2.0, 3.0]):
+            self.packet(i % 2, ts)
+
+        self.assertEqual(live_detection.drain_packets(limit=2), 2)
+        self.assertEqual(live_detection.drain_packets(), 1)
+
+        self.assertEqual(len(live_detection.flows), 2)
+        self.assertEqual(live_detection.last_packet_ts, 3.0)
+        self.assertEqual(self.stats["aggregated"], 3)
+        self.assertFalse(live_detection.packet_buffer)
+
+    def test_busy_analyzer_skips_the_tick_without_expiring(self):
+        self.packet(0, 0.0)
+        self.packet(0, 4.0)
+        self.packet(1, 0.0)
+        live_detection.drain_packets()
+
+        live_detection.dispatch_snapshot(10.0)
+        (keys, X, _), _, finished = live_detection.analysis_queue.get_nowait()
+        self.assertEqual(sorted(key[0] for key in keys), ["10.0.0.0", "10.0.0.1"])
+        self.assertIsNone(finished)
+        # Idle flows go once their last snapshot is queued
+        self.assertEqual(len(live_detection.flows), 0)
+
+        self.packet(2, 10.0)
+        live_detection.drain_packets()
+        live_detection.analysis_queue.put_nowait("busy")
+        live_detection.dispatch_snapshot(20.0)
+
+        self.assertEqual(self.stats["snapshots_dropped"], 1)
+        self.assertIn(("10.0.0.2", "10.0.0.9", 6), live_detection.flows)
+
+
+class ShardTests(SimpleTestCase):
+
+    def test_a_flow_always_maps_to_one_shard(self):
+        frames = list(synthetic_frames(2000, 100, seed=5))
+        shards = {}
+        for frame, _ in frames:
+            key = parse_frame(frame)[0]
+            shards.setdefault(key, set()).add(live_detection.shard_of(frame, 4))
+
+        self.assertTrue(all(len(s) == 1 for s in shards.values()))
+        self.assertEqual(set().union(*shards.values()), {0, 1, 2, 3})
+
+    def test_vlan_tag_and_non_ip(self):
+        frame = next(synthetic_frames(1, 1))[0]
+        tagged = frame[:12] + b"\x81\x00\x00\x05" + frame[12:]
+
+        self.assertEqual(live_detection.shard_of(tagged, 7), live_detection.shard_of(frame, 7))
+        self.assertIsNone(live_detection.shard_of(frame[:12] + b"\x08\x06" + frame[14:], 7))
+
+    def test_sharded_replay_covers_every_flow_once(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        model_path = directory / "model.pkl"
+        joblib.dump(live_model(), model_path)
+
+        frames = list(synthetic_frames(5000, 200, seed=6, pps=500))
+        alerts = []
+        with mock.patch.object(live_detection, "send_alert", lambda *a: alerts.append(a)):
+            result = quietly(live_detection.run_sharded, iter(frames), 2, model_path=model_path,
+                             packet_clock=True, drop_when_full=False)
+
+        shards = result["shards"]
+        self.assertEqual((result["frames"], result["non_ip"], result["dropped"]), (5000, 0, 0))
+        self.assertEqual(sum(shard["packets"] for shard in shards), 5000)
+        self.assertTrue(all(shard["packets"] for shard in shards))
+        self.assertEqual(sum(shard["inserted"] for shard in shards), len({parse_frame(f)[0] for f, _ in frames}))
+        # Every 50th flow scans ports
+        self.assertIn("Port Scan", {attack for _, attack, _ in alerts})
+
+
+class ReplayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.frames = list(synthetic_frames(3000, 120, seed=8, pps=300))
+        self.pcap = self.directory / "capture.pcap"
+        write_pcap(self.pcap, self.frames)
+
+    def test_pcap_frames_round_trip(self):
+        read = [(bytes(frame), ts) for frame, ts in pcap_frames(self.pcap)]
+
+        self.assertEqual([frame for frame, _ in read], [frame for frame, _ in self.frames])
+        np.testing.assert_allclose([ts for _, ts in read], [ts for _, ts in self.frames], atol=1e-6)
+
+    def test_truncated_and_foreign_files(self):
+        data = self.pcap.read_bytes()
+        truncated = self.directory / "truncated.pcap"
+        truncated.write_bytes(data[:24 + 16 + len(self.frames[0][0]) + 20])
+        self.assertEqual(len(list(pcap_frames(truncated))), 1)
+
+        foreign = self.directory / "capture.txt"
+        foreign.write_bytes(b"not a capture file at all")
+        with self.assertRaises(ValueError):
+            list(pcap_frames(foreign))
+
+    def test_replay_analyzes_every_flow(self):
+        alerts = []
+        patch_sensor(
+            self,
+            flows=FlowTable(1024, idle_timeout=live_detection.FLOW_TIMEOUT),
+            packet_buffer=deque(),
+            analysis_queue=queue.Queue(maxsize=live_detection.ANALYSIS_BACKLOG),
+            ingest_stats=dict.fromkeys(live_detection.ingest_stats, 0),
+            cic_flows=None,
+            last_packet_ts=0.0,
+            model=live_model(),
+            compiled_model=None,
+            send_alert=lambda *a: alerts.append(a),
+        )
+
+        stats = quietly(live_detection.replay, self.pcap)
+
+        self.assertEqual(stats["packets"], 3000)
+        self.assertEqual(stats["flows"], len({parse_frame(f)[0] for f, _ in self.frames}))
+        self.assertEqual(stats["dropped"], 0)
+        # Ticks depend on how the aggregator batches its drains; the final pass always runs
+        self.assertGreaterEqual(stats["analysis_passes"], 1)
+        self.assertIn("Port Scan", {attack for _, attack, _ in alerts})
+
+
+class FrameParsingTests(SimpleTestCase):
+
+    def test_matches_scapy_dissection(self):
+        packets = [
+            Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(dport=443),
+            Ether() / IP(src="10.0.0.1", dst="10.0.0.3", options=b"\x01" * 8) / UDP(dport=53) / b"query",
+            Ether() / IP(src="10.0.0.4", dst="10.0.0.2") / ICMP(),
+        ]
+        for packet in packets:
+            with self.subTest(packet=packet.summary()):
+                self.assertEqual(parse_frame(bytes(packet)), live_detection.packet_fields(packet))
+
+    def test_ipv6_vlan_and_fragments(self):
+        ipv6 = bytes(Ether() / IPv6(src="fe80::1", dst="fe80::2") / TCP(dport=22))
+        vlan = bytes(Ether() / Dot1Q(vlan=5) / IP(src="10.0.0.1", dst="10.0.0.2") / UDP(dport=123))
+        fragment = bytes(Ether() / IP(src="10.0.0.1", dst="10.0.0.2", frag=100, proto=6) / (b"\x00" * 40))
+
+        self.assertEqual(parse_frame(ipv6), (("fe80::1", "fe80::2", 6), len(ipv6), 22))
+        self.assertEqual(parse_frame(vlan), (("10.0.0.1", "10.0.0.2", 17), len(vlan), 123))
+        self.assertEqual(parse_frame(fragment), (("10.0.0.1", "10.0.0.2", 6), len(fragment), None))
+
+    def test_non_ip_and_short_frames(self):
+        self.assertIsNone(parse_frame(bytes(Ether() / ARP())))
+        self.assertIsNone(parse_frame(bytes(Ether() / IP())[:30]))
+        self.assertIsNone(parse_packet(bytes(Ether() / ARP())))
+
+    def test_full_tcp_header_fields(self):
+        packet = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000, dport=80, flags="SA", window=1024) / (b"x" * 30)
+        # Ethernet padding is not payload
+        frame = bytes(packet) + bytes(6)
+
+        self.assertEqual(parse_packet(frame), ("10.0.0.1", "10.0.0.2", 40000, 80, 6, 30, 20, 0x12, 1024))
@@ -0,0 +1,440 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.test import SimpleTestCase
+from sklearn.ensemble import RandomForestClassifier
+
+from scripts import model_registry, training_data, tuning
+from scripts.artifacts import ArtifactStore
+from scripts.compiled_forest import compile_forest, compiled_path, export, load_compiled
+from scripts.incremental import Ledger, replay_rows, split_increment
+from scripts.model_registry import ModelRegistry
+from scripts.out_of_core import StratifiedReservoir, label_capacities
+from scripts.training_data import CACHE_DIR, encode_labels, load_training_matrix
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def session(self, name, model="model", features=("a", "b")):
+        directory = self.directory / name
+        directory.mkdir(exist_ok=True)
+        joblib.dump(model, directory / "model.pkl")
+        joblib.dump(list(features), directory / "model_features.pkl")
+        return directory / "model.pkl", directory / "model_features.pkl"
+
+    def loads(self):
+        return mock.patch.object(model_registry.joblib, "load", wraps=joblib.load)
+
+    def test_warm_lookup_does_not_reload(self):
+        registry = ModelRegistry(capacity=2)
+        paths = self.session("one")
+
+        with self.loads() as load:
+            first = registry.get(*paths)
+            second = registry.get(*paths)
+
+        self.assertIs(second, first)
+        self.assertEqual(first, ("model", ["a", "b"]))
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(registry.stats, {"hits": 1, "misses": 1, "evictions": 0})
+
+    def test_same_files_share_one_entry(self):
+        registry = ModelRegistry(capacity=2)
+
+        first = registry.get(*self.session("one"))
+        second = registry.get(*self.session("two"))
+
+        self.assertIs(second, first)
+        self.assertEqual(len(registry.models), 1)
+
+    def test_retrained_model_is_a_new_key(self):
+        registry = ModelRegistry(capacity=2)
+        paths = self.session("one", model="old")
+        registry.get(*paths)
+
+        # Same size, different contents
+        self.session("one", model="new")
+        self.assertEqual(registry.get(*paths)[0], "new")
+
+    def test_least_recently_used_is_evicted(self):
+        registry = ModelRegistry(capacity=2)
+        a, b, c = (self.session(name, model=name) for name in "abc")
+
+        registry.get(*a)
+        registry.get(*b)
+        registry.get(*a)
+        registry.get(*c)
+
+        self.assertEqual([model for model, _ in registry.models.values()], ["a", "c"])
+        self.assertEqual(registry.stats["evictions"], 1)
+
+    def test_put_makes_the_next_get_warm(self):
+        registry = ModelRegistry(capacity=2)
+        paths = self.session("one")
+        model = object()
+
+        registry.put(*paths, model, ["a", "b"])
+        with self.loads() as load:
+            self.assertIs(registry.get(*paths)[0], model)
+        load.assert_not_called()
+
+    def test_zero_capacity_disables(self):
+        registry = ModelRegistry(capacity=0)
+        paths = self.session("one")
+
+        with self.loads() as load:
+            registry.get(*paths)
+            registry.get(*paths)
+
+        self.assertEqual(load.call_count, 4)
+        self.assertFalse(registry.models)
+
+    def test_concurrent_misses_load_once(self):
+        registry = ModelRegistry(capacity=2)
+        paths = self.session("one")
+
+        load_file = joblib.load
+
+        def slow_load(path):
+            time.sleep(0.05)
+            return load_file(path)
+
+        results = []
+        with mock.patch.object(model_registry.joblib, "load", side_effect=slow_load) as load:
+            threads = [threading.Thread(target=lambda: results.append(registry.get(*paths))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+
+class CompiledForestTests(SimpleTestCase):
+
+    def forest(self, y):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(len(y), 6))
+        X[rng.random(X.shape) < 0.05] = np.nan
+        return X, RandomForestClassifier(n_estimators=12, max_depth=8, random_state=0).fit(X[:600], y[:600])
+
+    def check(self, y):
+        X, forest = self.forest(y)
+        compiled = compile_forest(forest)
+
+        np.testing.assert_allclose(compiled.predict_proba(X), forest.predict_proba(X), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(compiled.predict(X), forest.predict(X))
+
+    def test_binary_matches_predict_proba(self):
+        rng = np.random.default_rng(1)
+        self.check(rng.integers(0, 2, 1000))
+
+    def test_multiclass_matches_predict_proba(self):
+        rng = np.random.default_rng(2)
+        self.check(rng.choice(["BENIGN", "DoS", "PortScan"], 1000))
+
+    def test_best_first_trees_are_renumbered(self):
+        rng = np.random.default_rng(3)
+        X = rng.normal(size=(800, 4))
+        y = rng.integers(0, 2, 800)
+        forest = RandomForestClassifier(n_estimators=5, max_leaf_nodes=20, random_state=0).fit(X, y)
+
+        np.testing.assert_allclose(compile_forest(forest).predict_proba(X), forest.predict_proba(X), atol=1e-12)
+
+    def test_wrong_width_is_rejected(self):
+        X, forest = self.forest(np.random.default_rng(1).integers(0, 2, 1000))
+        with self.assertRaises(ValueError):
+            compile_forest(forest).predict_proba(X[:, :5])
+
+    def test_exported_file_is_used_while_fresh(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        X, forest = self.forest(np.random.default_rng(1).integers(0, 2, 1000))
+        model_path = directory / "model.pkl"
+        joblib.dump(forest, model_path)
+
+        self.assertEqual(export(model_path), compiled_path(model_path))
+        with mock.patch("scripts.compiled_forest.compile_forest") as compile_again:
+            loaded = load_compiled(model_path, forest)
+        compile_again.assert_not_called()
+        np.testing.assert_allclose(loaded.predict_proba(X), forest.predict_proba(X), atol=1e-12)
+
+        # A newer model.pkl makes the export stale
+        joblib.dump(forest, model_path)
+        later = compiled_path(model_path).stat().st_mtime_ns + 1_000_000
+        os.utime(model_path, ns=(later, later))
+        with mock.patch("scripts.compiled_forest.compile_forest", wraps=compile_forest) as compile_again:
+            load_compiled(model_path, forest)
+        compile_again.assert_called_once_with(forest)
+
+    def test_export_written_as_a_script_loads_from_the_package(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        X, forest = self.forest(np.random.default_rng(1).integers(0, 2, 1000))
+        model_path = directory / "model.pkl"
+        joblib.dump(forest, model_path)
+
+        # As python scripts/train_model.py imports it: "compiled_forest", not "scripts.compiled_forest"
+        script = f"import sys; sys.path.insert(0, 'scripts'); import compiled_forest; compiled_forest.export(compiled_forest.Path({str(model_path)!r}))"
+        subprocess.run([sys.executable, "-c", script], cwd=settings.BASE_DIR, check=True, capture_output=True)
+
+        with mock.patch("scripts.compiled_forest.compile_forest") as compile_again:
+            loaded = load_compiled(model_path, forest)
+        compile_again.assert_not_called()
+        np.testing.assert_allclose(loaded.predict_proba(X), forest.predict_proba(X), atol=1e-12)
+
+    def test_unreadable_export_is_compiled_again(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        X, forest = self.forest(np.random.default_rng(1).integers(0, 2, 1000))
+        model_path = directory / "model.pkl"
+        joblib.dump(forest, model_path)
+        compiled_path(model_path).write_bytes(b"not a pickle")
+
+        with self.assertLogs("scripts.compiled_forest", "WARNING"):
+            loaded = load_compiled(model_path)
+        np.testing.assert_allclose(loaded.predict_proba(X), forest.predict_proba(X), atol=1e-12)
+
+
+class TrainingMatrixTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.df = pd.DataFrame({
+            "Flow Duration": [1.5, 2.0, 3.25, 4.0],
+            "Total Fwd Packets": [1, 2, 3, 4],
+            "Label": ["BENIGN", "DoS", "benign", "PortScan"],
+        })
+
+    def store(self, fmt="csv", df=None):
+        store = ArtifactStore(self.directory, fmt=fmt)
+        store.write("preprocessed", self.df if df is None else df)
+        return store
+
+    def test_labels_encode_per_distinct_value(self):
+        labels = pd.Series(["BENIGN", "DoS", "Benign", None, "DoS"])
+        self.assertEqual(encode_labels(labels).tolist(), [0, 1, 0, 1, 1])
+        self.assertEqual(encode_labels(labels).dtype, np.int8)
+
+    def test_csv_and_feather_give_the_same_matrix(self):
+        X, y, features = load_training_matrix(self.store("csv"), cache=False)
+        X_feather, y_feather, _ = load_training_matrix(self.store("feather"), cache=False)
+
+        self.assertEqual(features, ["Flow Duration", "Total Fwd Packets"])
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(X, X_feather)
+        self.assertEqual(y.tolist(), [0, 1, 0, 1])
+        self.assertEqual(y_feather.tolist(), y.tolist())
+
+    def test_unchanged_artifact_is_served_from_the_cache(self):
+        store = self.store()
+        X, y, features = load_training_matrix(store)
+
+        with mock.patch.object(training_data, "read_preprocessed") as read, \
+                mock.patch.object(training_data, "file_digest") as digest:
+            X_warm, y_warm, features_warm = load_training_matrix(store)
+        read.assert_not_called()
+        digest.assert_not_called()
+
+        self.assertIsInstance(X_warm, np.memmap)
+        np.testing.assert_array_equal(X_warm, X)
+        self.assertEqual((y_warm.tolist(), features_warm), (y.tolist(), features))
+
+    def test_rewritten_artifact_replaces_the_cache(self):
+        store = self.store()
+        load_training_matrix(store)
+
+        self.df.loc[0, "Label"] = "DDoS"
+        self.store(df=self.df)
+        _, y, _ = load_training_matrix(store)
+
+        self.assertEqual(y.tolist(), [1, 1, 0, 1])
+        self.assertEqual(len(list((self.directory / CACHE_DIR).glob("*.X.npy"))), 1)
+
+    def test_unlabelled_artifact_is_none(self):
+        store = self.store(df=self.df.drop(columns="Label"))
+        self.assertIsNone(load_training_matrix(store))
+        self.assertIsNone(load_training_matrix(store))
+
+
+class LedgerTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.features = ["a", "b", "c"]
+        self.X = rng.normal(size=(300, 3)).astype(np.float32)
+        self.y = rng.integers(0, 2, 300)
+
+        self.ledger = Ledger(self.features)
+        self.ledger.add_slice(self.X, self.y, 0, 200, trees=50, mode="full")
+
+    def blocker(self, X=None, y=None, features=None, max_trees=200):
+        return self.ledger.increment_blocker(
+            self.X if X is None else X,
+            self.y if y is None else y,
+            self.features if features is None else features,
+            max_trees,
+        )
+
+    def test_appended_rows_can_be_added(self):
+        self.assertIsNone(self.blocker())
+
+    def test_changed_rows_block(self):
+        X = self.X.copy()
+        X[10, 1] += 1
+        self.assertEqual(self.blocker(X=X), "rows 0-200 changed since they were trained on")
+
+    def test_changed_label_blocks(self):
+        y = self.y.copy()
+        y[199] = 1 - y[199]
+        self.assertIsNotNone(self.blocker(y=y))
+
+    def test_changed_features_block(self):
+        self.assertEqual(self.blocker(features=["a", "c", "b"]), "the feature columns changed")
+
+    def test_shorter_dataset_blocks(self):
+        self.assertEqual(self.blocker(X=self.X[:150], y=self.y[:150]),
+                         "the dataset is shorter than the one the model saw")
+
+    def test_tree_limit_blocks(self):
+        self.assertIn("limit 50", self.blocker(max_trees=50))
+
+    def test_quality_drop_blocks(self):
+        self.ledger.baseline = 0.95
+        with self.assertLogs("scripts.incremental", "WARNING"):
+            self.ledger.record_quality(0.5, rows=1000, source="holdout")
+        self.assertIn("fell below the baseline", self.blocker())
+
+    def test_round_trips_through_json(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.ledger.save(directory / "ledger.json")
+
+        loaded = Ledger.load(directory / "ledger.json")
+        self.assertEqual((loaded.rows_seen, loaded.trees), (200, 50))
+        self.assertIsNone(Ledger.load(directory / "missing.json"))
+
+    def test_replay_never_draws_held_back_rows(self):
+        train, held = split_increment(0, 200, seed=0)
+        self.assertEqual(sorted([*train, *held]), list(range(200)))
+
+        replay = replay_rows(200, held, 150, seed=1)
+        self.assertFalse(np.isin(replay, held).any())
+        self.assertTrue((replay < 200).all())
+
+
+class ReservoirTests(SimpleTestCase):
+
+    def test_label_capacities_water_fill(self):
+        counts = pd.Series({"BENIGN": 1000, "DoS": 10, "PortScan": 1000})
+        self.assertEqual(label_capacities(counts, 300), {"DoS": 10, "BENIGN": 145, "PortScan": 145})
+        self.assertEqual(label_capacities(counts, 5000), {"DoS": 10, "BENIGN": 1000, "PortScan": 1000})
+
+    def test_sample_is_stratified_and_uniform(self):
+        rng = np.random.default_rng(3)
+        n = 40_000
+        labels = rng.choice(np.array(["BENIGN", "DoS", "Bot"], dtype=object), n, p=[0.8, 0.199, 0.001])
+        # Column 0: row number, to check where sampled rows came from
+        X = np.column_stack([np.arange(n), rng.normal(size=n)]).astype(np.float32)
+
+        counts = pd.Series(labels).value_counts()
+        capacities = label_capacities(counts, 4000)
+        reservoir = StratifiedReservoir(capacities, n_features=2, seed=0)
+
+        start = 0
+        for size in rng.integers(100, 5000, 1000):
+            if start >= n:
+                break
+            reservoir.add(X[start:start + size], labels[start:start + size])
+            start += size
+
+        sample, sample_labels = reservoir.sample()
+        rows = sample[:, 0].astype(np.int64)
+
+        self.assertEqual(len(np.unique(rows)), len(rows))
+        np.testing.assert_array_equal(labels[rows], sample_labels)
+        self.assertEqual(dict(Counter(sample_labels)), capacities)
+        self.assertEqual(reservoir.seen, counts.to_dict())
+
+        # Each label's rows are drawn evenly from the whole stream
+        for label in ("BENIGN", "DoS"):
+            with self.subTest(label=label):
+                positions = np.flatnonzero(labels == label)
+                ranks = np.searchsorted(positions, rows[sample_labels == label]) / len(positions)
+                self.assertAlmostEqual(ranks.mean(), 0.5, delta=0.03)
+
+
+def result(f1, latency_us, size_bytes):
+    return {"f1": f1, "latency_us": latency_us, "size_bytes": size_bytes}
+
+
+class ParetoTests(SimpleTestCase):
+
+    def setUp(self):
+        self.results = [
+            result(0.950, 10.0, 1000),   # most accurate
+            result(0.948, 2.0, 800),     # nearly as accurate, much faster
+            result(0.900, 1.0, 100),     # fastest and smallest
+            result(0.900, 20.0, 2000),   # dominated by all of the above
+        ]
+
+    def test_dominates(self):
+        self.assertTrue(tuning.dominates(self.results[2], self.results[3]))
+        self.assertFalse(tuning.dominates(self.results[0], self.results[1]))
+        self.assertFalse(tuning.dominates(self.results[0], self.results[0]))
+
+    def test_pareto_ranks(self):
+        self.assertEqual(tuning.pareto_ranks(self.results), [0, 0, 0, 1])
+
+    def test_choose_fastest_within_tolerance(self):
+        front = self.results[:3]
+        self.assertIs(tuning.choose(front), self.results[1])
+
+        self.results[1]["f1"] = 0.950 - tuning.F1_TOLERANCE - 0.001
+        self.assertIs(tuning.choose(front), self.results[0])
+
+    def test_promotion_order_keeps_the_ends_first(self):
+        order = tuning.promotion_order(self.results)
+        self.assertEqual(order[:2], [0, 2])
+        self.assertEqual(order[-1], 3)
+
+    def test_rung_sizes_grow_to_all_rows(self):
+        sizes = tuning.rung_sizes(24, 90_000, eta=3)
+        self.assertEqual(sizes[-1], 90_000)
+        self.assertEqual(sizes, sorted(sizes))
+
+    def test_candidates_start_with_the_default(self):
+        default = tuning.draw_candidates({}, 1)[0]
+        candidates = tuning.draw_candidates(default, 6)
+
+        self.assertIs(candidates[0], default)
+        self.assertEqual(len({tuple(sorted(c.items())) for c in candidates}), 6)
+
+    def test_saved_choice_configures_training(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        model_path = directory / "model.pkl"
+
+        self.assertEqual(tuning.load_tuned_params(model_path), {})
+        with self.assertLogs("scripts.tuning", "INFO"):
+            tuning.save_report(model_path, {"chosen": {"params": {"max_depth": 12}}})
+        self.assertEqual(tuning.load_tuned_params(model_path), {"max_depth": 12})
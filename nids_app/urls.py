@@ -1,12 +1,13 @@
 from django.urls import path
 from . import views
-from .views import receive_alert
+from .views import receive_alert, receive_alerts_bulk
 
 urlpatterns = [
     # -------------------------------------------------
     # LIVE ALERT RECEIVER (from IDS sensors)
     # -------------------------------------------------
     path("api/alert/", receive_alert, name="receive_alert"),
+    path("api/alerts/bulk/", receive_alerts_bulk, name="receive_alerts_bulk"),
 
     # -------------------------------------------------
     # CORE PAGES
@@ -32,6 +33,13 @@ urlpatterns = [
         name="run_full_pipeline",
     ),
 
+    # -------------------------------------------------
+    # BACKGROUND JOBS
+    # -------------------------------------------------
+    path("jobs/<int:job_id>/", views.job_detail, name="job_detail"),
+    path("jobs/<int:job_id>/finish/", views.job_finish, name="job_finish"),
+    path("api/jobs/<int:job_id>/", views.job_status_api, name="job_status_api"),
+
     # -------------------------------------------------
     # DOWNLOADS
     # -------------------------------------------------
@@ -55,4 +63,16 @@ urlpatterns = [
         views.dashboard_live_api,
         name="dashboard_live_api",
     ),
+
+    path(
+        "api/alerts/timeseries/",
+        views.alert_timeseries_api,
+        name="alert_timeseries_api",
+    ),
+
+    path(
+        "api/alerts/top/",
+        views.alert_top_api,
+        name="alert_top_api",
+    ),
 ]
\ No newline at end of file
@@ -1,19 +1,38 @@
+import hashlib
 import os
-import subprocess
+import shutil
+from datetime import datetime, timedelta, timezone as dt_timezone
 from pathlib import Path
 
 import pandas as pd
 from django.conf import settings
 BASE_DATA_DIR = Path(settings.BASE_DIR) / "data" / "raw"
 from django.contrib import messages
-from django.http import FileResponse, Http404, JsonResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
-from .models import Alert
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from .models import Alert, AlertRollup, Job
 from django.views.decorators.http import require_POST
 
 from .attack_knowledge import ATTACK_KNOWLEDGE
-from nids_app.pipeline.automated import run_full_pipeline
+from nids_app.alerts.rollups import GROUP_FIELDS, counts_by, timeseries
+from nids_app.alerts.stream import broker
+from nids_app.pipeline.jobs import enqueue
 from nids_app.state.pipeline_state import set_state, can_access
+from scripts.artifacts import ArtifactStore, CsvFormat
 
 import json
 import traceback
@@ -47,11 +66,13 @@ def receive_alert(request):
             attack_type = data.get("attack_type")   # ✅ use real attack type
             severity = data.get("severity")
 
-            Alert.objects.create(
+            alert = Alert.objects.create(
                 ip=ip,
                 attack_type=attack_type,
-                severity=severity
+                severity=severity,
+                timestamp=alert_time(data, timezone.now()),
             )
+            transaction.on_commit(lambda: broker.publish([alert]))
 
             return JsonResponse({"status": "success"})
 
@@ -59,31 +80,190 @@ def receive_alert(request):
             return JsonResponse({"error": str(e)}, status=400)
 
     return JsonResponse({"error": "Invalid method"}, status=405)
-   
-def run_script(request, script_path, success_state, success_msg, redirect_to):
+
+
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+# Reported back per rejected request; the count covers the rest
+MAX_REPORTED_ERRORS = 20
+
+
+def iter_alert_payload(request):
+    """
+    (item, parse_error) pairs from a JSON array body or an NDJSON body
+    (one object per line). NDJSON requests are read line by line from
+    the request stream rather than loaded as one string.
+    """
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        lines = request
+    else:
+        body = request.body
+        if body.lstrip()[:1] == b"[":
+            try:
+                items = json.loads(body)
+            except ValueError as e:
+                yield None, f"Invalid JSON: {e}"
+                return
+            for item in items:
+                yield item, None
+            return
+        lines = body.splitlines()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+
+
+def alert_error(data, limits):
+    """Why ``data`` can't be stored as an Alert, or None if it can."""
+    if not isinstance(data, dict):
+        return "expected an object"
+
+    for field, max_length in limits.items():
+        value = data.get(field)
+
+        if value in (None, ""):
+            if field == "severity":
+                continue
+            return f"{field} is required"
+        if not isinstance(value, str):
+            return f"{field} must be a string"
+        if len(value) > max_length:
+            return f"{field} is longer than {max_length} characters"
+
+    return None
+
+
+def alert_time(data, now):
+    """
+    When the alert was detected: its optional "timestamp" (ISO 8601 or a
+    Unix timestamp, as sent for alerts replayed from a sensor's spool),
+    else ``now``. Sensor clocks running ahead are capped at ``now``.
+    """
+    value = data.get("timestamp")
+    if value in (None, ""):
+        return now
+
     try:
-        session_id = get_session_id(request)
+        when = parse_since(str(value))
+    except ValueError:
+        raise ValueError("timestamp must be an ISO 8601 datetime or a Unix timestamp")
+    return min(when, now)
+
 
-        result = subprocess.run(
-            [os.sys.executable, str(script_path), session_id],
-            capture_output=True,
-            text=True,
-            check=True,
+@csrf_exempt
+def receive_alerts_bulk(request):
+    """
+    Batched alerts from a sensor's dispatcher: a JSON array, or NDJSON
+    with Content-Type application/x-ndjson, of {"ip", "attack_type",
+    "severity"} objects, optionally with the "timestamp" each alert was
+    detected at. Every alert is validated first; the request is stored
+    all-or-nothing with bulk_create in ALERT_BULK_BATCH_SIZE batches
+    inside one transaction.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+
+    limits = {
+        name: Alert._meta.get_field(name).max_length
+        for name in ("ip", "attack_type", "severity")
+    }
+    max_items = settings.ALERT_BULK_MAX_ITEMS
+
+    alerts = []
+    errors = []
+    n_errors = 0
+    now = timezone.now()
+
+    for i, (data, error) in enumerate(iter_alert_payload(request)):
+        if i >= max_items:
+            return JsonResponse({"error": f"More than {max_items} alerts in one request"}, status=413)
+
+        error = error or alert_error(data, limits)
+        if not error:
+            try:
+                detected = alert_time(data, now)
+            except ValueError as e:
+                error = str(e)
+        if error:
+            n_errors += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"index": i, "error": error})
+            continue
+
+        alerts.append(Alert(
+            ip=data["ip"],
+            attack_type=data["attack_type"],
+            severity=data.get("severity") or "",
+            timestamp=detected,
+        ))
+
+    if n_errors:
+        return JsonResponse(
+            {"error": f"{n_errors} invalid alert(s), nothing stored", "errors": errors},
+            status=400,
         )
 
-        set_state(request, success_state)
-        messages.success(request, success_msg)
-        return result.stdout, True
+    with transaction.atomic():
+        Alert.objects.bulk_create(alerts, batch_size=settings.ALERT_BULK_BATCH_SIZE)
+        # Live dashboards get the batch once it is committed (one event, all watchers)
+        transaction.on_commit(lambda: broker.publish(alerts))
+
+    return JsonResponse({"status": "success", "created": len(alerts)})
+
+
+def start_job(request, kind):
+    job = enqueue(kind, get_session_id(request))
+    return redirect("job_detail", job_id=job.id)
+
+
+def session_job(request, job_id):
+    """A job belonging to this browser session, else 404."""
+    try:
+        return Job.objects.get(id=job_id, session_id=get_session_id(request))
+    except Job.DoesNotExist:
+        raise Http404("Job not found.")
+
+
+def job_output(request):
+    """(output, success) of the ?job=<id> stage run being shown, if any."""
+    job_id = request.GET.get("job")
+    if not job_id or not job_id.isdigit():
+        return "", False
+
+    job = session_job(request, int(job_id))
+    output = job.log if job.status != Job.FAILED else f"{job.log}{job.error}"
+    return output, job.status == Job.SUCCEEDED
 
-    except subprocess.CalledProcessError as e:
-        messages.error(request, f"Execution failed:\n{e.stderr}")
-        return e.stderr, False
-    
 def validate_csv(uploaded_file):
     if not uploaded_file.name.endswith(".csv"):
         raise ValueError("Only CSV files are allowed.")
-    if uploaded_file.size > 50 * 1024 * 1024:
-        raise ValueError("File size exceeds 50MB limit.")
+    if uploaded_file.size > settings.UPLOAD_MAX_MB * 1024 * 1024:
+        raise ValueError(f"File size exceeds {settings.UPLOAD_MAX_MB}MB limit.")
+
+
+def store_upload(uploaded_file, path):
+    """
+    Put an upload at ``path`` without reading it into memory. Django has
+    already streamed large uploads to FILE_UPLOAD_TEMP_DIR, so those are
+    moved (a rename when it is on the same disk); small ones are written
+    chunk by chunk. Either lands beside ``path`` first, so a failed
+    upload never leaves a truncated dataset behind.
+    """
+    partial = path.with_name(f"{path.name}.part")
+
+    if hasattr(uploaded_file, "temporary_file_path"):
+        shutil.move(uploaded_file.temporary_file_path(), partial)
+    else:
+        with open(partial, "wb") as destination:
+            for chunk in uploaded_file.chunks():
+                destination.write(chunk)
+
+    os.replace(partial, path)
 
 
 # -------------------------------------------------
@@ -102,16 +282,19 @@ def upload_csv(request):
 
         if file:
 
+            try:
+                validate_csv(file)
+            except ValueError as e:
+                messages.error(request, str(e))
+                return redirect("upload_dataset")
+
             session_id = get_session_id(request)
 
             save_path = BASE_DATA_DIR / session_id
             save_path.mkdir(parents=True, exist_ok=True)
 
-            file_path = save_path / file.name
-
-            with open(file_path, "wb+") as destination:
-                for chunk in file.chunks():
-                    destination.write(chunk)
+            # The name preprocess reads, whatever the uploaded file was called
+            store_upload(file, save_path / "input.csv")
 
             # 🔴 THIS LINE IS MISSING IN YOUR PROJECT
             request.session["pipeline_state"] = "UPLOADED"
@@ -125,15 +308,7 @@ def upload_csv(request):
 
 def preprocess_page(request):
     if request.method == "POST":
-        script = Path(settings.BASE_DIR) / "scripts" / "preprocess.py"
-        run_script(
-            request,
-            script,
-            "PREPROCESSED",
-            "Preprocessing completed.",
-            "train",
-        )
-        return redirect("train")
+        return start_job(request, "preprocess")
 
     return render(request, "nids_app/preprocess.html")
 
@@ -147,18 +322,10 @@ def train_view(request):
         messages.error(request, "Run preprocessing first.")
         return redirect("preprocess")
 
-    output = ""
-    success = False
-
     if request.method == "POST":
-        script = Path(settings.BASE_DIR) / "scripts" / "train_model.py"
-        output, success = run_script(
-            request,
-            script,
-            "TRAINED",
-            "Model training completed.",
-            "train",
-        )
+        return start_job(request, "train")
+
+    output, success = job_output(request)
 
     return render(
         request,
@@ -172,18 +339,10 @@ def predict_view(request):
         messages.error(request, "Train the model first.")
         return redirect("train")
 
-    output = ""
-    predicted = False
-
     if request.method == "POST":
-        script = Path(settings.BASE_DIR) / "scripts" / "predict.py"
-        output, predicted = run_script(
-            request,
-            script,
-            "PREDICTED",
-            "Prediction completed.",
-            "predict",
-        )
+        return start_job(request, "predict")
+
+    output, predicted = job_output(request)
 
     return render(
         request,
@@ -197,18 +356,10 @@ def signature_view(request):
         messages.error(request, "Run prediction first.")
         return redirect("predict")
 
-    output = ""
-    success = False
-
     if request.method == "POST":
-        script = Path(settings.BASE_DIR) / "scripts" / "signature_detect.py"
-        output, success = run_script(
-            request,
-            script,
-            "HYBRID_DONE",
-            "Hybrid detection completed.",
-            "hybrid",
-        )
+        return start_job(request, "hybrid")
+
+    output, success = job_output(request)
 
     return render(
         request,
@@ -217,36 +368,110 @@ def signature_view(request):
     )
 
 
+def session_store(session_id):
+    return ArtifactStore(Path(settings.BASE_DIR) / "data" / "processed" / session_id)
+
+
+def csv_stream(store, name, chunksize=50_000):
+    for i, chunk in enumerate(store.iter_chunks(name, chunksize)):
+        yield chunk.to_csv(index=False, header=(i == 0))
+
+
 def download_hybrid_view(request):
     session_id = get_session_id(request)
-    file_path = (
-        Path(settings.BASE_DIR)
-        / "data"
-        / "processed"
-        / session_id
-        / "hybrid_output.csv"
-    )
+    store = session_store(session_id)
 
-    if not file_path.exists():
+    found = store.find("hybrid_output")
+    if found is None:
         raise Http404("Hybrid output not found.")
 
-    return FileResponse(open(file_path, "rb"), as_attachment=True)
+    fmt, file_path = found
+    if isinstance(fmt, CsvFormat):
+        return FileResponse(open(file_path, "rb"), as_attachment=True)
+
+    # Columnar artifact: convert to CSV on the fly, one chunk at a time
+    response = StreamingHttpResponse(
+        csv_stream(store, "hybrid_output"),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = 'attachment; filename="hybrid_output.csv"'
+    return response
 
 
 @require_POST
 def run_automated_pipeline(request):
+    return start_job(request, "pipeline")
+
+
+# -------------------------------------------------
+# BACKGROUND JOBS
+# -------------------------------------------------
+# kind -> (state reached on success, success message, page to show after)
+JOB_RESULTS = {
+    "preprocess": ("PREPROCESSED", "Preprocessing completed.", "train"),
+    "train": ("TRAINED", "Model training completed.", "train"),
+    "predict": ("PREDICTED", "Prediction completed.", "predict"),
+    "hybrid": ("HYBRID_DONE", "Hybrid detection completed.", "hybrid"),
+    "pipeline": (None, "Pipeline executed successfully.", "dashboard"),
+}
+
+
+def job_detail(request, job_id):
+    job = session_job(request, job_id)
+    return render(request, "nids_app/automated_logs.html", {"job": job, "logs": job.log})
+
+
+def job_status_api(request, job_id):
+    """
+    Poll a job. ``?offset=N`` returns only log text after the first N
+    characters, so clients can tail the log cheaply.
+    """
+    job = session_job(request, job_id)
+
     try:
-        session_id = get_session_id(request)
+        offset = max(int(request.GET.get("offset", 0)), 0)
+    except ValueError:
+        offset = 0
 
-        run_full_pipeline(session_id)
+    return JsonResponse({
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "log": job.log[offset:],
+        "offset": len(job.log),
+        "error": job.error,
+        "finished": job.finished,
+        "next": reverse("job_finish", args=[job.id]) if job.finished else None,
+    })
 
-        messages.success(request, "Pipeline executed successfully.")
-        return redirect("dashboard")
 
-    except Exception as e:
-        messages.error(request, f"Pipeline failed: {e}")
+def job_finish(request, job_id):
+    """Apply a finished job to the session (pipeline state, message) and move on."""
+    job = session_job(request, job_id)
+
+    if not job.finished:
+        return redirect("job_detail", job_id=job.id)
+
+    state, success_msg, next_page = JOB_RESULTS[job.kind]
+
+    if job.kind == "pipeline":
+        if job.status == Job.SUCCEEDED:
+            messages.success(request, success_msg)
+            return redirect(next_page)
+        messages.error(request, f"Pipeline failed: {job.error}")
         return redirect("upload_dataset")
 
+    if job.status == Job.SUCCEEDED:
+        set_state(request, state)
+        messages.success(request, success_msg)
+    else:
+        messages.error(request, f"Execution failed:\n{job.error}")
+
+    if job.kind == "preprocess":
+        return redirect(next_page)
+    return redirect(f"{reverse(next_page)}?job={job.id}")
+
 
 # -------------------------------------------------
 # DASHBOARD PAGE VIEW
@@ -262,25 +487,43 @@ import pandas as pd
 from .models import Alert
 from .attack_knowledge import ATTACK_KNOWLEDGE
 
-def dashboard_batch_api(request):
+def artifact_fingerprint(store, name):
+    """
+    Identity of an artifact's current contents: format + mtime + size, or a
+    BLAKE2 digest of the file with DASHBOARD_CACHE_FINGERPRINT = "hash".
+    None when the artifact doesn't exist.
+    """
+    found = store.find(name)
+    if found is None:
+        return None
 
-    session_id = get_session_id(request)
+    fmt, path = found
+    stat = path.stat()
 
-    file_path = (
-        Path(settings.BASE_DIR)
-        / "data"
-        / "processed"
-        / session_id
-        / "hybrid_output.csv"
-    )
+    if settings.DASHBOARD_CACHE_FINGERPRINT == "hash":
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return f"{fmt.suffix}:{digest.hexdigest()}"
+
+    return f"{fmt.suffix}:{stat.st_mtime_ns}:{stat.st_size}"
 
+
+def batch_summary(store):
+    """Dashboard counts for a session's hybrid_output (read and grouped once)."""
     benign = 0
     malicious = 0
     attacks = []
 
-    if file_path.exists():
+    if store.exists("hybrid_output"):
 
-        df = pd.read_csv(file_path)
+        # Only the columns the dashboard reads
+        wanted = ["Final Decision", "Attack Type", "ml_probability"]
+        df = store.read(
+            "hybrid_output",
+            columns=[c for c in wanted if c in store.columns("hybrid_output")],
+        )
 
         if "Final Decision" in df.columns:
 
@@ -308,26 +551,97 @@ def dashboard_batch_api(request):
                         "details": meta
                     })
 
-    return JsonResponse({
+    return {
         "benign": benign,
         "malicious": malicious,
         "attacks": attacks
-    })
+    }
+
+
+def dashboard_batch_api(request):
+    """
+    Batch dashboard summary. The computed JSON is cached per session under
+    the fingerprint of hybrid_output, so a rerun of the hybrid stage (a new
+    file) replaces it and unchanged output is never re-read. The fingerprint
+    doubles as the ETag: browsers revalidating with If-None-Match get a 304.
+    """
+    session_id = get_session_id(request)
+    store = session_store(session_id)
+
+    fingerprint = artifact_fingerprint(store, "hybrid_output") or "none"
+    etag = quote_etag(hashlib.blake2b(f"{session_id}:{fingerprint}".encode(), digest_size=12).hexdigest())
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        # One entry per session: a new fingerprint overwrites the stale summary
+        cache_key = f"dashboard-batch:{session_id}"
+        cached = cache.get(cache_key)
+
+        if cached and cached["fingerprint"] == fingerprint:
+            body = cached["body"]
+        else:
+            body = json.dumps(batch_summary(store))
+            cache.set(cache_key, {"fingerprint": fingerprint, "body": body}, settings.DASHBOARD_CACHE_SECONDS)
+
+        response = HttpResponse(body, content_type="application/json")
+
+    response["ETag"] = etag
+    # Stored per browser, but always revalidated
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+def parse_since(value):
+    """``since=`` as an ISO 8601 datetime or a Unix timestamp; None if absent."""
+    if not value:
+        return None
+
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        pass
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid since: {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
 
 def dashboard_live_api(request):
+    """
+    Live alert summary. Counts come from the alert rollups and only the 50
+    most recent alerts are fetched; ``?since=`` limits both to alerts at
+    or after that time (counts to the minute).
 
-    alerts = Alert.objects.order_by("-timestamp")
+    The snapshot covers alerts up to ``last_alert_id``; ``stream_id`` is
+    the alert stream event to resume from so the page misses nothing in
+    between (it skips streamed alerts up to ``last_alert_id``).
+    """
+    try:
+        since = parse_since(request.GET.get("since"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Read before the snapshot: alerts published after it may be in both
+    stream_id = broker.last_event_id()
 
-    attack_counts = {}
+    with transaction.atomic():
+        last_alert_id = Alert.objects.aggregate(last=Max("id"))["last"] or 0
+        attack_counts = counts_by("attack_type", since, last_id=last_alert_id)
 
-    for alert in alerts:
-        attack_counts[alert.attack_type] = (
-            attack_counts.get(alert.attack_type, 0) + 1
+        alerts = Alert.objects.filter(id__lte=last_alert_id)
+        if since is not None:
+            alerts = alerts.filter(timestamp__gte=since)
+
+        recent = list(
+            alerts.only("ip", "attack_type", "severity", "timestamp").order_by("-timestamp")[:50]
         )
 
     attacks = []
 
-    for name, count in attack_counts.items():
+    for name, count in attack_counts.most_common():
 
         meta = ATTACK_KNOWLEDGE.get(name, {})
 
@@ -341,15 +655,90 @@ def dashboard_live_api(request):
 
     return JsonResponse({
         "benign": 0,
-        "malicious": sum(attack_counts.values()),
+        "malicious": sum(a["count"] for a in attacks),
         "attacks": attacks,
+        "stream_id": stream_id,
+        "last_alert_id": last_alert_id,
         "alerts": [
             {
+                "id": a.pk,
                 "ip": a.ip,
                 "attack_type": a.attack_type,
                 "severity": a.severity,
                 "timestamp": a.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
             }
-            for a in alerts[:50]
+            for a in recent
         ]
-    })
\ No newline at end of file
+    })
+
+
+# Default window per granularity when since= is omitted
+TIMESERIES_WINDOW = {
+    AlertRollup.MINUTE: timedelta(hours=1),
+    AlertRollup.HOUR: timedelta(days=1),
+}
+
+
+def alert_timeseries_api(request):
+    """
+    Alert counts per bucket from the rollups.
+
+    ?granularity=minute|hour  (default minute)
+    ?since= / ?until=         ISO 8601 or Unix time (default: last hour / day)
+    ?by=attack_type|severity|ip  split each bucket (default: totals)
+    ?top=N                    with by=, only the N largest keys (default 10)
+    """
+    granularity = request.GET.get("granularity", AlertRollup.MINUTE)
+    by = request.GET.get("by") or None
+
+    if granularity not in TIMESERIES_WINDOW:
+        return JsonResponse({"error": f"granularity must be one of {', '.join(TIMESERIES_WINDOW)}"}, status=400)
+    if by is not None and by not in GROUP_FIELDS:
+        return JsonResponse({"error": f"by must be one of {', '.join(GROUP_FIELDS)}"}, status=400)
+
+    try:
+        since = parse_since(request.GET.get("since"))
+        until = parse_since(request.GET.get("until"))
+        top = int(request.GET.get("top", 10))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if since is None:
+        since = (until or timezone.now()) - TIMESERIES_WINDOW[granularity]
+
+    keys = None
+    if by is not None and top > 0:
+        keys = [key for key, _ in counts_by(by, since).most_common(top)]
+
+    series = timeseries(granularity, since, until, by=by, keys=keys)
+
+    return JsonResponse({
+        "granularity": granularity,
+        "since": since.isoformat(),
+        "until": until.isoformat() if until else None,
+        "by": by,
+        "series": [
+            {"bucket": bucket.isoformat(), "key": key, "count": count}
+            for bucket, key, count in series
+        ],
+    })
+
+
+def alert_top_api(request):
+    """Largest alert sources: ?by=ip|attack_type|severity (default ip), ?since=, ?limit=."""
+    by = request.GET.get("by", "ip")
+
+    if by not in GROUP_FIELDS:
+        return JsonResponse({"error": f"by must be one of {', '.join(GROUP_FIELDS)}"}, status=400)
+
+    try:
+        since = parse_since(request.GET.get("since"))
+        limit = int(request.GET.get("limit", 10))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        "by": by,
+        "since": since.isoformat() if since else None,
+        "top": [{"key": key, "count": count} for key, count in counts_by(by, since).most_common(limit)],
+    })
@@ -3,6 +3,18 @@ ASGI config for nids_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+/api/alerts/stream/ is served here directly, outside Django's request
+cycle: it is a long-lived server-sent events stream fed by the in-process
+alert broker (nids_app/alerts/stream.py). Every other request goes to
+Django.
+
+The Procfile's web process stays on gunicorn (WSGI), where the dashboard
+polls instead. For push updates run this app as one extra process and
+route the stream and the sensor endpoints (/api/alert/, /api/alerts/bulk/)
+to it, since the broker only sees alerts ingested in its own process:
+
+    uvicorn nids_project.asgi:application --port 8001
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +25,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nids_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up: the stream module touches app code
+from nids_app.alerts.stream import alert_stream  # noqa: E402
+
+ALERT_STREAM_PATH = "/api/alerts/stream/"
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == ALERT_STREAM_PATH:
+        await alert_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -140,6 +140,124 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# -------------------------------------------------
+# Dataset uploads
+# -------------------------------------------------
+# Largest accepted upload. Django streams uploads over
+# FILE_UPLOAD_MAX_MEMORY_SIZE (2.5 MB) to FILE_UPLOAD_TEMP_DIR, from
+# where they are moved into data/raw/. Uploads too large to load whole
+# within TRAIN_MEMORY_MB run the pipeline in chunks and train out of
+# core, so this is bounded by disk, not memory.
+UPLOAD_MAX_MB = int(os.environ.get("UPLOAD_MAX_MB", "8192"))
+
+# -------------------------------------------------
+# Pipeline streaming
+# -------------------------------------------------
+# Rows per chunk for preprocess / predict / hybrid detection (--chunksize).
+# Unset or 0 loads each artifact into memory in one go, except uploads
+# over the training memory budget, which stream in chunks of
+# LARGE_UPLOAD_CHUNKSIZE (nids_app/pipeline/automated.py).
+PIPELINE_CHUNKSIZE = int(os.environ.get("PIPELINE_CHUNKSIZE", "0")) or None
+
+# Run pipeline stages in the web process (the automated pipeline passes
+# DataFrames in memory; single-stage jobs reuse warm models) instead of
+# one Python subprocess per stage.
+PIPELINE_IN_PROCESS = os.environ.get("PIPELINE_IN_PROCESS", "1") != "0"
+
+# Intermediate artifacts the in-process pipeline still writes
+# ("preprocessed", "model", "predictions"); hybrid_output always is.
+PIPELINE_CHECKPOINTS = [
+    name.strip() for name in os.environ.get("PIPELINE_CHECKPOINTS", "").split(",") if name.strip()
+]
+
+# -------------------------------------------------
+# Stage script environment
+# -------------------------------------------------
+# Not Django settings: the stage scripts read these from the environment
+# themselves (they also run outside Django) and document them there.
+#   ARTIFACT_FORMAT, ARTIFACT_MMAP     scripts/artifacts.py
+#   MODEL_CACHE_SIZE                   scripts/model_registry.py
+#   COMPILED_MMAP                      scripts/compiled_forest.py
+#   TRAIN_MODE                         scripts/train_model.py
+#   TRAIN_MEMORY_MB, TRAIN_WORKERS     scripts/out_of_core.py
+#   TUNE_CANDIDATES, TUNE_FOLDS,
+#   TUNE_WORKERS                       scripts/tuning.py
+
+# -------------------------------------------------
+# Background jobs
+# -------------------------------------------------
+# Pipeline stages run as queued Job rows instead of inside the request.
+# "embedded" runs them on a thread pool inside the web process;
+# "external" leaves them to `python manage.py run_jobs`, run as a separate
+# process (add it to the Procfile next to web when switching).
+JOB_WORKER = os.environ.get("JOB_WORKER", "embedded")
+
+# Jobs running at once across all workers sharing the database (each
+# RUNNING job holds one of this many slots, unique in the database).
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "2"))
+
+# How often buffered job log lines are written, and how often a running
+# job sends a heartbeat when it has nothing to log.
+JOB_LOG_FLUSH_SECONDS = float(os.environ.get("JOB_LOG_FLUSH_SECONDS", "1"))
+
+# A RUNNING job without a heartbeat for this long is failed (checked on every
+# poll); keep it a small multiple of JOB_LOG_FLUSH_SECONDS so a crashed
+# worker's slots free up quickly. Jobs of a dead process on the same host
+# are failed as soon as a worker starts there.
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "60"))
+
+# -------------------------------------------------
+# Cache
+# -------------------------------------------------
+# CACHE_BACKEND=locmem (per process, default) or file (shared by every
+# worker process on the host, stored under CACHE_DIR).
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+
+if CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("CACHE_DIR", str(PROJECT_TMP / "cache")),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "nids",
+        }
+    }
+
+# Dashboard batch summaries are cached under the fingerprint of the
+# session's hybrid_output: "stat" (format + mtime + size) or "hash"
+# (content digest; survives touch/copy, costs a full read per request).
+DASHBOARD_CACHE_FINGERPRINT = os.environ.get("DASHBOARD_CACHE_FINGERPRINT", "stat")
+DASHBOARD_CACHE_SECONDS = int(os.environ.get("DASHBOARD_CACHE_SECONDS", "86400"))
+
+# -------------------------------------------------
+# Alert ingestion
+# -------------------------------------------------
+# /api/alerts/bulk/ writes alerts with bulk_create in batches of this
+# many rows (one transaction per request) and refuses requests carrying
+# more than ALERT_BULK_MAX_ITEMS alerts.
+ALERT_BULK_BATCH_SIZE = int(os.environ.get("ALERT_BULK_BATCH_SIZE", "500"))
+ALERT_BULK_MAX_ITEMS = int(os.environ.get("ALERT_BULK_MAX_ITEMS", "50000"))
+
+# Alert rollups (per-minute / per-hour counts, see nids_app/alerts/rollups.py).
+# Alerts are folded in ROLLUP_COMPACT_BATCH at a time once they are
+# ROLLUP_SETTLE_SECONDS old, by `manage.py compact_alerts --loop` (the
+# Procfile "rollups" process). Readers never compact: they count the
+# alerts not folded yet from the Alert table, so run it to keep reads fast.
+ROLLUP_SETTLE_SECONDS = int(os.environ.get("ROLLUP_SETTLE_SECONDS", "5"))
+ROLLUP_COMPACT_BATCH = int(os.environ.get("ROLLUP_COMPACT_BATCH", "50000"))
+
+# `manage.py prune_alerts` retention in days (0 = keep forever). Raw alerts
+# are only deleted once counted in the rollups; hourly rollups are kept.
+ALERT_RETENTION_DAYS = int(os.environ.get("ALERT_RETENTION_DAYS", "30"))
+ROLLUP_MINUTE_RETENTION_DAYS = int(os.environ.get("ROLLUP_MINUTE_RETENTION_DAYS", "7"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
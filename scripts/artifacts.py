@@ -0,0 +1,352 @@
+# scripts/artifacts.py
+# --------------------------------------------------
+# Session artifact store
+#
+# Stage hand-offs under data/processed/<session>/ (preprocessed,
+# predictions, hybrid_output) are written in a columnar format so the
+# next stage does not re-parse 80 float columns from text. Pick the
+# format with ARTIFACT_FORMAT (feather | parquet | csv) and memory-map
+# reads with ARTIFACT_MMAP=1 (both read from the environment, so stage
+# scripts run outside Django pick them up too). Readers find an artifact
+# in whichever format it was written, so switching formats never
+# strands a session.
+# --------------------------------------------------
+
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, List
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # CSV-only deployments
+    pa = None
+
+try:
+    from scripts.chunked_csv import read_csv_chunks, write_csv_chunks
+except ImportError:  # run as python scripts/<stage>.py
+    from chunked_csv import read_csv_chunks, write_csv_chunks
+
+log = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = os.environ.get("ARTIFACT_FORMAT", "feather")
+ARTIFACT_MMAP = os.environ.get("ARTIFACT_MMAP", "0") == "1"
+
+
+def to_arrow(df: pd.DataFrame):
+    """
+    Arrow table for ``df``. Object columns are stored as strings (what a
+    CSV round trip would have produced) so mixed-type columns and chunks
+    with different null patterns share one schema.
+    """
+    text_cols = [c for c in df.columns if df[c].dtype == object]
+    if text_cols:
+        df = df.copy(deep=False)
+        for col in text_cols:
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str)).astype(object)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for col in text_cols:
+        i = table.schema.get_field_index(col)
+        if table.schema.field(i).type != pa.string():
+            table = table.set_column(i, col, table.column(i).cast(pa.string()))
+
+    return table
+
+
+def _is_number(arrow_type) -> bool:
+    return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_boolean(arrow_type)
+
+
+def _wider_type(a, b):
+    """Narrowest Arrow type holding values of both ``a`` and ``b``."""
+    if a == b or pa.types.is_null(b):
+        return a
+    if pa.types.is_null(a):
+        return b
+    if pa.types.is_integer(a) and pa.types.is_integer(b):
+        return pa.int64()
+    if _is_number(a) and _is_number(b):
+        return pa.float64()
+    return pa.string()
+
+
+def widen_schema(schema, other):
+    """``schema`` with each field widened to also hold ``other``'s values."""
+    fields = [
+        field.with_type(_wider_type(field.type, other.field(field.name).type))
+        for field in schema
+    ]
+    wide = pa.schema(fields, metadata=schema.metadata)
+    if wide.equals(schema):
+        return schema
+    # The pandas metadata records the first chunk's dtypes; let Arrow's types decide
+    return wide.remove_metadata()
+
+
+def write_arrow_chunks(chunks, path: Path, open_writer, read_batches) -> int:
+    """
+    Write DataFrame chunks to ``path`` through ``open_writer(path, schema)``.
+
+    The first chunk sets the schema. A later chunk whose values do not fit
+    (fractional floats in a column that was all integers so far, text in a
+    numeric column) widens it: what was written so far is re-read with
+    ``read_batches(path)`` and copied into a writer with the wider schema,
+    so the artifact matches what writing the whole frame would produce.
+    """
+    writer = schema = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            table = to_arrow(chunk)
+            if writer is None:
+                schema = table.schema
+                writer = open_writer(path, schema)
+            else:
+                wide = widen_schema(schema, table.schema)
+                if wide is not schema:
+                    writer.close()
+                    writer = None
+                    writer = _rewrite(path, wide, open_writer, read_batches)
+                    schema = wide
+                table = table.cast(schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows
+
+
+def _rewrite(path: Path, schema, open_writer, read_batches):
+    """Reopen ``path`` with ``schema``, copying the batches already written."""
+    narrow = path.with_name(path.name + ".narrow")
+    path.replace(narrow)
+    writer = None
+    try:
+        writer = open_writer(path, schema)
+        for batch in read_batches(narrow):
+            writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        raise
+    finally:
+        narrow.unlink()
+    return writer
+
+# --------------------------------------------------
+# Formats
+# --------------------------------------------------
+class CsvFormat:
+    suffix = ".csv"
+
+    def __init__(self, mmap: bool = False):
+        self.mmap = mmap
+
+    def write(self, df: pd.DataFrame, path: Path):
+        df.to_csv(path, index=False)
+
+    def read(self, path: Path, columns: List[str] | None = None) -> pd.DataFrame:
+        return pd.read_csv(path, usecols=columns, low_memory=False, memory_map=self.mmap)
+
+    def columns(self, path: Path) -> List[str]:
+        return list(pd.read_csv(path, nrows=0).columns)
+
+    def rows(self, path: Path) -> int:
+        # Line count without parsing (quoted newlines would be overcounted)
+        lines = 0
+        last = b"\n"
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                lines += block.count(b"\n")
+                last = block[-1:]
+        return max(lines + (last != b"\n") - 1, 0)
+
+    def iter_chunks(self, path: Path, chunksize: int, columns: List[str] | None = None) -> Iterator[pd.DataFrame]:
+        if columns:
+            yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, low_memory=False)
+        else:
+            yield from read_csv_chunks(path, chunksize)
+
+    def write_chunks(self, chunks, path: Path) -> int:
+        return write_csv_chunks(chunks, path)
+
+
+class FeatherFormat:
+    """Arrow IPC (Feather v2), uncompressed so reads can memory-map it."""
+
+    suffix = ".feather"
+
+    def __init__(self, mmap: bool = False):
+        self.mmap = mmap
+
+    def write(self, df: pd.DataFrame, path: Path):
+        feather.write_feather(to_arrow(df), path, compression="uncompressed")
+
+    def read_table(self, path: Path, columns: List[str] | None = None):
+        return feather.read_table(path, columns=columns, memory_map=self.mmap)
+
+    def read(self, path: Path, columns: List[str] | None = None) -> pd.DataFrame:
+        return self.read_table(path, columns).to_pandas()
+
+    def columns(self, path: Path) -> List[str]:
+        with pa.memory_map(str(path)) as source:
+            return pa.ipc.open_file(source).schema.names
+
+    def rows(self, path: Path) -> int:
+        # Record batches of a memory-mapped file are read without copying
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+    def iter_chunks(self, path: Path, chunksize: int, columns: List[str] | None = None) -> Iterator[pd.DataFrame]:
+        # Memory-mapped: pages are file-backed, only one chunk is converted at a time
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+            if columns:
+                table = table.select(columns)
+            for batch in table.to_batches(max_chunksize=chunksize):
+                yield batch.to_pandas()
+
+    def write_chunks(self, chunks, path: Path) -> int:
+        return write_arrow_chunks(chunks, path, lambda p, schema: pa.ipc.new_file(str(p), schema), self.batches)
+
+    @staticmethod
+    def batches(path: Path):
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+
+class ParquetFormat:
+    suffix = ".parquet"
+
+    def __init__(self, mmap: bool = False):
+        self.mmap = mmap
+
+    def write(self, df: pd.DataFrame, path: Path):
+        pq.write_table(to_arrow(df), path)
+
+    def read(self, path: Path, columns: List[str] | None = None) -> pd.DataFrame:
+        return pq.read_table(path, columns=columns, memory_map=self.mmap).to_pandas()
+
+    def columns(self, path: Path) -> List[str]:
+        return pq.read_schema(path).names
+
+    def rows(self, path: Path) -> int:
+        return pq.ParquetFile(path).metadata.num_rows
+
+    def iter_chunks(self, path: Path, chunksize: int, columns: List[str] | None = None) -> Iterator[pd.DataFrame]:
+        parquet = pq.ParquetFile(path, memory_map=self.mmap)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+
+    def write_chunks(self, chunks, path: Path) -> int:
+        return write_arrow_chunks(chunks, path, pq.ParquetWriter, self.batches)
+
+    @staticmethod
+    def batches(path: Path):
+        yield from pq.ParquetFile(path).iter_batches()
+
+
+FORMATS = {
+    "csv": CsvFormat,
+    "feather": FeatherFormat,
+    "parquet": ParquetFormat,
+}
+
+# --------------------------------------------------
+# Store
+# --------------------------------------------------
+class ArtifactStore:
+    """Named DataFrame artifacts in one session directory."""
+
+    def __init__(self, directory: Path, fmt: str | None = None, mmap: bool | None = None):
+        fmt = fmt or ARTIFACT_FORMAT
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown artifact format: {fmt}")
+        if fmt != "csv" and pa is None:
+            log.warning("pyarrow is not installed; writing %s artifacts as CSV", fmt)
+            fmt = "csv"
+
+        # Created by the first write, so lookups never leave empty session dirs
+        self.directory = Path(directory)
+        self.mmap = ARTIFACT_MMAP if mmap is None else mmap
+        self.format = FORMATS[fmt](self.mmap)
+
+    def path(self, name: str) -> Path:
+        """Where ``name`` is written in this store's format."""
+        return self.directory / f"{name}{self.format.suffix}"
+
+    def find(self, name: str):
+        """(format, path) of the newest existing copy of ``name``, or None."""
+        found = []
+        for fmt_cls in FORMATS.values():
+            path = self.directory / f"{name}{fmt_cls.suffix}"
+            if path.exists() and (fmt_cls is CsvFormat or pa is not None):
+                found.append((path.stat().st_mtime_ns, fmt_cls, path))
+        if not found:
+            return None
+
+        _, fmt_cls, path = max(found, key=lambda f: f[0])
+        fmt = self.format if isinstance(self.format, fmt_cls) else fmt_cls(self.mmap)
+        return fmt, path
+
+    def locate(self, name: str) -> Path:
+        """Path of ``name`` for error messages: the existing copy, else the target."""
+        found = self.find(name)
+        return found[1] if found else self.path(name)
+
+    def exists(self, name: str) -> bool:
+        return self.find(name) is not None
+
+    def _existing(self, name: str):
+        found = self.find(name)
+        if found is None:
+            raise FileNotFoundError(f"{self.path(name)} not found")
+        return found
+
+    def read(self, name: str, columns: List[str] | None = None) -> pd.DataFrame:
+        fmt, path = self._existing(name)
+        return fmt.read(path, columns)
+
+    def columns(self, name: str) -> List[str]:
+        fmt, path = self._existing(name)
+        return fmt.columns(path)
+
+    def rows(self, name: str) -> int:
+        fmt, path = self._existing(name)
+        return fmt.rows(path)
+
+    def iter_chunks(self, name: str, chunksize: int, columns: List[str] | None = None) -> Iterator[pd.DataFrame]:
+        fmt, path = self._existing(name)
+        yield from fmt.iter_chunks(path, chunksize, columns)
+
+    def _drop_stale(self, name: str):
+        # Another format's copy would otherwise shadow or outlive this one
+        for fmt_cls in FORMATS.values():
+            path = self.directory / f"{name}{fmt_cls.suffix}"
+            if fmt_cls is not type(self.format) and path.exists():
+                path.unlink()
+
+    def write(self, name: str, df: pd.DataFrame) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(name)
+        self.format.write(df, path)
+        self._drop_stale(name)
+        return path
+
+    def write_chunks(self, name: str, chunks) -> int:
+        """Write an iterable of DataFrames as one artifact; returns rows written."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        rows = self.format.write_chunks(chunks, self.path(name))
+        self._drop_stale(name)
+        return rows
@@ -0,0 +1,62 @@
+# scripts/chunked_csv.py
+# --------------------------------------------------
+# Bounded-memory CSV streaming shared by the pipeline stages
+# --------------------------------------------------
+
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+
+# Rows per chunk when scanning a file for its dtypes
+DTYPE_SCAN_ROWS = 100_000
+
+
+def _merge_dtype(a: np.dtype, b: np.dtype) -> np.dtype:
+    if a == b:
+        return a
+    if {a.kind, b.kind} <= {"i", "u", "f"}:
+        return np.dtype("float64")
+    return np.dtype("object")
+
+
+def infer_csv_dtypes(path: Path, chunksize: int) -> dict:
+    """
+    Column dtypes pandas infers when parsing the whole file at once,
+    worked out one chunk at a time. A column that is int in one chunk and
+    float (e.g. has a NaN) in another must be float everywhere, or the
+    streamed output would print "1" where the full read prints "1.0".
+    """
+    dtypes: dict = {}
+    for chunk in pd.read_csv(path, chunksize=chunksize, low_memory=False):
+        for col, dtype in chunk.dtypes.items():
+            dtypes[col] = _merge_dtype(dtypes[col], dtype) if col in dtypes else dtype
+    return dtypes
+
+
+def read_csv_chunks(path: Path, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Chunks of ``path`` with whole-file dtypes (two passes, bounded memory)."""
+    dtypes = infer_csv_dtypes(path, chunksize)
+    yield from pd.read_csv(path, chunksize=chunksize, dtype=dtypes, low_memory=False)
+
+
+def read_csv_whole(path: Path, chunksize: int = DTYPE_SCAN_ROWS) -> pd.DataFrame:
+    """
+    All of ``path`` in one frame, with the dtypes read_csv_chunks() gives
+    it. A plain read_csv (low_memory=True) infers types per internal
+    block, so a column that turns text late would hold ints and strings
+    here but only strings in the streamed output.
+    """
+    return pd.read_csv(path, dtype=infer_csv_dtypes(path, chunksize), low_memory=False)
+
+
+def write_csv_chunks(chunks: Iterable[pd.DataFrame], path: Path) -> int:
+    """Append each chunk to ``path`` (header once); returns rows written."""
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=(i == 0))
+            rows += len(chunk)
+    return rows
@@ -0,0 +1,252 @@
+# scripts/compiled_forest.py
+# --------------------------------------------------
+# Compiled tree-ensemble inference
+#
+# sklearn's RandomForestClassifier.predict_proba walks each tree in
+# turn behind input validation and a joblib dispatch, which dominates
+# the cost of the small batches the live sensor scores every tick.
+# compile_forest() flattens a fitted forest into contiguous node arrays
+# (feature, threshold, right child, normalized leaf values) laid out in
+# preorder, so a node's left child is the next node, and CompiledForest
+# evaluates every tree over a block of rows at once: one vectorized
+# gather/compare per tree level. Probabilities match sklearn to
+# floating-point rounding (same float32 inputs, same float64
+# thresholds, same NaN routing).
+#
+# The win is per-call overhead: ~50x at one row, break-even at a few
+# hundred rows, and sklearn's compiled tree walk is faster beyond that
+# (see benchmarks/bench_compiled_forest.py). So whole-file scoring in
+# predict.py keeps the sklearn model; the live sensor scores ticks of up
+# to COMPILED_MAX_ROWS flows with the compiled form, and train_model.py
+# exports the session forest as model_compiled.pkl for small-batch
+# scorers (load_compiled() reads it instead of compiling again).
+#
+# model_compiled.pkl holds a dict of plain numpy arrays, not a pickled
+# CompiledForest: a pickled class records the module name the writer
+# imported it under ("compiled_forest" when train_model.py runs as a
+# script), which a reader importing scripts.compiled_forest cannot
+# resolve. Plain arrays also let COMPILED_MMAP=1 load it with joblib
+# mmap_mode="r": every process scoring with the same file shares its
+# pages from the page cache. This does not work for model.pkl itself:
+# sklearn's Tree.__setstate__ copies its node arrays into buffers of
+# its own, so each process holds a private copy whatever mmap_mode says.
+#
+#     python scripts/compiled_forest.py data/processed/<session>/model.pkl
+# --------------------------------------------------
+
+import argparse
+import logging
+import os
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Rows x trees evaluated per block; bounds the (trees, rows) index arrays
+BLOCK_NODES = 1 << 20
+
+COMPILED_MMAP = os.environ.get("COMPILED_MMAP", "0") == "1"
+
+
+def compiled_path(model_path: Path) -> Path:
+    """model.pkl → model_compiled.pkl"""
+    return model_path.with_name(f"{model_path.stem}_compiled{model_path.suffix}")
+
+
+class CompiledForest:
+    """
+    A fitted forest classifier as flat node arrays. Exposes classes_,
+    n_features_in_, predict_proba() and predict(), so it stands in for
+    the sklearn model wherever those are all that is used.
+
+    Leaves have a NaN threshold and are their own right child: every
+    comparison sends a row that reached one back to it, so all rows take
+    ``max_depth`` steps without checking which trees have finished.
+    """
+
+    def __init__(self, feature, threshold, right, missing_left, value, roots, max_depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def to_arrays(self) -> dict:
+        """Constructor arguments as plain data (what save_compiled writes)."""
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "right": self.right,
+            "missing_left": self.missing_left,
+            "value": self.value,
+            "roots": self.roots,
+            "max_depth": int(self.max_depth),
+            "classes": np.asarray(self.classes_),
+            "n_features": int(self.n_features_in_),
+        }
+
+    def predict_proba(self, X) -> np.ndarray:
+        # sklearn's trees compare float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+
+        proba = np.empty((X.shape[0], len(self.classes_)))
+        block = max(1, BLOCK_NODES // self.n_estimators)
+
+        for start in range(0, X.shape[0], block):
+            proba[start:start + block] = self.proba_block(X[start:start + block])
+
+        return proba
+
+    def proba_block(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offset = np.arange(n_rows, dtype=np.intp) * n_features
+
+        # nodes[t, i]: where row i currently is in tree t
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        check_nan = self.missing_left.any() and np.isnan(flat).any()
+
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if check_nan:
+                go_left |= np.isnan(x) & self.missing_left[nodes]
+            nodes = np.where(go_left, nodes + 1, self.right[nodes])
+
+        return self.value[nodes].sum(axis=0) / self.n_estimators
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def preorder(tree) -> np.ndarray:
+    """Node ids of ``tree`` in depth-first preorder (left subtree first)."""
+    order = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if tree.children_left[node] != -1:
+            stack.append(tree.children_right[node])
+            stack.append(tree.children_left[node])
+    return np.array(order, dtype=np.intp)
+
+
+def compile_forest(forest) -> CompiledForest:
+    """Flatten a fitted single-output forest classifier (RandomForest / ExtraTrees)."""
+    if getattr(forest, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be compiled.")
+
+    feature, threshold, right, missing_left, value, roots = [], [], [], [], [], []
+    offset = 0
+
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        internal = tree.children_left != -1
+
+        # Depth-first builders already number nodes in preorder; best-first
+        # ones (max_leaf_nodes) are renumbered
+        if (tree.children_left[internal] == np.flatnonzero(internal) + 1).all():
+            order = np.arange(n, dtype=np.intp)
+        else:
+            order = preorder(tree)
+        new_id = np.empty(n, dtype=np.intp)
+        new_id[order] = np.arange(n) + offset
+
+        leaf = ~internal[order]
+        right.append(np.where(leaf, new_id[order], new_id[tree.children_right[order]]))
+        feature.append(np.where(leaf, 0, tree.feature[order]).astype(np.intp))
+        threshold.append(np.where(leaf, np.nan, tree.threshold[order]))
+        missing_left.append(
+            tree.missing_go_to_left[order].astype(bool) & ~leaf
+            if hasattr(tree, "missing_go_to_left") else np.zeros(n, dtype=bool)
+        )
+
+        # Per-leaf class distribution normalized as DecisionTreeClassifier.predict_proba does
+        leaf_value = tree.value[order, 0, :].astype(np.float64)
+        totals = leaf_value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1
+        value.append(leaf_value / totals)
+
+        roots.append(offset)
+        offset += n
+
+    return CompiledForest(
+        feature=np.concatenate(feature),
+        threshold=np.concatenate(threshold),
+        right=np.concatenate(right),
+        missing_left=np.concatenate(missing_left),
+        value=np.concatenate(value),
+        roots=np.array(roots, dtype=np.intp),
+        max_depth=max(estimator.tree_.max_depth for estimator in forest.estimators_),
+        classes=np.asarray(forest.classes_),
+        n_features=forest.n_features_in_,
+    )
+
+
+def save_compiled(compiled: CompiledForest, path: Path) -> Path:
+    joblib.dump(compiled.to_arrays(), path)
+    return path
+
+
+def read_compiled(path: Path) -> CompiledForest:
+    arrays = joblib.load(path, mmap_mode="r" if COMPILED_MMAP else None)
+    if not isinstance(arrays, dict):
+        raise ValueError(f"{path} does not hold compiled forest arrays")
+    return CompiledForest(**arrays)
+
+
+def load_compiled(model_path: Path, model=None) -> CompiledForest:
+    """
+    The compiled form of the forest in ``model_path``: model_compiled.pkl
+    beside it when it is at least as new (memory-mapped with
+    COMPILED_MMAP=1), else compiled from ``model`` (or the loaded file).
+    An unreadable model_compiled.pkl is compiled again too.
+    """
+    model_path = Path(model_path)
+    path = compiled_path(model_path)
+
+    if path.exists() and path.stat().st_mtime_ns >= model_path.stat().st_mtime_ns:
+        try:
+            return read_compiled(path)
+        except Exception as e:
+            log.warning(f"Could not load {path} ({e}); compiling {model_path} instead")
+
+    return compile_forest(model if model is not None else joblib.load(model_path))
+
+
+def export(model_path: Path, out_path: Path | None = None) -> Path:
+    """Compile the forest in ``model_path`` and write it beside it (or to ``out_path``)."""
+    out_path = out_path or compiled_path(model_path)
+    compiled = compile_forest(joblib.load(model_path))
+    save_compiled(compiled, out_path)
+
+    log.info(f"Compiled {compiled.n_estimators} trees ({len(compiled.feature)} nodes) → {out_path}")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a trained forest for fast inference")
+    parser.add_argument("model", type=Path, help="joblib model file (e.g. data/processed/<session>/model.pkl)")
+    parser.add_argument("--out", type=Path, default=None, help="default: <model>_compiled.pkl beside it")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[COMPILE] %(message)s")
+    export(args.model, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# scripts/incremental.py
+# --------------------------------------------------
+# Incremental training ledger
+#
+# A session model records which rows of the training matrix it has
+# seen, as row ranges ("slices") with a content digest each, in
+# model_ledger.json beside model.pkl. When the matrix still starts with
+# exactly those slices, only the rows after them are new: train_model
+# grows the forest with warm_start trees fitted on those rows (plus a
+# small replay sample of earlier ones) instead of refitting the history.
+#
+# Quality is tracked so drift is noticed: the last full retrain records
+# its out-of-bag macro F1 as the baseline, every increment holds a
+# fraction of its new rows back (row indices in model_holdout.npy), and
+# the grown forest is scored on all held-back rows. A score clearly
+# below the baseline (QUALITY_TOLERANCE beyond the sampling error of
+# that many rows) flags the ledger, and the next auto-mode run retrains
+# from scratch; so does a forest grown to train_model's MAX_TREES_FACTOR
+# times its full-fit tree count, or a change to rows the model was
+# trained on.
+# --------------------------------------------------
+
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Share of each increment's new rows held back for quality tracking
+HOLDOUT_FRACTION = 0.1
+# Held-back rows kept across increments (a random subset beyond this)
+HOLDOUT_MAX_ROWS = 50_000
+# Earlier rows replayed per new training row, so new trees see both classes
+REPLAY_RATIO = 0.5
+# Fewest trees an increment adds
+MIN_INCREMENT_TREES = 10
+# Macro F1 drop below the baseline that calls for a full retrain, on
+# top of two standard errors of a score over that many held-back rows
+QUALITY_TOLERANCE = 0.02
+
+
+def ledger_paths(model_path: Path):
+    return (
+        model_path.with_name("model_ledger.json"),
+        model_path.with_name("model_holdout.npy"),
+    )
+
+
+def slice_digest(X: np.ndarray, y: np.ndarray, start: int, end: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    # Row ranges of C-ordered arrays are contiguous: hashed without copying
+    h.update(np.ascontiguousarray(X[start:end]))
+    h.update(np.ascontiguousarray(y[start:end]))
+    return h.hexdigest()
+
+
+class Ledger:
+    """What a saved session model was trained on, and how well it scores."""
+
+    def __init__(self, features, slices=None, baseline=None, quality=None, stale=None):
+        self.features = list(features)
+        self.slices = slices or []
+        self.baseline = baseline
+        self.quality = quality or []
+        # Reason a full retrain is due, or None
+        self.stale = stale
+
+    @property
+    def rows_seen(self) -> int:
+        return self.slices[-1]["end"] if self.slices else 0
+
+    @property
+    def trees(self) -> int:
+        return sum(s["trees"] for s in self.slices)
+
+    @classmethod
+    def load(cls, path: Path):
+        try:
+            return cls(**json.loads(path.read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, path: Path):
+        path.write_text(json.dumps(vars(self), indent=2))
+
+    def add_slice(self, X, y, start, end, trees, mode):
+        self.slices.append({
+            "start": start,
+            "end": end,
+            "digest": slice_digest(X, y, start, end),
+            "trees": trees,
+            "mode": mode,
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+    def record_quality(self, f1, rows, source):
+        self.quality.append({"rows_seen": self.rows_seen, "trees": self.trees, "f1": round(f1, 4),
+                             "scored_rows": rows, "source": source})
+
+        if self.baseline is None:
+            return
+        # Worst-case binomial standard error is 0.5 / sqrt(rows)
+        if f1 < self.baseline - QUALITY_TOLERANCE - 1 / np.sqrt(rows):
+            self.stale = f"holdout macro F1 {f1:.3f} fell below the baseline {self.baseline:.3f}"
+            log.warning(f"Model quality dropped ({self.stale}); the next training run retrains from scratch")
+
+    def increment_blocker(self, X, y, features, max_trees) -> str | None:
+        """Why the rows after rows_seen cannot be added incrementally, or None."""
+        if self.stale:
+            return self.stale
+        if list(features) != self.features:
+            return "the feature columns changed"
+        if len(y) < self.rows_seen:
+            return "the dataset is shorter than the one the model saw"
+        if self.trees >= max_trees:
+            return f"the forest already has {self.trees} trees (limit {max_trees})"
+
+        # Appended rows only: everything the model saw must be unchanged
+        for s in self.slices:
+            if slice_digest(X, y, s["start"], s["end"]) != s["digest"]:
+                return f"rows {s['start']}-{s['end']} changed since they were trained on"
+        return None
+
+
+def increment_trees(base_trees: int, new_rows: int, total_rows: int) -> int:
+    """Trees for an increment, in proportion to its share of the data."""
+    return max(MIN_INCREMENT_TREES, round(base_trees * new_rows / total_rows))
+
+
+def split_increment(start: int, end: int, seed: int):
+    """(train rows, held-back rows) of the new rows [start, end)."""
+    rng = np.random.default_rng(seed)
+    rows = np.arange(start, end)
+    held = rng.random(len(rows)) < HOLDOUT_FRACTION
+    return rows[~held], rows[held]
+
+
+def replay_rows(seen: int, holdout: np.ndarray, n: int, seed: int) -> np.ndarray:
+    """Up to ``n`` earlier training rows, sampled without touching the history."""
+    if seen == 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    rows = np.unique(rng.integers(0, seen, size=min(n, seen)))
+    return rows[~np.isin(rows, holdout)]
+
+
+def load_holdout(path: Path) -> np.ndarray:
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        return np.empty(0, dtype=np.int64)
+
+
+def save_holdout(path: Path, rows: np.ndarray, seed: int):
+    if len(rows) > HOLDOUT_MAX_ROWS:
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(rows, HOLDOUT_MAX_ROWS, replace=False))
+    np.save(path, rows.astype(np.int64))
+    return rows
@@ -0,0 +1,133 @@
+# scripts/model_registry.py
+# --------------------------------------------------
+# Warm model registry
+#
+# Unpickling a session's 120-tree forest takes seconds, so processes
+# that score more than once (the web process's job worker, the
+# in-process pipeline) keep loaded models in an LRU registry instead of
+# calling joblib.load per run. Entries are keyed by a digest of
+# model.pkl + model_features.pkl: sessions that trained the same model
+# share one entry, and retraining (new file contents) is a new key. The
+# digest is memoized on the files' stat signature, so a warm lookup is
+# two stat() calls.
+#
+# MODEL_CACHE_SIZE bounds how many models stay loaded (0 disables the
+# registry). Each process holds its own copy of a loaded forest: sklearn
+# copies tree arrays on unpickling, so mmap_mode would not share them
+# (the compiled form can be shared, see compiled_forest.load_compiled).
+# --------------------------------------------------
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import joblib
+
+log = logging.getLogger(__name__)
+
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", "4"))
+
+
+def stat_signature(path: Path):
+    st = path.stat()
+    return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def file_digest(*paths: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU of loaded (model, feature_names) pairs by content
+    digest. Concurrent misses on the same key load it once.
+    """
+
+    def __init__(self, capacity: int = MODEL_CACHE_SIZE):
+        self.capacity = capacity
+        self.models = OrderedDict()
+        self.digests = {}
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def key(self, model_path: Path, features_path: Path) -> str:
+        signature = (stat_signature(model_path), stat_signature(features_path))
+        paths = (str(model_path), str(features_path))
+
+        with self.lock:
+            cached = self.digests.get(paths)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        digest = file_digest(model_path, features_path)
+        with self.lock:
+            self.digests[paths] = (signature, digest)
+        return digest
+
+    def get(self, model_path: Path, features_path: Path):
+        """(model, feature_names) for the files, loading them on a miss."""
+        key = self.key(model_path, features_path)
+
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.models[key]
+
+            # One loader per key; others wait for it instead of unpickling too
+            pending = self.loading.get(key)
+            if pending is None:
+                pending = self.loading[key] = threading.Lock()
+                pending.acquire()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            with pending:
+                pass
+            return self.get(model_path, features_path)
+
+        try:
+            log.info(f"Loading model {key[:12]} from {model_path}")
+            entry = (joblib.load(model_path), joblib.load(features_path))
+            with self.lock:
+                self.stats["misses"] += 1
+                self.insert(key, entry)
+            return entry
+        finally:
+            with self.lock:
+                del self.loading[key]
+            pending.release()
+
+    def put(self, model_path: Path, features_path: Path, model, features):
+        """Register a model just written to the files (training), so the next get() is warm."""
+        key = self.key(model_path, features_path)
+        with self.lock:
+            self.insert(key, (model, features))
+
+    def insert(self, key, entry):
+        if self.capacity <= 0:
+            return
+        self.models[key] = entry
+        self.models.move_to_end(key)
+        while len(self.models) > self.capacity:
+            self.models.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+            self.digests.clear()
+
+
+registry = ModelRegistry()
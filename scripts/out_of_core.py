@@ -0,0 +1,334 @@
+# scripts/out_of_core.py
+# --------------------------------------------------
+# Out-of-core training
+#
+# A full CICIDS dump does not fit in memory as a training matrix, so
+# train_model hands datasets whose matrix would exceed TRAIN_MEMORY_MB
+# to this module, which streams the preprocessed artifact in chunks
+# sized from that budget. Two strategies:
+#
+#   sample   (TRAIN_WORKERS=0, default) a stratified reservoir sample:
+#            every label gets an equal share of the sample rows (labels
+#            with fewer rows keep all of them and leave their share to
+#            the rest), filled with a uniform random sample of that
+#            label's rows; the usual forest is fitted on it.
+#   ensemble (TRAIN_WORKERS=N) a forest per chunk, fitted across N
+#            worker processes while the next chunks are read, with
+#            their trees merged into one forest. A chunk missing a class
+#            borrows rows of it from a small reservoir, and is re-read
+#            in a second pass if the reservoir had none yet.
+#
+# The budget covers the training data (chunks in flight, the sample,
+# the fit's working set), not the interpreters running it.
+# --------------------------------------------------
+
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+try:
+    from scripts.artifacts import ArtifactStore
+    from scripts.training_data import encode_labels, iter_training_chunks, label_column, label_counts
+except ImportError:  # run as python scripts/<stage>.py
+    from artifacts import ArtifactStore
+    from training_data import encode_labels, iter_training_chunks, label_column, label_counts
+
+log = logging.getLogger(__name__)
+
+TRAIN_MEMORY_MB = int(os.environ.get("TRAIN_MEMORY_MB", "2048"))
+TRAIN_WORKERS = int(os.environ.get("TRAIN_WORKERS", "0"))
+
+# Memory per byte of training matrix while fitting (matrix, per-tree
+# bootstrap weights and index buffers, out-of-bag scoring)
+MATRIX_OVERHEAD = 3
+# Memory per float32 matrix byte of a chunk being parsed (raw column
+# buffers plus the float32 copy)
+CHUNK_OVERHEAD = 4
+MIN_CHUNK_ROWS = 1_000
+# Memory per byte of raw CSV loaded whole by the in-memory pipeline (the
+# parsed frame is about as large as the text; the training matrix and
+# the fit's working set come on top)
+RAW_CSV_OVERHEAD = 4
+# Share of an ensemble chunk a borrowed missing class makes up
+BORROW_SHARE = 0.1
+
+
+def memory_budget() -> int:
+    return TRAIN_MEMORY_MB * 1024 * 1024
+
+
+def fits_in_memory(store: ArtifactStore, budget: int | None = None) -> bool:
+    """Whether training on the whole matrix stays within the budget."""
+    budget = budget or memory_budget()
+    n_features = len(store.columns("preprocessed")) - 1
+    return store.rows("preprocessed") * n_features * 4 * MATRIX_OVERHEAD <= budget
+
+
+def raw_fits_in_memory(path: Path, budget: int | None = None) -> bool:
+    """Whether the pipeline can hold the raw upload at ``path`` in memory."""
+    budget = budget or memory_budget()
+    return path.stat().st_size * RAW_CSV_OVERHEAD <= budget
+
+
+def label_capacities(counts: pd.Series, capacity: int) -> dict:
+    """
+    Sample rows per label: an equal share of ``capacity`` each, with
+    labels that have fewer rows keeping all of them (water-filling).
+    """
+    caps = {}
+    remaining = capacity
+    pending = list(counts.sort_values().items())
+
+    while pending:
+        share = remaining // len(pending)
+        label, count = pending[0]
+        if count > share:
+            caps.update((label, share) for label, _ in pending)
+            break
+        caps[label] = count
+        remaining -= count
+        pending.pop(0)
+
+    return caps
+
+
+class StratifiedReservoir:
+    """
+    A uniform random sample of each label's rows (Algorithm R per
+    label), up to a fixed number of rows per label. Each label's rows
+    are a slice of one matrix, so the sample is returned without a copy.
+    """
+
+    def __init__(self, capacities: dict, n_features: int, seed: int = 42):
+        self.rng = np.random.default_rng(seed)
+        self.matrix = np.empty((sum(capacities.values()), n_features), dtype=np.float32)
+        self.rows = {}
+        offset = 0
+        for label, cap in capacities.items():
+            self.rows[label] = self.matrix[offset:offset + cap]
+            offset += cap
+        self.held = dict.fromkeys(capacities, 0)
+        self.seen = dict.fromkeys(capacities, 0)
+
+    def add(self, X: np.ndarray, labels: np.ndarray):
+        for label in pd.unique(labels):
+            if label in self.rows:
+                self.add_label(label, X[labels == label])
+
+    def add_label(self, label, X: np.ndarray):
+        sample = self.rows[label]
+        cap, held = len(sample), self.held[label]
+
+        # Fill free slots first
+        take = min(cap - held, len(X))
+        sample[held:held + take] = X[:take]
+        self.held[label] = held + take
+        self.seen[label] += take
+
+        rest = X[take:]
+        if not len(rest):
+            return
+
+        # Row t (1-based, of all this label's rows) replaces a uniformly
+        # chosen slot with probability cap / t
+        t = self.seen[label] + np.arange(1, len(rest) + 1)
+        slot = (self.rng.random(len(rest)) * t).astype(np.int64)
+        hit = np.flatnonzero(slot < cap)
+
+        # Later rows win a slot drawn several times, as in the sequential algorithm
+        slots, last = np.unique(slot[hit][::-1], return_index=True)
+        sample[slots] = rest[hit[::-1][last]]
+        self.seen[label] += len(rest)
+
+    def sample(self):
+        """
+        (X, label strings) of every row held. Compacts the matrix in
+        place, so no rows can be added afterwards.
+        """
+        offset = 0
+        for label, rows in self.rows.items():
+            held = self.held[label]
+            # Moves only ever go to lower offsets: earlier rows are already copied
+            self.matrix[offset:offset + held] = rows[:held]
+            offset += held
+
+        labels = list(self.rows)
+        return self.matrix[:offset], np.repeat(labels, [self.held[label] for label in labels])
+
+    def take(self, attack: int, n: int):
+        """Up to ``n`` held rows whose binary class is ``attack``."""
+        labels = [label for label in self.rows if self.held[label]]
+        labels = [label for label, y in zip(labels, encode_labels(pd.Series(labels))) if y == attack]
+        if not labels:
+            return None
+
+        X = np.concatenate([self.rows[label][:self.held[label]] for label in labels])
+        pick = self.rng.choice(len(X), size=min(n, len(X)), replace=False)
+        return X[pick]
+
+# --------------------------------------------------
+# Strategies
+# --------------------------------------------------
+def dataset_schema(store: ArtifactStore):
+    columns = store.columns("preprocessed")
+    label_col = label_column(columns)
+    if label_col is None:
+        return None
+    return label_col, [c for c in columns if c != label_col]
+
+
+def reservoir_sample(store: ArtifactStore, budget: int | None = None, seed: int = 42):
+    """
+    (X, y, feature names) of a stratified sample sized so that fitting a
+    forest on it stays within ``budget`` bytes, or None without labels.
+    """
+    budget = budget or memory_budget()
+    schema = dataset_schema(store)
+    if schema is None:
+        return None
+    label_col, features = schema
+
+    row_bytes = len(features) * 4
+    capacity = budget // (row_bytes * MATRIX_OVERHEAD)
+    chunk_rows = max(MIN_CHUNK_ROWS, (budget - capacity * row_bytes) // (row_bytes * CHUNK_OVERHEAD))
+
+    counts = label_counts(store, label_col, chunk_rows)
+    reservoir = StratifiedReservoir(label_capacities(counts, capacity), len(features), seed)
+    log.info(
+        f"Out-of-core training: {counts.sum()} rows in chunks of {chunk_rows}, "
+        f"stratified sample of up to {capacity} rows ({budget // 2**20} MB budget)"
+    )
+
+    for X, labels in iter_training_chunks(store, label_col, features, chunk_rows):
+        reservoir.add(X, labels)
+
+    for label in counts.index:
+        log.info(f"  {label}: {reservoir.held[label]} of {reservoir.seen[label]} rows sampled")
+
+    X, labels = reservoir.sample()
+    return X, encode_labels(pd.Series(labels)), features
+
+
+def fit_chunk(params: dict, X: np.ndarray, y: np.ndarray, features: list):
+    """Worker: one chunk's forest (pickled back without its out-of-bag matrix)."""
+    clf = RandomForestClassifier(**params)
+    clf.fit(pd.DataFrame(X, columns=features, copy=False), y)
+    if hasattr(clf, "oob_decision_function_"):
+        del clf.oob_decision_function_
+    return clf, len(y)
+
+
+def merge_forests(forests):
+    """One forest voting with every tree of ``forests`` (same classes and features)."""
+    merged = forests[0]
+    merged.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    merged.n_estimators = len(merged.estimators_)
+    # Each forest's out-of-bag score described that forest alone
+    if hasattr(merged, "oob_score_"):
+        del merged.oob_score_
+    return merged
+
+
+def chunk_ensemble(store: ArtifactStore, params: dict, workers: int, budget: int | None = None, seed: int = 42):
+    """
+    A forest merged from per-chunk forests fitted on ``workers``
+    processes, or None without labels. ``params`` configure the whole
+    forest; its trees are split across the chunks.
+    """
+    budget = budget or memory_budget()
+    schema = dataset_schema(store)
+    if schema is None:
+        return None
+    label_col, features = schema
+
+    # A quarter of the budget holds the borrowing reservoir; the rest the
+    # chunks in flight: one being read, ``workers`` queued in this
+    # process and the same being fitted in the workers
+    row_bytes = len(features) * 4
+    capacity = budget // 4 // row_bytes
+    chunk_rows = max(MIN_CHUNK_ROWS, (budget - capacity * row_bytes) // (
+        row_bytes * (CHUNK_OVERHEAD + workers * (1 + MATRIX_OVERHEAD))
+    ))
+
+    counts = label_counts(store, label_col, chunk_rows)
+    n_rows = int(counts.sum())
+    classes = np.unique(encode_labels(pd.Series(counts.index)))
+    trees = max(1, round(params["n_estimators"] / math.ceil(n_rows / chunk_rows)))
+
+    reservoir = StratifiedReservoir(label_capacities(counts, capacity), len(features), seed)
+    log.info(
+        f"Out-of-core training: {n_rows} rows, a {trees}-tree forest per {chunk_rows}-row chunk "
+        f"on {workers} worker processes ({budget // 2**20} MB budget)"
+    )
+
+    def complete(X, y):
+        """The chunk with rows of any missing class borrowed, or None."""
+        for missing in np.setdiff1d(classes, y):
+            borrowed = reservoir.take(missing, max(1, int(len(y) * BORROW_SHARE)))
+            if borrowed is None:
+                return None
+            X = np.concatenate([X, borrowed])
+            y = np.concatenate([y, np.full(len(borrowed), missing, dtype=y.dtype)])
+        return X, y
+
+    forests, rows = [], 0
+    # Spawned, not forked: this may run on a thread of the web process
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = set()
+
+        def submit(i, X, y):
+            nonlocal pending, rows
+            while len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    forest, n = future.result()
+                    forests.append(forest)
+                    rows += n
+            chunk_params = {**params, "n_estimators": trees, "random_state": seed + i, "n_jobs": 1}
+            pending.add(pool.submit(fit_chunk, chunk_params, X, y, features))
+
+        deferred = []
+        for i, (X, labels) in enumerate(iter_training_chunks(store, label_col, features, chunk_rows)):
+            reservoir.add(X, labels)
+            batch = complete(X, encode_labels(pd.Series(labels)))
+            if batch is None:
+                deferred.append(i)
+            else:
+                submit(i, *batch)
+
+        # The reservoir has seen every class by now
+        if deferred:
+            log.info(f"Second pass for {len(deferred)} chunks that lacked a class")
+            todo = set(deferred)
+            for i, (X, labels) in enumerate(iter_training_chunks(store, label_col, features, chunk_rows)):
+                if i not in todo:
+                    continue
+                batch = complete(X, encode_labels(pd.Series(labels)))
+                if batch is None:
+                    # Its class got no sample rows (a budget too small for the labels)
+                    log.warning(f"Skipping chunk {i}: no rows to borrow for its missing class")
+                else:
+                    submit(i, *batch)
+
+        for future in pending:
+            forest, n = future.result()
+            forests.append(forest)
+            rows += n
+
+    scores = [forest.oob_score_ for forest in forests if hasattr(forest, "oob_score_")]
+    if scores:
+        log.info(f"Mean out-of-bag accuracy of {len(forests)} chunk forests: {np.mean(scores):.4f}")
+
+    log.info(f"Merged {len(forests)} chunk forests: {sum(len(f.estimators_) for f in forests)} trees, {rows} rows")
+    merged = merge_forests(forests)
+    merged.set_params(n_jobs=params.get("n_jobs"), random_state=params.get("random_state"))
+    return merged, features
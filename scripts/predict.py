@@ -1,72 +1,51 @@
 # scripts/predict.py
 
-import sys
+import argparse
 import pandas as pd
 from pathlib import Path
-import joblib
 import logging
 
-logging.basicConfig(level=logging.INFO, format="[PREDICT] %(message)s")
+try:
+    from scripts.artifacts import ArtifactStore
+    from scripts.model_registry import registry
+except ImportError:  # run as python scripts/predict.py
+    from artifacts import ArtifactStore
+    from model_registry import registry
 
-# -------------------------------------------------
-# Get session ID from Django
-# -------------------------------------------------
-if len(sys.argv) < 2:
-    raise Exception("Session ID not provided")
-
-session_id = sys.argv[1]
+log = logging.getLogger(__name__)
 
 # -------------------------------------------------
 # Resolve project paths safely
 # -------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parent.parent
-processed_dir = BASE_DIR / "data" / "processed" / session_id
-processed_dir.mkdir(parents=True, exist_ok=True)
 
-DATA = processed_dir / "preprocessed.csv"
-MODEL = processed_dir / "model.pkl"
-FEATURES = processed_dir / "model_features.pkl"
-OUT = processed_dir / "predictions.csv"
+
+def session_paths(session_id: str):
+    processed_dir = BASE_DIR / "data" / "processed" / session_id
+    store = ArtifactStore(processed_dir)
+
+    return (
+        store,
+        processed_dir / "model.pkl",
+        processed_dir / "model_features.pkl",
+    )
 
 THRESHOLD = 0.6  # IDS decision threshold
 
 # -------------------------------------------------
-# Main Prediction Logic
+# Robust Column Mapping (Schema Normalization)
 # -------------------------------------------------
-def main():
-
-    if not DATA.exists():
-        raise FileNotFoundError(f"Preprocessed file not found: {DATA}")
-
-    if not MODEL.exists():
-        raise FileNotFoundError(f"Model file not found: {MODEL}")
-
-    if not FEATURES.exists():
-        raise FileNotFoundError(f"Feature schema file not found: {FEATURES}")
-
-    logging.info("Loading dataset...")
-    df = pd.read_csv(DATA)
-
-    logging.info("Loading trained model...")
-    clf = joblib.load(MODEL)
+COLUMN_MAPPING = {
+    "BwdPktLenMean": "BwdPacketLengthMean",
+    "FwdPktLenMean": "FwdPacketLengthMean",
+    "FlowBytsPerSec": "FlowBytes/s",
+    "FlowPktsPerSec": "FlowPackets/s",
+    "TotFwdPkts": "Total Fwd Packets",
+    "TotBwdPkts": "Total Backward Packets",
+}
 
-    logging.info("Loading training feature schema...")
-    model_features = joblib.load(FEATURES)
-
-    logging.info("Aligning features...")
-
-    # -------------------------------------------------
-    # Robust Column Mapping (Schema Normalization)
-    # -------------------------------------------------
-    COLUMN_MAPPING = {
-        "BwdPktLenMean": "BwdPacketLengthMean",
-        "FwdPktLenMean": "FwdPacketLengthMean",
-        "FlowBytsPerSec": "FlowBytes/s",
-        "FlowPktsPerSec": "FlowPackets/s",
-        "TotFwdPkts": "Total Fwd Packets",
-        "TotBwdPkts": "Total Backward Packets",
-    }
 
+def predict_frame(df: pd.DataFrame, clf, model_features: list, warn: bool = True) -> pd.DataFrame:
     df.rename(columns=COLUMN_MAPPING, inplace=True)
 
     # -------------------------------------------------
@@ -76,8 +55,8 @@ def main():
     for col in missing:
         df[col] = 0
 
-    if missing:
-        logging.warning(f"Missing columns added with 0: {missing}")
+    if missing and warn:
+        log.warning(f"Missing columns added with 0: {missing}")
 
     # -------------------------------------------------
     # Drop Extra Columns + Preserve Order
@@ -100,10 +79,85 @@ def main():
     lambda p: "Malicious" if p >= THRESHOLD else "Benign"
     )
 
-    df.to_csv(OUT, index=False)
+    return df
+
+# -------------------------------------------------
+# Main Prediction Logic
+# -------------------------------------------------
+def load_model(session_id: str):
+    _, MODEL, FEATURES = session_paths(session_id)
+
+    if not MODEL.exists():
+        raise FileNotFoundError(f"Model file not found: {MODEL}")
+
+    if not FEATURES.exists():
+        raise FileNotFoundError(f"Feature schema file not found: {FEATURES}")
+
+    # Warm processes (job worker, in-process pipeline) reuse the loaded model
+    log.info("Loading trained model...")
+    return registry.get(MODEL, FEATURES)
+
+
+def run(session_id: str, df: pd.DataFrame | None = None, model=None, save: bool = True) -> pd.DataFrame:
+    """
+    Score a session's preprocessed data. ``df`` skips reading the
+    preprocessed artifact, ``model`` = (clf, feature_names) skips loading
+    model.pkl, and ``save=False`` skips writing the predictions artifact.
+    """
+    store, _, _ = session_paths(session_id)
+
+    if df is None and not store.exists("preprocessed"):
+        raise FileNotFoundError(f"Preprocessed file not found: {store.path('preprocessed')}")
+
+    clf, model_features = model if model is not None else load_model(session_id)
+
+    if df is None:
+        log.info("Loading dataset...")
+        df = store.read("preprocessed")
+
+    log.info("Aligning features...")
+    df = predict_frame(df, clf, model_features)
+
+    if save:
+        out = store.write("predictions", df)
+        log.info(f"Prediction output written → {out}")
+
+    return df
+
+
+def run_chunked(session_id: str, chunksize: int, model=None) -> int:
+    """Streaming variant of run(): file to file, ``chunksize`` rows at a time."""
+    store, _, _ = session_paths(session_id)
+
+    if not store.exists("preprocessed"):
+        raise FileNotFoundError(f"Preprocessed file not found: {store.path('preprocessed')}")
+
+    clf, model_features = model if model is not None else load_model(session_id)
+
+    log.info(f"Streaming dataset in chunks of {chunksize} rows...")
+    chunks = (
+        predict_frame(chunk, clf, model_features, warn=(i == 0))
+        for i, chunk in enumerate(store.iter_chunks("preprocessed", chunksize))
+    )
+    rows = store.write_chunks("predictions", chunks)
+    log.info(f"Prediction output written → {store.path('predictions')} ({rows} rows)")
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a preprocessed dataset")
+    parser.add_argument("session_id")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream the file in chunks of N rows")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[PREDICT] %(message)s")
 
-    logging.info(f"Prediction output written → {OUT}")
+    if args.chunksize:
+        run_chunked(args.session_id, args.chunksize)
+    else:
+        run(args.session_id)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,61 +1,113 @@
 # scripts/preprocess.py
 
+import argparse
+import logging
 import sys
 import pandas as pd
 from pathlib import Path
 
-# -----------------------------
-# Get session ID
-# -----------------------------
-if len(sys.argv) < 2:
-    raise Exception("Session ID not provided")
+try:
+    from scripts.artifacts import ArtifactStore
+    from scripts.chunked_csv import read_csv_chunks, read_csv_whole
+except ImportError:  # run as python scripts/preprocess.py
+    from artifacts import ArtifactStore
+    from chunked_csv import read_csv_chunks, read_csv_whole
 
-session_id = sys.argv[1]
+log = logging.getLogger(__name__)
 
 # -----------------------------
 # Resolve project paths
 # -----------------------------
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-raw_dir = BASE_DIR / "data" / "raw" / session_id
-processed_dir = BASE_DIR / "data" / "processed" / session_id
-processed_dir.mkdir(parents=True, exist_ok=True)
 
-raw_path = raw_dir / "input.csv"
-proc_path = processed_dir / "preprocessed.csv"
+def session_paths(session_id: str):
+    raw_dir = BASE_DIR / "data" / "raw" / session_id
+    processed_dir = BASE_DIR / "data" / "processed" / session_id
+
+    return raw_dir / "input.csv", ArtifactStore(processed_dir)
+
+
+def normalize_labels(df: pd.DataFrame) -> pd.DataFrame:
+    if "Label" in df.columns:
+        df["Attack Type"] = df["Label"]
+        df = df.drop(columns=["Label"])
+    return df
+
+# -----------------------------
+# Stage Functions
+# -----------------------------
+def run(session_id: str, df: pd.DataFrame | None = None, save: bool = True) -> pd.DataFrame:
+    """
+    Preprocess a session's upload. ``df`` skips reading data/raw/<id>/input.csv;
+    ``save=False`` skips writing the preprocessed artifact.
+    """
+    raw_path, store = session_paths(session_id)
+
+    if df is None:
+        # Fail fast if input missing
+        if not raw_path.exists():
+            raise FileNotFoundError(f"{raw_path} not found. Upload dataset first.")
+
+        log.info("Loading raw dataset...")
+        # Parsed as run_chunked() parses it, so both write the same artifact
+        df = read_csv_whole(raw_path)
+    log.info(f"Loaded dataset with shape: {df.shape}")
+
+    # Minimal preprocessing logic
+    if "Label" in df.columns:
+        df = normalize_labels(df)
+        log.info("Normalized Label to Attack Type")
+
+    # Save processed file
+    if save:
+        store.write("preprocessed", df)
+    log.info("Preprocessing complete.")
+
+    return df
+
+
+def run_chunked(session_id: str, chunksize: int) -> int:
+    """Streaming variant of run(): file to file, ``chunksize`` rows at a time."""
+    raw_path, store = session_paths(session_id)
+
+    if not raw_path.exists():
+        raise FileNotFoundError(f"{raw_path} not found. Upload dataset first.")
+
+    log.info(f"Streaming raw dataset in chunks of {chunksize} rows...")
+    chunks = (normalize_labels(chunk) for chunk in read_csv_chunks(raw_path, chunksize))
+    rows = store.write_chunks("preprocessed", chunks)
+    log.info(f"Processed {rows} rows.")
+    log.info("Preprocessing complete.")
+
+    return rows
 
 # -----------------------------
 # Main Logic
 # -----------------------------
 def main():
-    # Fail fast if input missing
-    if not raw_path.exists():
-        print(f"ERROR: {raw_path} not found. Upload dataset first.")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Preprocess an uploaded dataset")
+    parser.add_argument("session_id")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream the file in chunks of N rows")
+    args = parser.parse_args()
 
-    try:
-        print("Loading raw dataset...")
-        df = pd.read_csv(raw_path)
-        print(f"Loaded dataset with shape: {df.shape}")
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
 
-        # Minimal preprocessing logic
-        if "Label" in df.columns:
-            df["Attack Type"] = df["Label"]
-            df = df.drop(columns=["Label"])
-            print("Normalized Label to Attack Type")
+    try:
+        if args.chunksize:
+            run_chunked(args.session_id, args.chunksize)
+        else:
+            run(args.session_id)
 
-        # Save processed file
-        df.to_csv(proc_path, index=False)
-        print("Preprocessing complete.")
+    except FileNotFoundError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
 
     except Exception as e:
         print("ERROR during preprocessing:")
         print(e)
         sys.exit(1)
 
-    df.replace([float("inf"), float("-inf")], 0, inplace=True)
-    df.fillna(0, inplace=True)
-
 
 if __name__ == "__main__":
     main()
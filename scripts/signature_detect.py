@@ -3,38 +3,37 @@ Hybrid Signature + ML Detection Engine
 Session-aware & Render-safe version
 """
 
-import sys
+import argparse
 from pathlib import Path
 import logging
 import re
-from typing import List
+from collections import defaultdict, deque
+from typing import List, NamedTuple
+import numpy as np
 import pandas as pd
 
-# --------------------------------------------------
-# Get Session ID
-# --------------------------------------------------
-if len(sys.argv) < 2:
-    raise Exception("Session ID not provided")
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
 
-session_id = sys.argv[1]
+try:
+    from scripts.artifacts import ArtifactStore
+except ImportError:  # run as python scripts/signature_detect.py
+    from artifacts import ArtifactStore
 
 # --------------------------------------------------
 # Logging
 # --------------------------------------------------
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 log = logging.getLogger(__name__)
 
 # --------------------------------------------------
-# Paths (SESSION BASED)
+# Paths
 # --------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 data_dir = BASE_DIR / "data"
-processed_dir = data_dir / "processed" / session_id
-processed_dir.mkdir(parents=True, exist_ok=True)
-
-PRED_PATH = processed_dir / "predictions.csv"
-OUT_PATH = processed_dir / "hybrid_output.csv"
 SIGNATURES_PATH = data_dir / "signatures.txt"
 
 # --------------------------------------------------
@@ -83,41 +82,358 @@ def load_signatures(sig_file: Path) -> List[str]:
     return sigs
 
 
-def match_signatures(text: str, sigs: List[str]) -> List[str]:
-    hits = []
-    if not text:
-        return hits
+# --------------------------------------------------
+# Row Text (vectorized)
+# --------------------------------------------------
+# Characters that str() of a non-null int/float can produce ("-1.5e+20", "inf").
+NUMERIC_CHARS = frozenset("0123456789.+-einf")
+
+
+def is_text_column(col: pd.Series) -> bool:
+    return not pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col)
+
+
+def row_text(df: pd.DataFrame) -> pd.Series:
+    """
+    Same text as " ".join(str(v) for v in row.values if pd.notna(v)),
+    built column by column instead of row by row.
+    """
+    parts = []
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        present = col.notna().to_numpy()
+        parts.append(np.where(present, (col.astype(str) + " ").to_numpy(dtype=object), ""))
+
+    return pd.Series(["".join(p)[:-1] for p in zip(*parts)], index=df.index, dtype=object)
+
+
+def text_column_literal(literal: str) -> bool:
+    """
+    True if ``literal`` can only ever occur inside a text column: it has no
+    space (so it cannot straddle two values) and has a character that
+    numeric columns never print.
+    """
+    return bool(literal) and " " not in literal and any(c.lower() not in NUMERIC_CHARS for c in literal)
+
+
+REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)}
+
+
+def literal_sets(items) -> List[tuple]:
+    """
+    Literal sets that every match of the parsed sequence ``items`` must
+    contain at least one member of. Literal runs give single-member sets;
+    a group of alternatives ("(?:cmd|powershell)") gives one set with a
+    literal per alternative.
+    """
+    sets, current = [], []
+
+    def flush():
+        run = "".join(current)
+        current.clear()
+        if text_column_literal(run):
+            sets.append((run,))
+
+    for op, arg in items:
+        if op is sre_constants.LITERAL and chr(arg) != " ":
+            current.append(chr(arg))
+            continue
+
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            sets.extend(literal_sets(arg[-1]))
+        elif op in REPEATS and arg[0] >= 1:
+            sets.extend(literal_sets(arg[2]))
+        elif op is sre_constants.BRANCH:
+            alternatives = []
+            for branch in arg[1]:
+                best = best_literal_set(literal_sets(branch))
+                if best is None:
+                    break
+                alternatives.extend(best)
+            else:
+                sets.append(tuple(dict.fromkeys(alternatives)))
+
+    flush()
+    return sets
+
+
+def best_literal_set(sets: List[tuple]) -> tuple | None:
+    # The set whose shortest member is longest is the most selective
+    return max(sets, key=lambda s: min(map(len, s)), default=None)
+
+
+def required_literals(pattern: str) -> tuple:
+    """
+    Lowercased text-column literals (see text_column_literal), at least
+    one of which every match of ``pattern`` must contain. Empty if the
+    pattern has no such literal.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ()
+
+    best = best_literal_set(literal_sets(parsed))
+    return tuple(dict.fromkeys(lit.lower() for lit in best)) if best else ()
 
-    for s in sigs:
+# --------------------------------------------------
+# Signature Matcher
+# --------------------------------------------------
+class AhoCorasick:
+    """
+    Multi-literal scanner: one pass over the text reports every literal it
+    contains, however many literals the automaton holds.
+    """
+
+    def __init__(self, words: List[str]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[tuple] = [()]
+
+        for word_id, word in enumerate(words):
+            state = 0
+            for ch in word:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += (word_id,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> set:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        found = set()
+
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+
+        return found
+
+
+class Signature(NamedTuple):
+    source: str                  # line from signatures.txt, reported in signature_hits
+    regex: re.Pattern | None     # None: not a valid regex, matched as plain text
+    literals: tuple              # every match contains one of these (lowercased)
+
+
+# Backreferences and named groups would break once patterns are merged
+# into one alternation, so such signatures are matched on their own.
+UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(")
+
+
+class SignatureMatcher:
+    """
+    Signatures validated and compiled once.
+
+    Signatures with required literals are indexed in an Aho–Corasick
+    automaton, so text only reaches their regex when it contains one of
+    their literals. The others are merged into one alternation with a named group
+    per signature, which rejects most text in a single search.
+    """
+
+    def __init__(self, sigs: List[str]):
+        self.signatures: List[Signature] = []
+
+        for source in dict.fromkeys(sigs):
+            try:
+                regex = re.compile(source, flags=re.I)
+                literals = required_literals(source)
+            except re.error as e:
+                log.warning("Signature %r is not a valid regex (%s); matching as plain text", source, e)
+                regex = None
+                literals = (source.lower(),) if text_column_literal(source) else ()
+            self.signatures.append(Signature(source, regex, literals))
+
+        literal_ids: dict = {}
+        self.by_literal: List[List[int]] = []
+        for i, sig in enumerate(self.signatures):
+            for lit in sig.literals:
+                if lit not in literal_ids:
+                    literal_ids[lit] = len(self.by_literal)
+                    self.by_literal.append([])
+                self.by_literal[literal_ids[lit]].append(i)
+        self.automaton = AhoCorasick(list(literal_ids))
+
+        # Signatures without a literal: merged behind one gate where possible
+        self.gated: List[int] = []
+        self.isolated: List[int] = []
+        branches = []
+        for i, sig in enumerate(self.signatures):
+            if sig.literals:
+                continue
+            branch = f"(?P<s{i}>{sig.source})"
+            if sig.regex is not None and not UNMERGEABLE.search(sig.source) and self._compiles(branch):
+                self.gated.append(i)
+                branches.append(branch)
+            else:
+                self.isolated.append(i)
+
+        self.gate = re.compile("|".join(branches), flags=re.I) if branches else None
+
+        log.info(
+            "Signature matcher: %d literal-indexed, %d gated, %d isolated",
+            len(self.signatures) - len(self.gated) - len(self.isolated),
+            len(self.gated),
+            len(self.isolated),
+        )
+
+    @staticmethod
+    def _compiles(pattern: str) -> bool:
         try:
-            if re.search(s, text, flags=re.I):
-                hits.append(s)
+            re.compile(pattern, flags=re.I)
         except re.error:
-            if s.lower() in text.lower():
-                hits.append(s)
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def literal_candidates(self, lowered: str) -> set:
+        """Indexes of literal signatures whose literal occurs in ``lowered``."""
+        candidates = set()
+        for literal_id in self.automaton.find(lowered):
+            candidates.update(self.by_literal[literal_id])
+        return candidates
+
+    def confirm(self, i: int, text: str) -> bool:
+        sig = self.signatures[i]
+        if sig.regex is None:
+            return sig.source.lower() in text.lower()
+        return sig.regex.search(text) is not None
+
+    def match(self, text: str) -> List[str]:
+        """Signatures matching ``text``, in file order."""
+        if not text:
+            return []
+
+        candidates = self.literal_candidates(text.lower())
+        candidates.update(self.isolated)
+        if self.gate is not None and self.gate.search(text):
+            candidates.update(self.gated)
+
+        return [self.signatures[i].source for i in sorted(candidates) if self.confirm(i, text)]
+
+
+_MATCHERS: dict = {}
+
+
+def load_matcher(sig_file: Path) -> SignatureMatcher:
+    """SignatureMatcher for ``sig_file``, rebuilt only when the file changes."""
+    stat = sig_file.stat() if sig_file.exists() else None
+    version = (stat.st_mtime_ns, stat.st_size) if stat else None
+
+    cached = _MATCHERS.get(sig_file)
+    if cached is None or cached[0] != version:
+        cached = (version, SignatureMatcher(load_signatures(sig_file)))
+        _MATCHERS[sig_file] = cached
+
+    return cached[1]
+
+
+def search_rows(texts: pd.Series, regex: re.Pattern) -> np.ndarray:
+    # Series.str.contains warns about capture groups, which signatures may have
+    return np.fromiter((regex.search(t) is not None for t in texts), dtype=bool, count=len(texts))
+
+
+def signature_masks(df: pd.DataFrame, matcher: SignatureMatcher) -> List[tuple[str, np.ndarray]]:
+    """
+    SignatureMatcher.match() over every row's text, vectorized.
+
+    The literal prefilter runs once per distinct combination of text-column
+    values; the full row text (which needs every float formatted) is only
+    built for rows that can still match.
+    """
+    if not len(matcher):
+        return []
+
+    n_rows = len(df)
+    text_cols = [c for c in df.columns if is_text_column(df[c])]
+    text_only = row_text(df[text_cols]) if text_cols else pd.Series("", index=df.index)
+    codes, uniques = pd.factorize(text_only)
+
+    literal_codes = defaultdict(list)
+    for code, text in enumerate(uniques):
+        for i in matcher.literal_candidates(text.lower()):
+            literal_codes[i].append(code)
+
+    candidates = {i: np.isin(codes, c) for i, c in literal_codes.items()}
+    every_row = np.ones(n_rows, dtype=bool)
+    for i in matcher.isolated + matcher.gated:
+        candidates[i] = every_row
+
+    if not candidates:
+        return []
+
+    rows = np.flatnonzero(np.logical_or.reduce(list(candidates.values())))
+    full_text = row_text(df.iloc[rows])
+    non_empty = (full_text != "").to_numpy()
+
+    if matcher.gated:
+        gate_open = search_rows(full_text, matcher.gate)
+        gated_rows = np.zeros(n_rows, dtype=bool)
+        gated_rows[rows[gate_open]] = True
+        for i in matcher.gated:
+            candidates[i] = gated_rows
+
+    masks = []
+    for i in sorted(candidates):
+        subset = candidates[i][rows] & non_empty
+        if not subset.any():
+            continue
+
+        sig = matcher.signatures[i]
+        texts = full_text[subset]
+        if sig.regex is None:
+            found = texts.str.lower().str.contains(sig.source.lower(), regex=False).to_numpy(dtype=bool)
+        else:
+            found = search_rows(texts, sig.regex)
 
-    return list(dict.fromkeys(hits))
+        hit = np.zeros(n_rows, dtype=bool)
+        hit[rows[subset]] = found
+        if hit.any():
+            masks.append((sig.source, hit))
+
+    return masks
 
 # --------------------------------------------------
 # Built-in Heuristic Rules
 # --------------------------------------------------
-def builtin_rules(row: pd.Series) -> List[str]:
-    hits = []
+SUSPICIOUS_PORTS = [23, 2323, 4444, 5555, 3389, 8080]
+HIGH_FWD_PACKETS = 10000
 
-    suspicious_ports = {23, 2323, 4444, 5555, 3389, 8080}
-    try:
-        if int(row.get("Destination Port", -1)) in suspicious_ports:
-            hits.append("suspicious_port")
-    except Exception:
-        pass
 
-    try:
-        if float(row.get("Total Fwd Packets", 0)) > 10000:
-            hits.append("high_fwd_packets")
-    except Exception:
-        pass
+def builtin_rule_masks(df: pd.DataFrame) -> List[tuple[str, np.ndarray]]:
+    masks = []
 
-    return hits
+    if "Destination Port" in df.columns:
+        port = pd.to_numeric(df["Destination Port"], errors="coerce").to_numpy(dtype=float)
+        masks.append(("suspicious_port", np.isin(np.trunc(port), SUSPICIOUS_PORTS)))
+
+    if "Total Fwd Packets" in df.columns:
+        fwd = pd.to_numeric(df["Total Fwd Packets"], errors="coerce").to_numpy(dtype=float)
+        masks.append(("high_fwd_packets", fwd > HIGH_FWD_PACKETS))
+
+    return masks
 
 # --------------------------------------------------
 # Probability Column Detection
@@ -131,8 +447,29 @@ def find_probability_column(df: pd.DataFrame) -> str | None:
 # --------------------------------------------------
 # Hybrid Detection Engine
 # --------------------------------------------------
-def hybrid_detection(df: pd.DataFrame, sigs: List[str]) -> pd.DataFrame:
-    df = df.copy()
+def join_hits(masks: List[tuple[str, np.ndarray]], n_rows: int) -> np.ndarray:
+    """Comma-joined rule names per row, in rule order, without duplicates."""
+    merged: dict[str, np.ndarray] = {}
+    for name, mask in masks:
+        merged[name] = merged[name] | mask if name in merged else mask
+
+    hits = np.full(n_rows, "", dtype=object)
+    if not merged:
+        return hits
+
+    names = np.array(list(merged), dtype=object)
+    matrix = np.column_stack(list(merged.values()))
+    for i in np.flatnonzero(matrix.any(axis=1)):
+        hits[i] = ",".join(names[matrix[i]])
+
+    return hits
+
+
+def hybrid_detection(df: pd.DataFrame, sigs: SignatureMatcher | List[str], copy: bool = True) -> pd.DataFrame:
+    if copy:
+        df = df.copy()
+
+    matcher = sigs if isinstance(sigs, SignatureMatcher) else SignatureMatcher(sigs)
 
     prob_col = find_probability_column(df)
     if prob_col:
@@ -150,57 +487,38 @@ def hybrid_detection(df: pd.DataFrame, sigs: List[str]) -> pd.DataFrame:
     if not label_col:
         raise RuntimeError("No ML label column found in prediction output.")
 
-    signature_hits_all = []
-    signature_flags = []
-    signature_severity = []
-    risk_scores = []
-    final_decisions = []
-    hybrid_reasons = []
-
-    for _, row in df.iterrows():
-        hits = []
-
-        hits.extend(builtin_rules(row))
+    masks = builtin_rule_masks(df) + signature_masks(df, matcher)
+    hits = join_hits(masks, len(df))
+    sig_flag = hits != ""
 
-        text_blob = " ".join(str(v) for v in row.values if pd.notna(v))
-        hits.extend(match_signatures(text_blob, sigs))
+    ml_prob = df["ml_probability"].to_numpy(dtype=float, na_value=np.nan)
+    ml_label = df[label_col].astype(str).str.strip()
 
-        hits = list(dict.fromkeys(hits))
-        sig_flag = len(hits) > 0
+    sev = ml_label.map(SEVERITY_MAP).fillna(0.2).to_numpy(dtype=float)
 
-        ml_prob = row.get("ml_probability")
-        ml_label = str(row.get(label_col)).strip()
+    risk = np.where(np.isnan(ml_prob), 0, ML_WEIGHT * ml_prob) + SIG_WEIGHT * sev
 
-        sev = severity_score(ml_label)
-
-        risk = (
-            (ML_WEIGHT * ml_prob if pd.notna(ml_prob) else 0)
-            + (SIG_WEIGHT * sev)
-        )
+    high_confidence = ml_prob >= PROB_THRESHOLD
+    ml_decision = np.where(
+        ml_label.str.lower().isin(["benign", "normal", "0"]).to_numpy(),
+        "Benign",
+        ml_label.to_numpy(dtype=object),
+    )
 
-        if sig_flag:
-            final = "Malicious"
-            reason = "signature_match"
-        elif pd.notna(ml_prob) and ml_prob >= PROB_THRESHOLD:
-            final = "Malicious"
-            reason = "ml_high_confidence"
-        else:
-            final = "Benign" if ml_label.lower() in ("benign", "normal", "0") else ml_label
-            reason = "ml_decision"
-
-        signature_hits_all.append(",".join(hits))
-        signature_flags.append(sig_flag)
-        signature_severity.append(sev)
-        risk_scores.append(round(risk, 3))
-        final_decisions.append(final)
-        hybrid_reasons.append(reason)
-
-    df["signature_hits"] = signature_hits_all
-    df["signature_flag"] = signature_flags
-    df["signature_severity"] = signature_severity
-    df["final_risk_score"] = risk_scores
-    df["hybrid_reason"] = hybrid_reasons
-    df["Final Decision"] = final_decisions
+    df["signature_hits"] = hits
+    df["signature_flag"] = sig_flag
+    df["signature_severity"] = sev
+    df["final_risk_score"] = np.round(risk, 3)
+    df["hybrid_reason"] = np.select(
+        [sig_flag, high_confidence],
+        ["signature_match", "ml_high_confidence"],
+        default="ml_decision",
+    ).astype(object)
+    df["Final Decision"] = np.select(
+        [sig_flag, high_confidence],
+        ["Malicious", "Malicious"],
+        default=ml_decision,
+    )
     # Ensure dashboard-compatible label
     df["pred_label"] = df["Final Decision"]
 
@@ -209,21 +527,70 @@ def hybrid_detection(df: pd.DataFrame, sigs: List[str]) -> pd.DataFrame:
 # --------------------------------------------------
 # Main
 # --------------------------------------------------
-def main():
-    if not PRED_PATH.exists():
-        log.error(f"Prediction file missing: {PRED_PATH}")
-        return
+def session_paths(session_id: str):
+    return ArtifactStore(data_dir / "processed" / session_id)
+
+
+def run(session_id: str, df: pd.DataFrame | None = None, save: bool = True) -> pd.DataFrame:
+    """
+    Hybrid detection for a session. ``df`` skips reading the predictions
+    artifact (and is modified in place); ``save=False`` skips writing
+    hybrid_output.
+    """
+    store = session_paths(session_id)
+
+    if df is None:
+        if not store.exists("predictions"):
+            raise FileNotFoundError(f"Prediction file missing: {store.path('predictions')}")
+
+        log.info("Loading prediction file: %s", store.locate("predictions"))
+        df = store.read("predictions")
+
+    matcher = load_matcher(SIGNATURES_PATH)
+    hybrid_df = hybrid_detection(df, matcher, copy=False)
+
+    if save:
+        out_path = store.write("hybrid_output", hybrid_df)
+        log.info("Hybrid detection completed → %s", out_path)
+
+    return hybrid_df
+
 
-    log.info("Loading prediction file: %s", PRED_PATH)
-    df = pd.read_csv(PRED_PATH, low_memory=False)
+def run_chunked(session_id: str, chunksize: int) -> int:
+    """Streaming variant of run(): file to file, ``chunksize`` rows at a time."""
+    store = session_paths(session_id)
 
-    sigs = load_signatures(SIGNATURES_PATH)
-    hybrid_df = hybrid_detection(df, sigs)
+    if not store.exists("predictions"):
+        raise FileNotFoundError(f"Prediction file missing: {store.path('predictions')}")
 
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    hybrid_df.to_csv(OUT_PATH, index=False)
+    matcher = load_matcher(SIGNATURES_PATH)
 
-    log.info("Hybrid detection completed → %s", OUT_PATH)
+    log.info("Streaming prediction file in chunks of %d rows: %s", chunksize, store.locate("predictions"))
+    chunks = (
+        hybrid_detection(chunk, matcher, copy=False)
+        for chunk in store.iter_chunks("predictions", chunksize)
+    )
+    rows = store.write_chunks("hybrid_output", chunks)
+    log.info("Hybrid detection completed → %s (%d rows)", store.path("hybrid_output"), rows)
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid signature + ML detection")
+    parser.add_argument("session_id")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream the file in chunks of N rows")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
+
+    try:
+        if args.chunksize:
+            run_chunked(args.session_id, args.chunksize)
+        else:
+            run(args.session_id)
+    except FileNotFoundError as e:
+        log.error(str(e))
 
 
 if __name__ == "__main__":
@@ -1,133 +1,367 @@
 # scripts/train_model.py
 
-import sys
+import argparse
+import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import joblib
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report
-from sklearn.model_selection import train_test_split
+from sklearn.metrics import classification_report, f1_score
+from sklearn.utils.class_weight import compute_class_weight
 import logging
-from collections import Counter
 
-# -------------------------------------------------
-# Logging Configuration
-# -------------------------------------------------
-logging.basicConfig(level=logging.INFO, format="[TRAIN] %(message)s")
-
-# -------------------------------------------------
-# Get Session ID from Django
-# -------------------------------------------------
-if len(sys.argv) < 2:
-    raise Exception("Session ID not provided")
+try:
+    from scripts.artifacts import ArtifactStore
+    from scripts.compiled_forest import compile_forest, compiled_path, save_compiled
+    from scripts.incremental import (
+        REPLAY_RATIO,
+        Ledger,
+        increment_trees,
+        ledger_paths,
+        load_holdout,
+        replay_rows,
+        save_holdout,
+        split_increment,
+    )
+    from scripts.model_registry import registry
+    from scripts.out_of_core import TRAIN_WORKERS, chunk_ensemble, fits_in_memory, reservoir_sample
+    from scripts.training_data import frame_matrix, label_column, load_training_matrix
+    from scripts.tuning import load_tuned_params, save_report, search
+except ImportError:  # run as python scripts/train_model.py
+    from artifacts import ArtifactStore
+    from compiled_forest import compile_forest, compiled_path, save_compiled
+    from incremental import (
+        REPLAY_RATIO,
+        Ledger,
+        increment_trees,
+        ledger_paths,
+        load_holdout,
+        replay_rows,
+        save_holdout,
+        split_increment,
+    )
+    from model_registry import registry
+    from out_of_core import TRAIN_WORKERS, chunk_ensemble, fits_in_memory, reservoir_sample
+    from training_data import frame_matrix, label_column, load_training_matrix
+    from tuning import load_tuned_params, save_report, search
 
-session_id = sys.argv[1]
+log = logging.getLogger(__name__)
 
 # -------------------------------------------------
 # Resolve project paths safely
 # -------------------------------------------------
 BASE_DIR = Path(__file__).resolve().parent.parent
-processed_dir = BASE_DIR / "data" / "processed" / session_id
-processed_dir.mkdir(parents=True, exist_ok=True)
 
-DATA = processed_dir / "preprocessed.csv"
-MODEL = processed_dir / "model.pkl"
-FEATURES = processed_dir / "model_features.pkl"
+
+def session_paths(session_id: str):
+    processed_dir = BASE_DIR / "data" / "processed" / session_id
+    store = ArtifactStore(processed_dir)
+
+    return (
+        store,
+        processed_dir / "model.pkl",
+        processed_dir / "model_features.pkl",
+    )
 
 # -------------------------------------------------
-# Main Training Logic
+# Model Configuration
 # -------------------------------------------------
-def main():
+N_ESTIMATORS = 120
+# Incremental runs grow the forest up to this many times its full-fit
+# tree count, then refit
+MAX_TREES_FACTOR = 2
 
-    if not DATA.exists():
-        raise FileNotFoundError(f"{DATA} not found. Run preprocess first.")
+# auto: train only the rows appended since the last run when the saved
+# model's ledger allows it; full: always refit on every row
+TRAIN_MODE = os.environ.get("TRAIN_MODE", "auto")
 
-    df = pd.read_csv(DATA)
-    logging.info(f"Dataset loaded: {df.shape[0]} rows, {df.shape[1]} columns")
+
+def build_classifier(params: dict | None = None):
+    """The session forest; ``params`` (a --tune search's choice) override the defaults."""
+    # Every tree leaves about a third of the rows out of its bootstrap
+    # sample; scoring rows with only those trees evaluates the forest
+    # without holding a test split back from training
+    clf = RandomForestClassifier(
+        n_estimators=N_ESTIMATORS,
+        max_depth=15,
+        class_weight="balanced",
+        oob_score=True,
+        random_state=42,
+        n_jobs=-1
+    )
+    return clf.set_params(**params) if params else clf
+
+
+def fit_full(X, y, features, params: dict | None = None):
+    """(clf, ledger) fitted on every row, with the out-of-bag F1 as baseline."""
+    clf = build_classifier(params)
+
+    log.info("Training model...")
+    # A single-dtype frame wraps X without copying; it records
+    # feature_names_in_ so predict.py's frames are checked against it
+    clf.fit(pd.DataFrame(X, columns=features, copy=False), y)
+
+    ledger = Ledger(features)
+    ledger.add_slice(X, y, 0, len(y), clf.n_estimators, "full")
 
     # -------------------------------------------------
-    # Determine label column safely
+    # Evaluate Model (out-of-bag)
     # -------------------------------------------------
-    if "Attack Type" in df.columns:
-        label_col = "Attack Type"
-    elif "Label" in df.columns:
-        label_col = "Label"
+    oob = clf.oob_decision_function_
+    scored = ~np.isnan(oob).any(axis=1)
+    # One probability pair per training row: not worth saving with the model
+    del clf.oob_decision_function_
+
+    if scored.any():
+        preds = clf.classes_[oob[scored].argmax(axis=1)]
+        report = classification_report(y[scored], preds)
+        log.info(f"Out-of-bag evaluation ({scored.sum()} of {len(y)} rows):\n" + report)
+
+        ledger.baseline = f1_score(y[scored], preds, average="macro")
+        ledger.record_quality(ledger.baseline, int(scored.sum()), "oob")
     else:
-        logging.warning("No label column found. Skipping training.")
-        print("No label column found. This dataset is for prediction only.")
-        return
+        log.warning("No row was left out of any bootstrap sample; skipping evaluation")
+
+    return clf, ledger
+
+
+def fit_increment(clf, ledger, X, y, features, holdout, base_trees: int = N_ESTIMATORS):
+    """
+    Grow ``clf`` (fully fitted with ``base_trees`` trees) with trees
+    fitted on the rows after ledger.rows_seen.
+    Returns the held-back rows, or None (clf untouched) when the new
+    rows cannot be trained on their own.
+    """
+    start, end = ledger.rows_seen, len(y)
+    seed = len(ledger.slices)
 
-    X = df.drop(columns=[label_col])
-    # Convert to binary classification
-    y = df[label_col].apply(
-        lambda x: 0 if str(x).upper() == "BENIGN" else 1
+    train_rows, held_rows = split_increment(start, end, seed)
+    replay = replay_rows(start, holdout, int(len(train_rows) * REPLAY_RATIO), seed)
+    rows = np.concatenate([replay, train_rows])
+
+    # New trees must vote over the same classes as the existing ones
+    if not np.array_equal(np.unique(y[rows]), clf.classes_):
+        log.info("Full retrain: the new rows and replay sample do not cover every class")
+        return None
+
+    trees = increment_trees(base_trees, end - start, end)
+    log.info(
+        f"Incremental training: {end - start} new rows ({len(train_rows)} trained, "
+        f"{len(held_rows)} held back, {len(replay)} replayed) → {trees} new trees"
     )
 
-    # -------------------------------------------------
-    # Log class distribution
-    # -------------------------------------------------
-    logging.info("Class distribution:")
-    logging.info(y.value_counts().to_string())
+    # The "balanced" presets would weigh classes by this increment alone:
+    # weigh them by every row seen
+    class_weight = clf.class_weight
+    if class_weight in ("balanced", "balanced_subsample"):
+        weights = compute_class_weight("balanced", classes=clf.classes_, y=y)
+        clf.set_params(class_weight=dict(zip(clf.classes_, weights)))
+
+    clf.set_params(warm_start=True, oob_score=False, n_estimators=len(clf.estimators_) + trees)
+    clf.fit(pd.DataFrame(X[rows], columns=features), y[rows])
+    clf.set_params(warm_start=False, class_weight=class_weight)
 
-    class_counts = Counter(y)
+    # The old out-of-bag score described the forest before these trees
+    if hasattr(clf, "oob_score_"):
+        del clf.oob_score_
+
+    ledger.add_slice(X, y, start, end, trees, "incremental")
+    return held_rows
+
+
+def evaluate_holdout(clf, ledger, X, y, features, holdout):
+    preds = clf.predict(pd.DataFrame(X[holdout], columns=features))
+    report = classification_report(y[holdout], preds)
+    log.info(f"Holdout evaluation ({len(holdout)} held-back rows):\n" + report)
+
+    ledger.record_quality(f1_score(y[holdout], preds, average="macro"), len(holdout), "holdout")
+
+
+# -------------------------------------------------
+# Main Training Logic
+# -------------------------------------------------
+def run(session_id: str, df: pd.DataFrame | None = None, save: bool = True, mode: str | None = None):
+    """
+    Train the session model. ``df`` skips reading the preprocessed artifact;
+    ``save=False`` skips writing model.pkl / model_features.pkl.
+    ``mode`` overrides TRAIN_MODE ("auto" or "full"); incremental
+    training needs a saved model, so it only applies when saving.
+    The forest is configured by the session's last --tune search, if any.
+
+    Returns (clf, feature_names), or None when the dataset has no label
+    column (prediction-only upload).
+    """
+    store, MODEL, FEATURES = session_paths(session_id)
+    LEDGER, HOLDOUT = ledger_paths(MODEL)
+    mode = mode or TRAIN_MODE
+    params = load_tuned_params(MODEL)
+    base_trees = params.get("n_estimators", N_ESTIMATORS)
+
+    # Larger than TRAIN_MEMORY_MB as a matrix: streamed instead
+    if df is None and store.exists("preprocessed") and not fits_in_memory(store):
+        return run_out_of_core(session_id, save, params)
 
     # -------------------------------------------------
-    # Use stratification only if valid
+    # Load the training matrix (cached per artifact digest)
     # -------------------------------------------------
-    if min(class_counts.values()) >= 2:
-        stratify_y = y
-        logging.info("Using stratified train-test split")
+    if df is None:
+        matrix = load_training_matrix(store)
     else:
-        stratify_y = None
-        logging.warning(
-            "Not using stratification (some classes have < 2 samples)"
-        )
+        log.info(f"Dataset loaded: {df.shape[0]} rows, {df.shape[1]} columns")
+        label_col = label_column(df.columns)
+        matrix = frame_matrix(df, label_col) if label_col else None
 
-    # -------------------------------------------------
-    # Train/Test Split
-    # -------------------------------------------------
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=0.25,
-        random_state=42,
-        stratify=stratify_y
-    )
+    if matrix is None:
+        log.warning("No label column found. Skipping training.")
+        return None
 
-    # -------------------------------------------------
-    # Model Configuration
-    # -------------------------------------------------
-    clf = RandomForestClassifier(
-        n_estimators=120,
-        max_depth=15,
-        class_weight="balanced",
-        random_state=42,
-        n_jobs=-1
-    )
+    # X: float32, y: 0 = BENIGN, 1 = attack
+    X, y, features = matrix
 
     # -------------------------------------------------
-    # Train Model
+    # Log class distribution
     # -------------------------------------------------
-    logging.info("Training model...")
-    clf.fit(X_train, y_train)
+    log.info("Class distribution:")
+    for label, count in enumerate(np.bincount(y, minlength=2)):
+        if count:
+            log.info(f"{label}    {count}")
 
     # -------------------------------------------------
-    # Evaluate Model
+    # Incremental training (appended rows only)
     # -------------------------------------------------
-    preds = clf.predict(X_test)
-    report = classification_report(y_test, preds)
+    clf = ledger = None
+    holdout = np.empty(0, dtype=np.int64)
 
-    logging.info("Evaluation Metrics:\n" + report)
+    if save and mode == "auto" and MODEL.exists():
+        ledger = Ledger.load(LEDGER)
+        reason = "the saved model has no training ledger" if ledger is None else \
+            ledger.increment_blocker(X, y, features, MAX_TREES_FACTOR * base_trees)
 
-    # -------------------------------------------------
-    # Save Model + Feature Schema
-    # -------------------------------------------------
+        if reason is None and ledger.rows_seen == len(y):
+            log.info("The saved model was trained on exactly this dataset; nothing to train.")
+            return registry.get(MODEL, FEATURES)
+
+        if reason is None:
+            clf = joblib.load(MODEL)
+            if len(clf.estimators_) != ledger.trees:
+                reason = "the saved model does not match its training ledger"
+                clf = None
+
+        if reason is None:
+            holdout = load_holdout(HOLDOUT)
+            held_rows = fit_increment(clf, ledger, X, y, features, holdout, base_trees)
+            if held_rows is None:
+                clf = None
+            else:
+                holdout = np.concatenate([holdout, held_rows])
+                if len(holdout):
+                    evaluate_holdout(clf, ledger, X, y, features, holdout)
+        else:
+            log.info(f"Full retrain: {reason}")
+
+    if clf is None:
+        clf, ledger = fit_full(X, y, features, params)
+        holdout = np.empty(0, dtype=np.int64)
+
+    if save:
+        save_model(session_id, clf, features, ledger, holdout)
+
+    return clf, features
+
+
+def run_out_of_core(session_id: str, save: bool = True, params: dict | None = None):
+    """run() for a preprocessed artifact too large to train on in memory."""
+    store, _, _ = session_paths(session_id)
+
+    if TRAIN_WORKERS:
+        trained = chunk_ensemble(store, build_classifier(params).get_params(), TRAIN_WORKERS)
+    else:
+        trained = sample = reservoir_sample(store)
+        if sample is not None:
+            X, y, features = sample
+            # The sample's ledger cannot vouch for the dataset: not kept
+            clf, _ = fit_full(X, y, features, params)
+            trained = clf, features
+
+    if trained is None:
+        log.warning("No label column found. Skipping training.")
+        return None
+
+    clf, features = trained
+    if save:
+        save_model(session_id, clf, features)
+
+    return clf, features
+
+
+def tune(session_id: str):
+    """
+    Search the forest settings (scripts/tuning.py), save the report the
+    session's training reads its settings from, and refit the model on
+    every row with the chosen ones. Returns run()'s result.
+    """
+    store, MODEL, _ = session_paths(session_id)
+
+    report = search(store, build_classifier().get_params())
+    if report is None:
+        log.warning("No label column found. Skipping tuning.")
+        return None
+
+    save_report(MODEL, report)
+    return run(session_id, mode="full")
+
+
+# -------------------------------------------------
+# Save Model + Feature Schema
+# -------------------------------------------------
+def save_model(session_id: str, clf, features, ledger=None, holdout=None):
+    """
+    Write the model files. Without a ledger (out-of-core models) any old
+    ledger is removed, so the next run cannot extend this model.
+    """
+    _, MODEL, FEATURES = session_paths(session_id)
+    LEDGER, HOLDOUT = ledger_paths(MODEL)
+
+    MODEL.parent.mkdir(parents=True, exist_ok=True)
     joblib.dump(clf, MODEL)
-    joblib.dump(list(X.columns), FEATURES)
+    save_compiled(compile_forest(clf), compiled_path(MODEL))
+    joblib.dump(features, FEATURES)
+    registry.put(MODEL, FEATURES, clf, features)
+
+    log.info(f"Model saved → {MODEL} ({len(clf.estimators_)} trees)")
+    log.info(f"Compiled forest saved → {compiled_path(MODEL)}")
+    log.info(f"Feature schema saved → {FEATURES}")
+
+    if ledger is None:
+        LEDGER.unlink(missing_ok=True)
+        HOLDOUT.unlink(missing_ok=True)
+        return
+
+    save_holdout(HOLDOUT, holdout, seed=len(ledger.slices))
+    # Written last: it vouches for the model files above
+    ledger.save(LEDGER)
+    log.info(f"Training ledger saved → {LEDGER} ({ledger.rows_seen} rows seen)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the session model")
+    parser.add_argument("session_id")
+    parser.add_argument("--full", action="store_true", help="refit on every row even if only rows were appended")
+    parser.add_argument("--tune", action="store_true", help="search the forest settings first (implies --full)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[TRAIN] %(message)s")
+
+    if args.tune:
+        trained = tune(args.session_id)
+    else:
+        trained = run(args.session_id, mode="full" if args.full else None)
+
+    if trained is None:
+        print("No label column found. This dataset is for prediction only.")
+        return
 
-    logging.info(f"Model saved → {MODEL}")
-    logging.info(f"Feature schema saved → {FEATURES}")
-    
     print("Model training completed successfully.")
 
 
@@ -135,4 +369,4 @@ def main():
 # Entry Point
 # -------------------------------------------------
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,197 @@
+# scripts/training_data.py
+# --------------------------------------------------
+# Training matrix loading and caching
+#
+# The training stage needs the preprocessed artifact as a float32
+# feature matrix (what sklearn's trees convert to anyway) and a 0/1
+# attack label. Building that from CSV text is most of a retrain on an
+# unchanged upload, so the parsed matrix is cached beside the session's
+# artifacts as .npy files keyed by a digest of the artifact, and later
+# runs memory-map it instead of parsing. The digest itself is memoized
+# on the artifact's stat signature, so a warm load reads no input at all.
+# --------------------------------------------------
+
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scripts.artifacts import ArtifactStore, CsvFormat
+    from scripts.model_registry import file_digest, stat_signature
+except ImportError:  # run as python scripts/<stage>.py
+    from artifacts import ArtifactStore, CsvFormat
+    from model_registry import file_digest, stat_signature
+
+log = logging.getLogger(__name__)
+
+LABEL_COLUMNS = ("Attack Type", "Label")
+CACHE_DIR = "train_cache"
+
+
+def label_column(columns) -> str | None:
+    for name in LABEL_COLUMNS:
+        if name in columns:
+            return name
+    return None
+
+
+def encode_labels(labels: pd.Series) -> np.ndarray:
+    """
+    1 for attacks, 0 for BENIGN (case-insensitive), as int8. Each distinct
+    label is compared once, not each row.
+    """
+    labels = labels.astype("category")
+    attack = ~labels.cat.categories.astype(str).str.upper().isin(["BENIGN"])
+    codes = labels.cat.codes.to_numpy()
+
+    # NaN labels (code -1) were str(nan) = "NAN" before: an attack
+    return np.where(codes >= 0, attack[codes], True).astype(np.int8)
+
+
+def frame_matrix(df: pd.DataFrame, label_col: str):
+    """(X float32, y int8, feature names) of a labelled frame."""
+    features = [c for c in df.columns if c != label_col]
+    X = df[features].to_numpy(dtype=np.float32)
+    return X, encode_labels(df[label_col]), features
+
+
+def read_preprocessed(store: ArtifactStore) -> pd.DataFrame:
+    """
+    The preprocessed artifact with a downcast schema. CSV is parsed
+    straight into float32 / category columns; a file with non-numeric
+    feature columns falls back to pandas' own inference. Columnar formats
+    are already typed, and frame_matrix() casts them to float32 in one
+    copy, so only their label is converted here.
+    """
+    fmt, path = store.find("preprocessed") or (None, store.path("preprocessed"))
+    if fmt is None:
+        raise FileNotFoundError(f"{path} not found. Run preprocess first.")
+
+    columns = fmt.columns(path)
+    label_col = label_column(columns)
+
+    if isinstance(fmt, CsvFormat):
+        dtype = {c: np.float32 for c in columns if c != label_col}
+        if label_col:
+            dtype[label_col] = "category"
+        try:
+            return pd.read_csv(path, dtype=dtype, low_memory=False, memory_map=fmt.mmap)
+        except ValueError:
+            log.warning("Non-numeric feature columns; parsing with inferred dtypes")
+
+    df = fmt.read(path)
+    if label_col:
+        df[label_col] = df[label_col].astype("category")
+    return df
+
+# --------------------------------------------------
+# Chunked reads (out-of-core training)
+# --------------------------------------------------
+def label_counts(store: ArtifactStore, label_col: str, chunksize: int) -> pd.Series:
+    """Rows per label value, reading only the label column."""
+    counts = None
+    for chunk in store.iter_chunks("preprocessed", chunksize, columns=[label_col]):
+        chunk_counts = chunk[label_col].astype(str).value_counts()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    return counts.astype(np.int64) if counts is not None else pd.Series(dtype=np.int64)
+
+
+def iter_training_chunks(store: ArtifactStore, label_col: str, features: list, chunksize: int):
+    """
+    (X float32, label strings) per chunk of the preprocessed artifact.
+    CSV chunks are parsed straight into float32, like read_preprocessed().
+    Labels are strings as label_counts() counts them (NaN → "nan").
+    """
+    fmt, path = store.find("preprocessed") or (None, store.path("preprocessed"))
+    if fmt is None:
+        raise FileNotFoundError(f"{path} not found. Run preprocess first.")
+
+    if isinstance(fmt, CsvFormat):
+        dtype = {c: np.float32 for c in features}
+        dtype[label_col] = "category"
+        chunks = pd.read_csv(path, dtype=dtype, chunksize=chunksize, low_memory=False)
+    else:
+        chunks = fmt.iter_chunks(path, chunksize)
+
+    for chunk in chunks:
+        yield chunk[features].to_numpy(dtype=np.float32), chunk[label_col].astype(str).to_numpy()
+
+# --------------------------------------------------
+# Matrix cache
+# --------------------------------------------------
+def artifact_digest(store: ArtifactStore, path: Path) -> str:
+    """Content digest of ``path``, recomputed only when its stat signature changes."""
+    index_path = store.directory / CACHE_DIR / "index.json"
+    signature = [str(path), *stat_signature(path)]
+
+    try:
+        index = json.loads(index_path.read_text())
+    except (OSError, ValueError):
+        index = {}
+
+    if index.get("signature") == signature:
+        return index["digest"]
+
+    digest = file_digest(path)
+    index_path.parent.mkdir(exist_ok=True)
+    index_path.write_text(json.dumps({"signature": signature, "digest": digest}))
+    return digest
+
+
+def load_training_matrix(store: ArtifactStore, cache: bool = True):
+    """
+    (X, y, feature names) of the session's preprocessed artifact, or None
+    when it has no label column. X is a read-only memory map when it
+    comes from the cache.
+    """
+    found = store.find("preprocessed")
+    if found is None:
+        raise FileNotFoundError(f"{store.path('preprocessed')} not found. Run preprocess first.")
+    _, path = found
+
+    cache_dir = store.directory / CACHE_DIR
+    digest = artifact_digest(store, path) if cache else None
+
+    if digest:
+        meta_path = cache_dir / f"{digest}.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            log.info(f"Training matrix cache hit ({digest[:12]})")
+            if meta["label"] is None:
+                return None
+            X = np.load(cache_dir / f"{digest}.X.npy", mmap_mode="r")
+            y = np.load(cache_dir / f"{digest}.y.npy")
+            return X, y, meta["features"]
+
+    df = read_preprocessed(store)
+    log.info(f"Dataset loaded: {df.shape[0]} rows, {df.shape[1]} columns")
+
+    label_col = label_column(df.columns)
+    result = frame_matrix(df, label_col) if label_col else None
+    del df
+
+    if digest:
+        write_cache(cache_dir, digest, result, label_col)
+
+    return result
+
+
+def write_cache(cache_dir: Path, digest: str, result, label_col):
+    # Only the current artifact's matrix is kept
+    for old in cache_dir.glob("*.npy"):
+        old.unlink()
+    for old in cache_dir.glob("*.json"):
+        if old.name != "index.json":
+            old.unlink()
+
+    meta = {"label": label_col, "features": []}
+    if result is not None:
+        X, y, meta["features"] = result
+        np.save(cache_dir / f"{digest}.X.npy", X)
+        np.save(cache_dir / f"{digest}.y.npy", y)
+
+    # Written last: its presence marks a complete entry
+    (cache_dir / f"{digest}.json").write_text(json.dumps(meta))
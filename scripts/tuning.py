@@ -0,0 +1,368 @@
+# scripts/tuning.py
+# --------------------------------------------------
+# Hyperparameter search
+#
+# train_model's forest settings trade accuracy against what the live
+# sensor pays per flow, so `train_model.py <session> --tune` searches
+# tree count, depth, max_features and class weights instead of using
+# the fixed defaults, with successive halving: every candidate is
+# cross-validated on a small share of the rows, the best 1/TUNE_ETA go
+# on to TUNE_ETA times more rows, and so on up to every training row of
+# each fold. Trials (one candidate on one fold) run on TUNE_WORKERS
+# processes.
+#
+# Each trial records macro F1 and accuracy on the fold's validation
+# rows, per-row latency of the compiled forest on a live-sensor-sized
+# batch, and pickled model size. Candidates are promoted by Pareto rank
+# over (F1, latency, size); within a rank the most accurate, fastest and
+# smallest models go first, then the rest by crowding distance (as in
+# NSGA-II), so fast models are not dropped for being a hair less
+# accurate than the slow ones. Of the final Pareto front the fastest
+# model within F1_TOLERANCE of the best F1 is chosen.
+#
+# The report is written to model_tuning.json beside model.pkl; later
+# training of the session (full, incremental or out of core) uses its
+# "chosen" params. Replacing them with another "front" entry's params
+# picks that model on the next full retrain.
+#
+# Workers never receive the data: they memory-map the training matrix
+# cached by training_data.py (or a stratified sample of a dataset too
+# large for memory) and the fold splits, which are cached beside it as
+# row-index .npy files for the next search over the same artifact.
+# --------------------------------------------------
+
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+try:
+    from scripts.artifacts import ArtifactStore
+    from scripts.compiled_forest import compile_forest
+    from scripts.out_of_core import TRAIN_MEMORY_MB, fits_in_memory, reservoir_sample
+    from scripts.training_data import CACHE_DIR, artifact_digest, load_training_matrix
+except ImportError:  # run as python scripts/<stage>.py
+    from artifacts import ArtifactStore
+    from compiled_forest import compile_forest
+    from out_of_core import TRAIN_MEMORY_MB, fits_in_memory, reservoir_sample
+    from training_data import CACHE_DIR, artifact_digest, load_training_matrix
+
+log = logging.getLogger(__name__)
+
+SEARCH_SPACE = {
+    "n_estimators": [30, 60, 120, 240],
+    "max_depth": [10, 15, 20, None],
+    "max_features": ["sqrt", "log2", 0.5],
+    "class_weight": ["balanced", "balanced_subsample", None],
+}
+
+# Candidates drawn from SEARCH_SPACE (the whole grid if it is smaller);
+# the default configuration is always one of them
+TUNE_CANDIDATES = int(os.environ.get("TUNE_CANDIDATES", "24"))
+TUNE_WORKERS = int(os.environ.get("TUNE_WORKERS", "0")) or os.cpu_count() or 1
+TUNE_FOLDS = int(os.environ.get("TUNE_FOLDS", "3"))
+# Candidates kept per rung: 1 / TUNE_ETA, on TUNE_ETA times the rows
+TUNE_ETA = 3
+
+# Fewest training rows per fold on the first rung
+MIN_RUNG_ROWS = 2_000
+# Validation rows kept per fold
+VALID_MAX_ROWS = 50_000
+# Flows per latency measurement (a busy live-sensor tick) and repeats (best kept)
+LATENCY_BATCH = 100
+LATENCY_REPEATS = 20
+# Macro F1 the chosen model may give up for lower latency
+F1_TOLERANCE = 0.005
+
+# Objectives, as the sign that makes lower better
+OBJECTIVES = {"f1": -1, "latency_us": 1, "size_bytes": 1}
+
+
+def tuning_path(model_path: Path) -> Path:
+    return model_path.with_name("model_tuning.json")
+
+
+def load_tuned_params(model_path: Path) -> dict:
+    """The chosen params of the session's last search, or {} if it has none."""
+    try:
+        return json.loads(tuning_path(model_path).read_text())["chosen"]["params"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+# --------------------------------------------------
+# Search data (memory-mapped by the workers)
+# --------------------------------------------------
+def search_matrix(store: ArtifactStore):
+    """
+    (name, X path, y path, y, features) of the matrix to search on, or
+    None without labels. Datasets too large for memory are searched on
+    their stratified reservoir sample.
+    """
+    _, path = store.find("preprocessed") or (None, store.path("preprocessed"))
+    cache_dir = store.directory / CACHE_DIR
+
+    if fits_in_memory(store):
+        matrix = load_training_matrix(store)
+        if matrix is None:
+            return None
+        _, y, features = matrix
+        name = artifact_digest(store, path)
+    else:
+        # The sample depends on the budget it was drawn for
+        name = f"{artifact_digest(store, path)}.sample{TRAIN_MEMORY_MB}"
+        meta_path = cache_dir / f"{name}.json"
+        if meta_path.exists():
+            features = json.loads(meta_path.read_text())["features"]
+            y = np.load(cache_dir / f"{name}.y.npy")
+        else:
+            sample = reservoir_sample(store)
+            if sample is None:
+                return None
+            X, y, features = sample
+            # Samples of earlier artifacts
+            for old in cache_dir.glob("*.sample*"):
+                old.unlink()
+            np.save(cache_dir / f"{name}.X.npy", X)
+            np.save(cache_dir / f"{name}.y.npy", y)
+            meta_path.write_text(json.dumps({"features": features}))
+
+    return name, cache_dir / f"{name}.X.npy", cache_dir / f"{name}.y.npy", y, features
+
+
+def fold_files(cache_dir: Path, name: str, y: np.ndarray, folds: int, seed: int = 42):
+    """
+    [(train rows path, validation rows path)] per stratified fold,
+    cached. Training rows are ordered so every prefix keeps the class
+    proportions: rung n trains on the first rows of the same order, a
+    superset of rung n - 1's.
+    """
+    paths = [
+        (cache_dir / f"{name}.fold{i}of{folds}.train.npy", cache_dir / f"{name}.fold{i}of{folds}.valid.npy")
+        for i in range(folds)
+    ]
+    if all(train.exists() and valid.exists() for train, valid in paths):
+        log.info(f"Fold split cache hit ({folds} folds)")
+        return paths
+
+    rng = np.random.default_rng(seed)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+
+    for (train, valid), (train_path, valid_path) in zip(splitter.split(np.zeros(len(y)), y), paths):
+        train = rng.permutation(train)
+        # Each row's position within its class, as a fraction: sorting by
+        # it interleaves the classes evenly
+        position = np.empty(len(train))
+        for label in np.unique(y):
+            mask = y[train] == label
+            position[mask] = (np.arange(mask.sum()) + 0.5) / mask.sum()
+        np.save(train_path, train[np.argsort(position, kind="stable")])
+        # Sorted: memory-map reads go through the matrix in order
+        np.save(valid_path, np.sort(rng.permutation(valid)[:VALID_MAX_ROWS]))
+
+    return paths
+
+# --------------------------------------------------
+# Trials (worker processes)
+# --------------------------------------------------
+_mapped = {}
+
+
+def mapped(path: Path) -> np.ndarray:
+    """A read-only memory map of ``path``, opened once per worker."""
+    if path not in _mapped:
+        _mapped[path] = np.load(path, mmap_mode="r")
+    return _mapped[path]
+
+
+def run_trial(params: dict, X_path: Path, y_path: Path, fold: tuple, rows: int) -> dict:
+    """Worker: fit ``params`` on the first ``rows`` training rows of ``fold`` and measure it."""
+    X, y = mapped(X_path), mapped(y_path)
+    train = np.sort(mapped(fold[0])[:rows])
+    valid = mapped(fold[1])
+
+    start = time.perf_counter()
+    clf = RandomForestClassifier(**params)
+    clf.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+
+    X_valid, y_valid = X[valid], y[valid]
+    preds = clf.predict(X_valid)
+
+    # Ticks of the live sensor are scored by the compiled forest
+    compiled = compile_forest(clf)
+    batch = np.ascontiguousarray(X_valid[:LATENCY_BATCH])
+    best = math.inf
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        compiled.predict_proba(batch)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "f1": f1_score(y_valid, preds, average="macro"),
+        "accuracy": accuracy_score(y_valid, preds),
+        "latency_us": best / len(batch) * 1e6,
+        "size_bytes": len(pickle.dumps(clf, protocol=pickle.HIGHEST_PROTOCOL)),
+        "fit_seconds": fit_seconds,
+    }
+
+# --------------------------------------------------
+# Search
+# --------------------------------------------------
+def draw_candidates(default: dict, n: int, seed: int = 42) -> list:
+    """``n`` distinct settings from SEARCH_SPACE, ``default`` first."""
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    grid = [params for params in grid if params != default]
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(grid), size=min(max(n - 1, 0), len(grid)), replace=False)
+    return [default] + [grid[i] for i in sorted(picks)]
+
+
+def dominates(a: dict, b: dict) -> bool:
+    at_least = all(sign * a[key] <= sign * b[key] for key, sign in OBJECTIVES.items())
+    return at_least and any(sign * a[key] < sign * b[key] for key, sign in OBJECTIVES.items())
+
+
+def pareto_ranks(results: list) -> list:
+    """Non-dominated sorting: 0 for the Pareto front, 1 for the front without it, ..."""
+    ranks = [None] * len(results)
+    rank, left = 0, set(range(len(results)))
+    while left:
+        front = {i for i in left if not any(dominates(results[j], results[i]) for j in left if j != i)}
+        for i in front:
+            ranks[i] = rank
+        left -= front
+        rank += 1
+    return ranks
+
+
+def promotion_order(results: list) -> list:
+    """
+    Indices of ``results``, best first: by Pareto rank; within a rank the
+    most accurate, then the fastest, then the smallest member, then the
+    rest by crowding distance (the normalized gaps between their
+    neighbours on each objective, summed), largest first.
+    """
+    ranks = pareto_ranks(results)
+    ends = [len(OBJECTIVES)] * len(results)
+    distance = [0.0] * len(results)
+
+    for rank in set(ranks):
+        members = [i for i in range(len(results)) if ranks[i] == rank]
+        for objective, (key, sign) in enumerate(OBJECTIVES.items()):
+            members.sort(key=lambda i: sign * results[i][key])
+            ends[members[0]] = min(ends[members[0]], objective)
+            low, high = results[members[0]][key], results[members[-1]][key]
+            if high == low:
+                continue
+            for before, i, after in zip(members, members[1:], members[2:]):
+                distance[i] += abs(results[after][key] - results[before][key]) / (high - low)
+
+    return sorted(range(len(results)), key=lambda i: (ranks[i], ends[i], -distance[i]))
+
+
+def choose(front: list) -> dict:
+    """The fastest (then smallest) front model within F1_TOLERANCE of the best F1."""
+    best_f1 = max(result["f1"] for result in front)
+    close = [result for result in front if result["f1"] >= best_f1 - F1_TOLERANCE]
+    return min(close, key=lambda result: (result["latency_us"], result["size_bytes"]))
+
+
+def rung_sizes(n_candidates: int, max_rows: int, eta: int = TUNE_ETA) -> list:
+    """Training rows per fold of each rung; the last rung keeps at least ``eta`` candidates."""
+    rungs = 1
+    while n_candidates // eta ** rungs >= eta:
+        rungs += 1
+    return [max(min(MIN_RUNG_ROWS, max_rows), max_rows // eta ** (rungs - 1 - r)) for r in range(rungs)]
+
+
+def search(
+    store: ArtifactStore,
+    base_params: dict,
+    workers: int = TUNE_WORKERS,
+    n_candidates: int = TUNE_CANDIDATES,
+    folds: int = TUNE_FOLDS,
+    eta: int = TUNE_ETA,
+    seed: int = 42,
+) -> dict | None:
+    """
+    Successive-halving search around ``base_params`` (train_model's
+    forest configuration). Returns the report, or None without labels.
+    An ``eta`` above ``n_candidates`` evaluates every candidate on every row.
+    """
+    matrix = search_matrix(store)
+    if matrix is None:
+        return None
+    name, X_path, y_path, y, features = matrix
+
+    fold_paths = fold_files(store.directory / CACHE_DIR, name, y, folds, seed)
+    max_rows = min(len(np.load(train, mmap_mode="r")) for train, _ in fold_paths)
+
+    default = {key: base_params[key] for key in SEARCH_SPACE}
+    candidates = draw_candidates(default, n_candidates, seed)
+    sizes = rung_sizes(len(candidates), max_rows, eta)
+    fixed = {**base_params, "oob_score": False, "warm_start": False, "n_jobs": 1, "random_state": seed}
+
+    log.info(
+        f"Hyperparameter search: {len(candidates)} candidates, {folds} folds of {len(y)} rows, "
+        f"rungs of {sizes} training rows, {workers} worker processes"
+    )
+
+    report = {"rows": int(len(y)), "folds": folds, "features": features, "rungs": []}
+    # Spawned, not forked: this may run on a thread of the web process
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for rung, rows in enumerate(sizes):
+            if rung:
+                keep = max(1, len(candidates) // eta)
+                candidates = [candidates[i] for i in promotion_order(results)[:keep]]
+
+            start = time.perf_counter()
+            futures = [
+                [pool.submit(run_trial, {**fixed, **params}, X_path, y_path, fold, rows) for fold in fold_paths]
+                for params in candidates
+            ]
+            results = []
+            for params, trials in zip(candidates, futures):
+                trials = [future.result() for future in trials]
+                result = {key: float(np.mean([trial[key] for trial in trials])) for key in trials[0]}
+                result["size_bytes"] = int(result["size_bytes"])
+                results.append({"params": params, **result})
+
+            log.info(
+                f"Rung {rung}: {len(candidates)} candidates on {rows} rows per fold "
+                f"({time.perf_counter() - start:.1f}s), best macro F1 {max(r['f1'] for r in results):.4f}"
+            )
+            report["rungs"].append({"rows": int(rows), "results": results})
+
+    ranks = pareto_ranks(results)
+    report["front"] = [result for result, rank in zip(results, ranks) if rank == 0]
+    report["chosen"] = choose(report["front"])
+
+    log.info("Pareto front (macro F1, accuracy, µs per row, model MB):")
+    for result in sorted(report["front"], key=lambda result: -result["f1"]):
+        marker = "*" if result is report["chosen"] else " "
+        log.info(
+            f" {marker} {result['f1']:.4f}  {result['accuracy']:.4f}  {result['latency_us']:8.1f}  "
+            f"{result['size_bytes'] / 2**20:7.1f}  {result['params']}"
+        )
+
+    return report
+
+
+def save_report(model_path: Path, report: dict):
+    path = tuning_path(model_path)
+    path.write_text(json.dumps(report, indent=2))
+    log.info(f"Tuning report saved → {path}")